@@ -55,6 +55,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # first, so that it times everything else
+    'submissions.middleware.RequestStatsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -62,8 +64,10 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'users.middleware.UserRolesMiddleware',
     'users.middleware.YearlyProfileCheckMiddleware',
     'submissions.middleware.DemoTimestampMiddleware',
+    'submissions.middleware.CurrentFairMiddleware',
 ]
 
 ROOT_URLCONF = 'onaylf.urls'
@@ -174,6 +178,36 @@ EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL')
 ADMINS = ast.literal_eval(os.getenv('ADMINS'))
 
+# Emails are queued in the database (see submissions/outbox.py) and sent after the
+# request. By default a background thread in the web process sends them; set
+# EMAIL_OUTBOX_IN_PROCESS=False to send them with the run_email_worker management command.
+EMAIL_OUTBOX_IN_PROCESS = os.getenv('EMAIL_OUTBOX_IN_PROCESS', 'True') == 'True'
+
+# Fair exports are built in the background. By default a small thread pool in the web
+# process runs them; set EXPORT_JOBS_IN_PROCESS=False to run them with the
+# run_export_worker management command instead.
+EXPORT_JOBS_IN_PROCESS = os.getenv('EXPORT_JOBS_IN_PROCESS', 'True') == 'True'
+EXPORT_JOB_WORKERS = int(os.getenv('EXPORT_JOB_WORKERS', 2))
+
+# The fair data download and the PDF downloads are stored and sent again until the fair's
+# data changes (see submissions/export_cache.py). The least recently used downloads are
+# removed once the store grows past EXPORT_CACHE_MAX_MB; 0 turns the store off.
+EXPORT_CACHE_MAX_MB = int(os.getenv('EXPORT_CACHE_MAX_MB', 500))
+
+# The current fair is cached in each process; changes made in another process are
+# picked up after this many seconds.
+CURRENT_FAIR_CACHE_SECONDS = int(os.getenv('CURRENT_FAIR_CACHE_SECONDS', 30))
+
+# Per-view timing and query counts (see submissions/request_stats.py), viewable by
+# moderators at /api/request-stats/. Requests slower than SLOW_REQUEST_MS are logged.
+REQUEST_STATS_ENABLED = os.getenv('REQUEST_STATS_ENABLED', 'False') == 'True'
+SLOW_REQUEST_MS = int(os.getenv('SLOW_REQUEST_MS', 1000))
+
+# Judging sheets and submission cards downloaded split by category (?split=category) are
+# rendered in this many worker processes, one category at a time; 1 renders them in the
+# web process.
+PDF_WORKERS = int(os.getenv('PDF_WORKERS', 2))
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
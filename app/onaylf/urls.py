@@ -36,6 +36,8 @@ urlpatterns = [
     path('api/poster/', views.poster_list, name='posters-get-list'),
     # path('api/submission-poster/', views.submission_poster_list, name='submissions-posters-get-list'),
     path('api/submission/<int:perf_pk>/', views.submission_get, name='submission-get'),
+    path('api/submission/bulk-status/', views.submission_bulk_status, name='submission-bulk-status'),
+    path('api/student-list/', views.student_list_get, name='student-list-get'),
     path('api/category-update/<int:pk>/', views.CategoryUpdateView.as_view(), name='category-update'),
     path('api/submission-update/<int:pk>/', views.SubmissionUpdateView.as_view(), name='submission-update'),
     path('api/submission-accessory/add/', views.SubmissionAccessoryCreateView.as_view(), name='submission-accessory-add'),
@@ -45,6 +47,9 @@ urlpatterns = [
     path('api/student/add/', views.StudentAddView.as_view(), name='student-add'),
     path('api/student/update/<int:stud_pk>/', views.StudentUpdateView.as_view(), name='student-update'),
     path('api/fair/<int:fair_pk>/download/', views.FairDownloadView.as_view(), name='fair-download'),
+    path('api/export-job/<int:job_pk>/', views.export_job_get, name='export-job-get'),
+    path('api/export-job/<int:job_pk>/download/', views.ExportJobDownloadView.as_view(), name='export-job-download'),
+    path('api/request-stats/', views.request_stats, name='request-stats'),
     path('api/fair/<int:fair_pk>/download-judge-sheets/', views.JudgeSheetsDownloadView.as_view(), name='fair-download-judge-sheets'),
     path('api/fair/<int:fair_pk>/download-submission-sheets/', views.SubmissionSheetsDownloadView.as_view(), name='fair-download-submission-sheets'),
     path('api/fair/<int:fair_pk>/download-submission-cards/', views.SubmissionCardsDownloadView.as_view(), name='fair-download-submission-cards'),
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from submissions.models import Fair, CurrentFair, Languoid, Tribe, Instructor, Student, Category, Accessory, Submission, SubmissionAccessory
+from submissions.models import Fair, CurrentFair, Languoid, Tribe, Instructor, Student, Category, Accessory, Submission, SubmissionAccessory, FairStatistics, ExportJob, ExportArtifact, OutboundEmail
 
 class CategoryAdmin(admin.ModelAdmin):
     list_display = ('fair', 'name')  # Define fields to display in admin
@@ -24,3 +24,7 @@ admin.site.register(Student)
 admin.site.register(Accessory)
 
 admin.site.register(SubmissionAccessory)
+admin.site.register(FairStatistics)
+admin.site.register(ExportJob)
+admin.site.register(ExportArtifact)
+admin.site.register(OutboundEmail)
@@ -0,0 +1,92 @@
+import json
+import logging
+from django.db import transaction
+from .models import Submission, Student, SubmissionAccessory
+
+logger = logging.getLogger(__name__)
+
+# Saving a submission from the submission form (submission_add and submission_edit). The
+# instructors, students and accessory counts are posted as JSON next to the form fields.
+
+
+def _posted_ids(data, key):
+    posted = data.get(key)
+    if not posted:
+        return None
+    return json.loads(posted)
+
+
+def _posted_accessory_counts(data):
+    posted = data.get('submission_accessory_counts')
+    if not posted:
+        return {}
+    try:
+        return json.loads(posted)
+    except json.JSONDecodeError:
+        logger.warning(f"Invalid JSON: {posted}")
+        return {}
+
+
+def _save_accessory_counts(submission, accessory_counts):
+    existing = {submission_accessory.accessory_id: submission_accessory for submission_accessory in SubmissionAccessory.objects.filter(submission=submission)}
+    to_create = []
+    to_update = []
+    for accessory_id, count in accessory_counts.items():
+        submission_accessory = existing.get(int(accessory_id))
+        if submission_accessory is None:
+            to_create.append(SubmissionAccessory(submission=submission, accessory_id=accessory_id, count=count))
+        elif submission_accessory.count != int(count):
+            submission_accessory.count = count
+            to_update.append(submission_accessory)
+    if to_create:
+        SubmissionAccessory.objects.bulk_create(to_create)
+    if to_update:
+        SubmissionAccessory.objects.bulk_update(to_update, ['count'])
+
+
+def save_submitted_submission(submission, form, data):
+    """
+    Save the submission posted with the submission form (its unsaved instance, with the
+    view's own fields already set) together with its instructors, students and accessories,
+    and mark it submitted. The submission itself is saved once.
+    """
+    instructor_ids = _posted_ids(data, 'instructors')
+    student_ids = _posted_ids(data, 'students')
+    accessory_counts = _posted_accessory_counts(data)
+
+    # grades of the students the submission will have, to work out its type and grade range
+    if student_ids is not None:
+        student_grades = dict(Student.objects.filter(id__in=student_ids).values_list('id', 'grade'))
+    elif submission.pk:
+        student_grades = dict(submission.students.values_list('id', 'grade'))
+    else:
+        student_grades = {}
+
+    # if override_submission_type is checked, do nothing special with submission type
+    if not submission.override_submission_type:
+        # otherwise: set submission_type based on the number of students
+        if len(student_grades) > 1:
+            submission.submission_type = "group"
+        else:
+            submission.submission_type = "individual"
+
+    # the grade range is based on the student in the highest grade
+    max_grade = max(student_grades.values(), default=None)
+    submission.grade_range = Submission.GRADE_RANGES_DICT.get(max_grade, '')
+
+    submission.instructors_status = "completed"
+    submission.students_status = "completed"
+    submission.accessories_status = "completed"
+    submission.review_status = "completed"
+    submission.status = "submitted"
+
+    with transaction.atomic():
+        submission.save()
+        form.save_m2m()
+        if instructor_ids is not None:
+            submission.instructors.set(instructor_ids)
+        if student_ids is not None:
+            submission.students.set(list(student_grades))
+        _save_accessory_counts(submission, accessory_counts)
+
+    return submission
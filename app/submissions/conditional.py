@@ -0,0 +1,96 @@
+import hashlib
+from calendar import timegm
+from functools import wraps
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+# Conditional GET support for the read APIs the templates poll. Each view describes the
+# data it would return with a cheap "watermark" (row counts and latest updated
+# timestamps), which is turned into an ETag/Last-Modified pair. When the browser's copy
+# is still current it gets a 304 and nothing is serialized.
+
+
+def queryset_watermark(queryset, updated_fields=('updated',)):
+    """
+    Count the rows of the queryset and take the latest value of each timestamp field,
+    which can follow relations (e.g. 'user__updated_at'). Returns (watermark, last_modified).
+    """
+    aggregates = queryset.order_by().aggregate(
+        count=Count('pk', distinct=True),
+        **{f'latest_{i}': Max(field) for i, field in enumerate(updated_fields)}
+    )
+    timestamps = [aggregates[f'latest_{i}'] for i in range(len(updated_fields))]
+    last_modified = max((timestamp for timestamp in timestamps if timestamp), default=None)
+    return (aggregates['count'], *timestamps), last_modified
+
+
+def combine_watermarks(*watermarks):
+    """Combine (watermark, last_modified) pairs, e.g. for a view built from several querysets"""
+    last_modified = max((last_modified for watermark, last_modified in watermarks if last_modified), default=None)
+    return tuple(watermark for watermark, last_modified in watermarks), last_modified
+
+
+def _make_etag(request, watermark):
+    # the same data can look different depending on the query string and the user asking
+    key = repr((watermark, request.get_full_path(), request.user.pk))
+    return quote_etag(hashlib.md5(key.encode(), usedforsecurity=False).hexdigest())
+
+
+def conditional_response(request, watermark, get_response):
+    """
+    Return a 304 if the client's copy of the data described by watermark (a
+    (watermark, last_modified) pair) is current, otherwise the response from get_response()
+    """
+    watermark, last_modified = watermark
+    etag = _make_etag(request, watermark)
+    last_modified_timestamp = timegm(last_modified.utctimetuple()) if last_modified else None
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified_timestamp)
+    if response is None:
+        response = get_response()
+    if response.status_code in (200, 304):
+        response.headers['ETag'] = etag
+        if last_modified_timestamp is not None:
+            response.headers['Last-Modified'] = http_date(last_modified_timestamp)
+        # let the browser keep the data, but always check with us before using it
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def conditional_view(watermark_func):
+    """
+    Decorator adding ETag/Last-Modified handling to a read view. watermark_func is called
+    with the view's arguments and returns a (watermark, last_modified) pair for the data the
+    view would return, or None to skip the check (e.g. when the view will return an error).
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def inner(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or not request.user.is_authenticated:
+                return view_func(request, *args, **kwargs)
+            watermark = watermark_func(request, *args, **kwargs)
+            if watermark is None:
+                return view_func(request, *args, **kwargs)
+            return conditional_response(request, watermark, lambda: view_func(request, *args, **kwargs))
+        return inner
+    return decorator
+
+
+class ConditionalReadMixin:
+    """
+    ETag/Last-Modified handling for the list and retrieve actions of a viewset, based on
+    its queryset. watermark_fields are the timestamp fields the serialized data depends on.
+    """
+    watermark_fields = ('updated',)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        watermark = queryset_watermark(queryset, self.watermark_fields)
+        return conditional_response(request, watermark, lambda: super(ConditionalReadMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset()).filter(**{self.lookup_field: kwargs[lookup_url_kwarg]})
+        watermark = queryset_watermark(queryset, self.watermark_fields)
+        return conditional_response(request, watermark, lambda: super(ConditionalReadMixin, self).retrieve(request, *args, **kwargs))
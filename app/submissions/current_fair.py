@@ -0,0 +1,50 @@
+import copy
+import threading
+import time
+from django.conf import settings
+from django.db import transaction
+from .models import CurrentFair
+
+# The current fair is read by nearly every view, so it is resolved once per request (see
+# CurrentFairMiddleware) and kept in a process-level cache between requests. The cache is
+# cleared in this process whenever the current fair or a fair is changed here; other
+# processes pick the change up once CURRENT_FAIR_CACHE_SECONDS have passed.
+
+_cache_lock = threading.Lock()
+_cached_current_fair = None
+_cached_at = None
+
+
+def _load_current_fair():
+    global _cached_current_fair, _cached_at
+    with _cache_lock:
+        if _cached_at is None or time.monotonic() - _cached_at > settings.CURRENT_FAIR_CACHE_SECONDS:
+            _cached_current_fair = CurrentFair.objects.select_related('fair').first()
+            _cached_at = time.monotonic()
+        # hand out copies, so that changes made by one caller don't leak into the cache
+        return copy.deepcopy(_cached_current_fair)
+
+
+def get_current_fair(request=None):
+    """
+    Return the CurrentFair (with its fair loaded), or None if it isn't set. Given the
+    request, it is resolved only once for the whole request.
+    """
+    if request is None:
+        return _load_current_fair()
+    if not hasattr(request, 'current_fair'):
+        request.current_fair = _load_current_fair()
+    return request.current_fair
+
+
+def _clear():
+    global _cached_at
+    with _cache_lock:
+        _cached_at = None
+
+
+def clear_current_fair_cache():
+    """Drop the cached current fair"""
+    _clear()
+    # and again once the change is committed, in case another request cached the old value meanwhile
+    transaction.on_commit(_clear)
@@ -0,0 +1,161 @@
+import uuid
+import tempfile
+import hashlib
+import logging
+from functools import wraps
+from django.conf import settings
+from django.core.files.base import File, ContentFile
+from django.db import transaction, IntegrityError
+from django.db.models import Sum
+from django.http import FileResponse
+from django.utils import timezone
+from .models import Fair, Submission, Student, Instructor, Accessory, ExportArtifact
+from .conditional import queryset_watermark, combine_watermarks
+
+logger = logging.getLogger(__name__)
+
+# The fair data ZIP and the PDF downloads are built from scratch on every click, though
+# the data rarely changes between clicks. Each download is stored (as an ExportArtifact)
+# under a watermark of the fair's data, the same kind of row counts and latest updated
+# timestamps used for conditional GETs (see conditional.py). While the watermark is
+# unchanged the stored file is sent again; once the data moves the download is rebuilt.
+# A streamed download goes to the client as it is generated, with a copy kept aside that
+# is stored once the stream is complete. The export jobs (see exports.py) use the same
+# store, so the "Download All Data" button doesn't rebuild unchanged data either.
+# The store is bounded by EXPORT_CACHE_MAX_MB, evicting the least recently used files.
+
+# bump this when the layout of an export changes, so that stored downloads are rebuilt
+EXPORT_FORMAT_VERSION = 1
+
+
+def fair_export_watermark(fair_id):
+    """The watermark of everything the fair's exports are built from, or None if there is no such fair"""
+    # the fair's reference_version covers its languoids, tribes, categories and accessories
+    fair = Fair.objects.filter(pk=fair_id).values_list('name', 'reference_version').first()
+    if fair is None:
+        return None
+    watermark, last_modified = combine_watermarks(
+        # Submission.updated also covers the students, instructors, languoids and accessory counts linked to a submission (see signals.py)
+        queryset_watermark(Submission.objects.filter(fair_id=fair_id), ('updated', 'user__updated_at', 'category__updated')),
+        queryset_watermark(Student.objects.filter(fair_id=fair_id)),
+        queryset_watermark(Instructor.objects.filter(fair_id=fair_id)),
+        queryset_watermark(Accessory.objects.filter(fair_id=fair_id)),
+    )
+    key = repr((EXPORT_FORMAT_VERSION, fair, watermark))
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def _artifact_response(artifact):
+    response = FileResponse(artifact.file.open('rb'), content_type=artifact.content_type)
+    if artifact.content_disposition:
+        response['Content-Disposition'] = artifact.content_disposition
+    return response
+
+
+def find_export_artifact(fair_id, export_type, watermark):
+    """The stored download of the export for the watermark, or None"""
+    artifact = ExportArtifact.objects.filter(fair_id=fair_id, export_type=export_type, watermark=watermark).first()
+    if artifact is None:
+        return None
+    if not artifact.file.storage.exists(artifact.file.name):
+        logger.warning(f"Stored {export_type} export for fair {fair_id} is missing its file, rebuilding it")
+        artifact.delete()
+        return None
+    ExportArtifact.objects.filter(pk=artifact.pk).update(last_used=timezone.now())
+    return artifact
+
+
+def store_export_artifact(fair_id, export_type, watermark, content, content_type, content_disposition=''):
+    """Store the download of the export (a File) for the watermark, returning its ExportArtifact"""
+    artifact = ExportArtifact(
+        fair_id=fair_id,
+        export_type=export_type,
+        watermark=watermark,
+        content_type=content_type,
+        content_disposition=content_disposition,
+    )
+    artifact.file.save(f'{fair_id}-{uuid.uuid4().hex}', content, save=False)
+    artifact.size = artifact.file.size
+
+    try:
+        with transaction.atomic():
+            artifact.save()
+    except IntegrityError:
+        # another request stored the same download first, use that one
+        artifact.file.delete(save=False)
+        return ExportArtifact.objects.get(fair_id=fair_id, export_type=export_type, watermark=watermark)
+
+    # downloads of older data can't be used again
+    ExportArtifact.objects.filter(fair_id=fair_id, export_type=export_type).exclude(pk=artifact.pk).delete()
+    evict_export_artifacts(keep=artifact)
+    return artifact
+
+
+def _tee_to_store(fair_id, export_type, watermark, response, chunks):
+    # each chunk is sent on as soon as it is generated, so the download starts as quickly
+    # as without the store; a stream that fails or is abandoned part-way stores nothing
+    with tempfile.TemporaryFile() as copy:
+        for chunk in chunks:
+            copy.write(chunk)
+            yield chunk
+        copy.seek(0)
+        try:
+            store_export_artifact(fair_id, export_type, watermark, File(copy),
+                                  response['Content-Type'], response.get('Content-Disposition', ''))
+        except Exception:
+            # the client already has the download, it is only built again next time
+            logger.exception(f"Error storing {export_type} export for fair {fair_id}")
+
+
+def evict_export_artifacts(keep=None):
+    """Delete the least recently used artifacts until the store fits in EXPORT_CACHE_MAX_MB"""
+    max_size = settings.EXPORT_CACHE_MAX_MB * 1024 * 1024
+    total = ExportArtifact.objects.aggregate(total=Sum('size'))['total'] or 0
+    if total <= max_size:
+        return
+    artifacts = ExportArtifact.objects.order_by('last_used')
+    if keep is not None:
+        artifacts = artifacts.exclude(pk=keep.pk)
+    for artifact in artifacts:
+        if total <= max_size:
+            break
+        total -= artifact.size
+        # the file is removed by the post_delete receiver (see signals.py)
+        artifact.delete()
+
+
+def cached_export(export_type):
+    """
+    Decorator for the get() of a fair download view (taking the fair_pk), storing its
+    response and sending the stored file again until the fair's data changes. Downloads
+    with different query strings are stored separately.
+    """
+    def decorator(get):
+        @wraps(get)
+        def inner(view, request, fair_pk, *args, **kwargs):
+            if not settings.EXPORT_CACHE_MAX_MB:
+                return get(view, request, fair_pk, *args, **kwargs)
+            watermark = fair_export_watermark(fair_pk)
+            if watermark is None:
+                return get(view, request, fair_pk, *args, **kwargs)
+
+            key = export_type
+            if request.GET:
+                key += '?' + '&'.join(f'{name}={value}' for name, value in sorted(request.GET.items()))
+
+            artifact = find_export_artifact(fair_pk, key, watermark)
+            if artifact is not None:
+                return _artifact_response(artifact)
+
+            # the watermark was taken before building, so changes made meanwhile cause a rebuild next time
+            response = get(view, request, fair_pk, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            if response.streaming:
+                response.streaming_content = _tee_to_store(fair_pk, key, watermark, response, response.streaming_content)
+            else:
+                store_export_artifact(fair_pk, key, watermark, ContentFile(response.content),
+                                      response['Content-Type'], response.get('Content-Disposition', ''))
+            return response
+        return inner
+    return decorator
@@ -0,0 +1,666 @@
+import json, re, copy, uuid, logging
+import tempfile
+import zipfile
+from itertools import chain
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import PatternFill, Font, Border, NamedStyle
+from openpyxl.styles.fonts import DEFAULT_FONT
+from openpyxl.styles.borders import Side
+from openpyxl.utils import get_column_letter
+from django.conf import settings
+from django.core.files.base import File
+from django.db import transaction, close_old_connections
+from django.db.models import Sum, Count, F, Case, When, Value
+from django.db.models.functions import Lower
+from django.utils import timezone
+from users.models import User
+from .models import Category, Student, Accessory, Submission, SubmissionAccessory, ExportJob
+from .serializers import SubmissionJsonSerializer, submission_json_queryset
+from .export_cache import fair_export_watermark, find_export_artifact, store_export_artifact
+
+logger = logging.getLogger(__name__)
+
+
+def fair_export_file_name(fair):
+    return f'fair_{fair.name}_data.zip'
+
+
+# files are added to a ZIP this many bytes at a time
+ZIP_COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class _ZipOutput:
+    """
+    Write-only file object for zipfile that keeps what has been written until it
+    is collected with pop(). It has no seek(), so zipfile writes each entry with a
+    data descriptor instead of going back to patch its header.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_zip(files, folder_name=''):
+    """
+    Build a ZIP from (file name, bytes or file) pairs, yielding its bytes as soon as each
+    entry has been added. Files are copied in chunks, and closed once they have been added.
+    """
+    output = _ZipOutput()
+    with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED) as zip_file:
+        for file_name, data in files:
+            if isinstance(data, bytes):
+                zip_file.writestr(folder_name + file_name, data)
+            else:
+                with data, zip_file.open(folder_name + file_name, 'w') as entry:
+                    for chunk in iter(lambda: data.read(ZIP_COPY_CHUNK_SIZE), b''):
+                        entry.write(chunk)
+                        yield output.pop()
+            yield output.pop()
+    # the central directory is written when the ZIP is closed
+    yield output.pop()
+
+
+def _spool(chunks):
+    """Write a stream of bytes to a temporary file, returned rewound for reading (the caller closes it)"""
+    # the stream is only handed to storage once it is complete, so storage never holds
+    # a partial file of a build that failed part-way
+    spooled = tempfile.TemporaryFile()
+    try:
+        for chunk in chunks:
+            spooled.write(chunk)
+    except BaseException:
+        spooled.close()
+        raise
+    spooled.seek(0)
+    return spooled
+
+
+## Workbooks
+# The workbooks of the export are written with openpyxl's write-only mode: rows are
+# streamed into the file as they are added, and the cell styles are shared named styles
+# rather than a font and fill per cell. Column widths have to be written before the rows,
+# so the data rows of a sheet are generated twice, once to measure the widths and once to
+# write them, rather than kept. Each workbook is saved to a temporary file, which is
+# copied into the ZIP.
+
+# the named styles used by the export workbooks, name -> NamedStyle arguments
+EXPORT_STYLES = {
+    'export_title': {'font': Font(size=20, bold=True)},
+    'export_header': {'fill': PatternFill(start_color="007bff", end_color="007bff", fill_type="solid"), 'font': Font(color="FFFFFF")},
+    'export_sign_in_header': {'font': Font(bold=True), 'border': Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))},
+    'export_bordered': {'font': copy.copy(DEFAULT_FONT), 'border': Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))},
+}
+
+# the widths of the first seven columns follow their longest text, up to this many characters
+EXPORT_COLUMN_WIDTH_COLUMNS = 7
+EXPORT_COLUMN_WIDTH_LIMIT = 40
+
+# rows are read from the database this many at a time
+EXPORT_CHUNK_SIZE = 500
+
+
+def _names_by_link(links, owner_field, name_field):
+    """
+    The names linked to each row from a link table (e.g. the languoid names of each
+    submission), with "Other" first and then by name, as the Languoid and Tribe managers sort them
+    """
+    names = {}
+    links = links.order_by(Case(When(**{name_field: 'Other'}, then=Value(0)), default=Value(1)), Lower(name_field))
+    for owner_id, name in links.values_list(owner_field, name_field):
+        names.setdefault(owner_id, []).append(name)
+    return names
+
+
+def _new_workbook():
+    workbook = Workbook(write_only=True)
+    for name, style in EXPORT_STYLES.items():
+        workbook.add_named_style(NamedStyle(name=name, **style))
+    return workbook
+
+
+def _save_workbook(workbook):
+    """Save the workbook to a temporary file, returned rewound for reading (the caller closes it)"""
+    xlsx_file = tempfile.TemporaryFile()
+    workbook.save(xlsx_file)
+    xlsx_file.seek(0)
+    return xlsx_file
+
+
+class _ExportSheet:
+    """A sheet of a write-only workbook, sizing its columns to fit the text in them"""
+
+    def __init__(self, workbook, title):
+        self.sheet = workbook.create_sheet(title=title)
+        self._head_rows = []
+
+    def merge(self, cell_range):
+        self.sheet.merged_cells.add(cell_range)
+
+    def row_height(self, row, height):
+        self.sheet.row_dimensions[row].height = height
+
+    def append(self, values, style=None):
+        """Add a row above the data (a title or the headers), with the named style on all of its cells"""
+        self._head_rows.append((values, style))
+
+    def write(self, data_rows=None, style=None):
+        """
+        Write the column widths, the rows added with append() and then the data rows, with
+        the named style on all of their cells. data_rows is a function returning the data
+        rows, which is called twice: once to measure the columns and once to write them.
+        """
+        lengths = [0] * EXPORT_COLUMN_WIDTH_COLUMNS
+        head_rows = [values for values, _ in self._head_rows]
+        for values in chain(head_rows, data_rows() if data_rows else []):
+            for column, value in enumerate(values[:EXPORT_COLUMN_WIDTH_COLUMNS]):
+                if isinstance(value, str):
+                    lengths[column] = max(lengths[column], len(value))
+        for column, length in enumerate(lengths):
+            self.sheet.column_dimensions[get_column_letter(column + 1)].width = min(length + 1, EXPORT_COLUMN_WIDTH_LIMIT)
+
+        for values, row_style in self._head_rows:
+            self._append(values, row_style)
+        if data_rows:
+            for values in data_rows():
+                self._append(values, style)
+
+    def _append(self, values, style):
+        if style:
+            values = [self._styled_cell(value, style) for value in values]
+        self.sheet.append(values)
+
+    def _styled_cell(self, value, style):
+        cell = WriteOnlyCell(self.sheet, value=value)
+        cell.style = style
+        return cell
+
+
+def stream_fair_export(fair):
+    """Stream the fair data export as a ZIP, one entry at a time"""
+    return stream_zip(iter_fair_export_files(fair), folder_name=f'fair_{fair.name}_data/')
+
+
+def iter_fair_export_files(fair):
+    """Generate the files of the fair data export (a JSON dump of all submissions and five workbooks) as (file name, bytes)"""
+    ## Make json document
+    serializer = SubmissionJsonSerializer(submission_json_queryset(Submission.objects.filter(fair=fair)), many=True)
+
+    # Convert the serialized data to JSON
+    data = json.dumps(serializer.data)
+    yield f'fair-{fair.name}-data.json', data.encode('utf-8')
+
+
+    ## Make xlsx for submissions (non material)
+
+    # filter submissions to only include those that are approved
+    submissions = Submission.objects.filter(fair=fair, status__in=["approved"])
+
+    categories = list(Category.objects.filter(fair=fair).values_list('name', flat=True))
+
+    # the number of students in each submission
+    student_counts = dict(Submission.students.through.objects
+        .filter(submission__in=submissions)
+        .values('submission_id')
+        .annotate(count=Count('student_id'))
+        .values_list('submission_id', 'count'))
+    # the languoid names of each submission
+    languoid_names = _names_by_link(Submission.languoids.through.objects.filter(submission__in=submissions), 'submission_id', 'languoid__name')
+
+    submission_workbook = _new_workbook()
+
+    for category in categories:
+        # sanitize the category name to remove any characters that are not allowed in a sheet name
+        category_name = re.sub(r'[\\/*?[\]:]', '_', category)
+        # create a new sheet
+        sheet = _ExportSheet(submission_workbook, category_name)
+        # merge the first 7 columns of the first row, with the category name as the title
+        sheet.merge('A1:G1')
+        sheet.append([category], style='export_title')
+        # set the height of the first row to 30
+        sheet.row_height(1, 30)
+        # list of column headers, in the second row
+        headers = ["Title", "Program/School", "Presenting group", "Language", "Grade Range", "Submission type", "Student count"]
+        sheet.append(headers, style='export_header')
+        ## add data to the sheet, starting at the third row. the data are non material submissions with the current category
+        submissions_in_category = submissions.filter(category__name=category)
+        def category_rows():
+            # Iterate over the submissions in the category
+            for submission in submissions_in_category.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+                # Create a list for the current row
+                yield [
+                    submission.title,
+                    submission.organization,
+                    submission.group,
+                    ", ".join([f"Other: {submission.other_languoid if submission.other_languoid else 'Blank'}" if languoid_name == 'Other' else languoid_name for languoid_name in languoid_names.get(submission.pk, [])]),
+                    submission.get_grade_range_display(),
+                    submission.get_submission_type_display(),
+                    student_counts.get(submission.pk, 0)
+                ]
+
+        sheet.write(category_rows)
+
+    yield f'Fair{fair.name}-Submission counts.xlsx', _save_workbook(submission_workbook)
+
+
+    # get all students in submissions for the current fair that are approved
+    students = Student.objects.filter(submission_student__fair=fair).filter(submission_student__status="approved").distinct()
+    tribe_names = _names_by_link(Student.tribe.through.objects.filter(student__in=students.values('pk')), 'student_id', 'tribe__name')
+    students = students.annotate(organization=F('user__organization'))
+
+    student_workbook = _new_workbook()
+
+    student_sorting_tabs = ["Sorted by name", "Sorted by age"]
+
+    for tab in student_sorting_tabs:
+
+        sheet = _ExportSheet(student_workbook, tab)
+
+        # list of column headers
+        headers = ["First name", "Last name", "Tribe", "Hometown", "State", "Grade", "Program/School"]
+        sheet.append(headers, style='export_header')
+        ## add data to the sheet, starting at the second row. the data are students in submissions for the current fair that are approved
+        # Iterate over the students
+        if tab == "Sorted by name":
+            students = students.order_by('lastname', 'firstname', 'grade')
+        elif tab == "Sorted by age":
+            students = students.order_by('grade', 'lastname', 'firstname')
+        def student_rows():
+            for student in students.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+                # Create a list for the current row
+                yield [
+                    student.firstname,
+                    student.lastname,
+                    ", ".join(tribe_names.get(student.pk, [])),
+                    student.hometown,
+                    student.state,
+                    student.get_grade_display(),
+                    student.organization
+                ]
+
+        sheet.write(student_rows)
+
+    yield f'Fair{fair.name}-Student details.xlsx', _save_workbook(student_workbook)
+
+    # get all users that have approved submissions in the current fair and are not moderators
+    users = User.objects.filter(
+        submission_user__fair=fair,  # submission is in current fair
+        submission_user__status='approved'  # submission is approved
+    ).exclude(
+        groups__name='moderator'
+    ).distinct().order_by('organization', 'last_name', 'first_name')
+
+
+    group_contact_workbook = _new_workbook()
+
+    sheet = _ExportSheet(group_contact_workbook, "GroupContactDetails")
+
+    # list of column headers
+    headers = ["Program/School", "Contact name", "Address", "City, State ZIP", "Phone number", "Fax number", "Email"]
+    sheet.append(headers, style='export_header')
+    def contact_rows():
+        for user in users.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            # Create a list for the current row
+            yield [
+                user.organization or '',
+                " ".join(filter(None, [user.first_name, user.last_name])),
+                user.address or '',
+                ", ".join(filter(None, [user.city, " ".join(filter(None, [user.state, user.zip]))])),
+                ", ".join(filter(None, [user.phone, user.alt_phone])),
+                user.fax or '',
+                user.email or ''
+            ]
+
+    sheet.write(contact_rows)
+
+    yield f'Fair{fair.name}-Program contact details.xlsx', _save_workbook(group_contact_workbook)
+
+
+
+    # get a list of all the accessories for the fair
+    accessories = list(Accessory.objects.filter(fair=fair))
+
+    # Get all submissions
+    submissions = Submission.objects.filter(fair=fair, status__in=["approved"]).values('id', 'title', 'organization', 'grade_range', 'category__name')
+
+    # Convert GRADE_RANGES to a dictionary
+    grade_ranges_dict = dict(Submission.GRADE_RANGES)
+
+    # the accessory counts of the submissions, by submission and accessory
+    accessory_counts_by_submission = {}
+    for submission_id, accessory_id, count in (SubmissionAccessory.objects
+            .filter(submission__fair=fair, submission__status__in=["approved"])
+            .values('submission_id', 'accessory_id')
+            .annotate(count=Sum('count'))
+            .values_list('submission_id', 'accessory_id', 'count')):
+        accessory_counts_by_submission[(submission_id, accessory_id)] = count
+
+    accessory_workbook = _new_workbook()
+
+    sheet = _ExportSheet(accessory_workbook, "AccessoryCounts")
+
+    # list of column headers
+    headers = ["Submission title", "Program/School", "Grade range", "Category"]
+    # add the accessory names to the headers list
+    headers.extend([accessory.name for accessory in accessories])
+    sheet.append(headers, style='export_header')
+
+    def accessory_rows():
+        for submission in submissions.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            # Get all accessory counts for this submission
+            accessory_counts = [accessory_counts_by_submission.get((submission['id'], accessory.id)) or "" for accessory in accessories]
+
+            # Only add row if any accessory count is greater than 0
+            if any(count and count > 0 for count in accessory_counts):
+                # Create a list for the current row, with the display version of the grade range
+                row = [
+                    submission['title'],
+                    submission['organization'],
+                    grade_ranges_dict.get(submission['grade_range']),
+                    submission['category__name']
+                ]
+                # add the accessory counts to the row
+                row.extend(accessory_counts)
+                yield row
+
+    sheet.write(accessory_rows)
+
+    yield f'Fair{fair.name}-Accessory counts.xlsx', _save_workbook(accessory_workbook)
+
+
+    # get all users that have approved submissions in the current fair and are not moderators
+    users = User.objects.filter(
+        submission_user__fair=fair,  # submission is in current fair
+        submission_user__status='approved'  # submission is approved
+    ).exclude(
+        groups__name='moderator'
+    ).distinct().order_by('organization', 'last_name', 'first_name')
+
+    # Convert GRADES to a dictionary
+    grades_dict = dict(Student.GRADES)
+
+    # the grades of the students in each user's submissions for the fair, and the grade
+    # ranges of those submissions, read for all users at once
+    user_grades = {}
+    for user_id, grade in Submission.students.through.objects.filter(submission__fair=fair).values_list('submission__user_id', 'student__grade'):
+        user_grades.setdefault(user_id, set()).add(grade)
+    user_grade_ranges = {}
+    for user_id, grade_range in Submission.objects.filter(fair=fair).values_list('user_id', 'grade_range'):
+        user_grade_ranges.setdefault(user_id, set()).add(grade_range)
+
+    # make a list of dictionaries for each user
+    users_list = []
+    for user in users:
+        # get the grades of the students
+        grades = sorted(user_grades.get(user.pk, set()))
+
+        ### deprecated code, using grade_range instead
+        # # set day to "Day 1" if any of the grades are in grades_dict[0:6]
+        # # set day to "Day 2" if any of the grades are in grades_dict[7:13]
+        # # set day to "Day 1 + Day 2" if any of the grades are in grades_dict
+        # day1 = "Day 1" if any(grade in grades_keys[0:7] for grade in grades) else ""
+        # day2 = "Day 2" if any(grade in grades_keys[7:14] for grade in grades) else ""
+        # day = " + ".join(filter(None, [day1, day2]))
+
+
+        # Get all grade ranges from the user's submissions for this fair
+        submission_grade_ranges = user_grade_ranges.get(user.pk, set())
+
+        # Check for Day 1 grade ranges (PreK-2nd and 3rd-5th)
+        day1_ranges = {'0_pk-2', '1_3-5'}
+        day1 = "Day 1" if any(grade_range in day1_ranges for grade_range in submission_grade_ranges) else ""
+
+        # Check for Day 2 grade ranges (6th-8th and 9th-12th)
+        day2_ranges = {'1_6-8', '1_9-12'}
+        day2 = "Day 2" if any(grade_range in day2_ranges for grade_range in submission_grade_ranges) else ""
+
+        day = " + ".join(filter(None, [day1, day2]))
+
+
+
+
+        # for each value in grades, replace with the display value from grades_dict
+        grades = [grades_dict[grade] for grade in grades]
+
+        # create a dictionary for the user
+        user_dict = {
+            'name': f"{user.first_name} {user.last_name}",
+            'organization': user.organization,
+            'city': user.city,
+            'state': user.state,
+            'email': ', '.join(filter(None, [user.email, user.alt_email])),
+            'grades': ", ".join([str(grade) for grade in grades]),
+            'day': day,
+            'day1': day1,
+            'day2': day2
+        }
+        # add a copy of the dictionary to the list of users
+        users_list.append(copy.deepcopy(user_dict))
+
+    program_labels_workbook = _new_workbook()
+
+    sheet = _ExportSheet(program_labels_workbook, "Program Labels")
+
+    # list of column headers
+    headers = ["Program/School", "Contact", "Day", "Grades", "Address"]
+    sheet.append(headers, style='export_header')
+    def label_rows():
+        for user_dict in users_list:
+            # Create contact string with name and email
+            contact = f"{user_dict['name']} ({user_dict['email']})" if user_dict['name'].strip() else user_dict['email']
+
+            # Create a list for the current row
+            yield [
+                user_dict['organization'],
+                contact,
+                user_dict['day'],
+                user_dict['grades'],
+                f"{user_dict['city']}, {user_dict['state']}"
+            ]
+
+    sheet.write(label_rows)
+
+
+    for day in ["Day 1", "Day 2"]:
+        sheet = _ExportSheet(program_labels_workbook, f"Sign In {day}")
+
+        # list of column headers
+        headers = ["Program/School", "Contact", "Location", "Registration Packet", "T-shirts/Bags", "Posters"]
+        sheet.append(headers, style='export_sign_in_header')
+
+        # filter the users_list to only include users that are in submissions that are on the day
+        users_list_day = [user_dict for user_dict in users_list if user_dict['day1' if day == "Day 1" else 'day2'] == day]
+        def sign_in_rows():
+            for user_dict in users_list_day:
+                # Create contact string with name and email
+                contact = f"{user_dict['name']} ({user_dict['email']})" if user_dict['name'].strip() else user_dict['email']
+
+                # Create a list for the current row
+                yield [
+                    user_dict['organization'],
+                    contact,
+                    f"{user_dict['city']}, {user_dict['state']}",
+                    "",
+                    "",
+                    ""
+                ]
+
+            # the sign in sheets have a bordered row for every program, so there is room to add programs by hand
+            for _ in range(len(users_list) - len(users_list_day)):
+                yield [None] * len(headers)
+
+        sheet.write(sign_in_rows, style='export_bordered')
+
+
+    yield f'Fair{fair.name}-Program labels.xlsx', _save_workbook(program_labels_workbook)
+
+
+
+## Export jobs
+# Exports are built outside of the request: the view enqueues an ExportJob row, the
+# job is run by a small thread pool in the web process (or by the run_export_worker
+# management command when EXPORT_JOBS_IN_PROCESS is off), and the browser polls the
+# job until the finished file can be downloaded.
+
+# export_type -> (function streaming the export, function giving its file name, content type)
+EXPORT_TYPES = {
+    'fair_data': (stream_fair_export, fair_export_file_name, 'application/zip'),
+}
+
+# Finished jobs (and their files) are removed after this long
+EXPORT_JOB_RETENTION = timedelta(days=1)
+
+# Jobs left "running" for this long belong to a worker that died, and are marked failed
+# so that the export can be built again
+RUNNING_TIMEOUT = timedelta(minutes=30)
+
+# Jobs left "queued" for this long in the web process were lost in a restart before they
+# could run, and are handed to the pool again
+QUEUED_TIMEOUT = timedelta(minutes=1)
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.EXPORT_JOB_WORKERS, thread_name_prefix='export-job')
+    return _executor
+
+
+def enqueue_export(fair, export_type, requested_by):
+    """Queue an export of the fair, reusing a job for the same export that is already queued or running"""
+    if export_type not in EXPORT_TYPES:
+        raise ValueError(f"Unknown export type: {export_type}")
+
+    purge_export_jobs()
+    fail_stale_export_jobs()
+
+    job = ExportJob.objects.filter(
+        fair=fair,
+        export_type=export_type,
+        status__in=['queued', 'running']
+    ).first()
+    if job:
+        resume_queued_export_job(job)
+        return job
+
+    job = ExportJob.objects.create(
+        fair=fair,
+        export_type=export_type,
+        modified_by=requested_by,
+    )
+
+    if settings.EXPORT_JOBS_IN_PROCESS:
+        _submit_export_job(job)
+
+    return job
+
+
+def _submit_export_job(job):
+    # Only hand the job to the pool once the row is visible to other connections
+    transaction.on_commit(lambda: _get_executor().submit(_run_export_job_in_thread, job.pk))
+
+
+def resume_queued_export_job(job):
+    """Hand a queued job that was lost in a restart of the web process to the pool again"""
+    if not settings.EXPORT_JOBS_IN_PROCESS or job.status != 'queued':
+        return
+    if job.added < timezone.now() - QUEUED_TIMEOUT:
+        # if it is still waiting in the pool after all, only one of the two runs claims it
+        _submit_export_job(job)
+
+
+def _run_export_job_in_thread(job_id):
+    try:
+        run_export_job(job_id)
+    finally:
+        # Threads get their own database connection, which is not closed by the request cycle
+        close_old_connections()
+
+
+def run_export_job(job_id):
+    """Build the export for a queued job. Returns False if the job was already claimed by another worker."""
+    # Claim the job, so that it is only run once even with several workers
+    claimed = ExportJob.objects.filter(pk=job_id, status='queued').update(status='running', started=timezone.now())
+    if not claimed:
+        return False
+
+    job = ExportJob.objects.select_related('fair').get(pk=job_id)
+    stream_export, get_file_name, content_type = EXPORT_TYPES[job.export_type]
+
+    try:
+        job.file_name = get_file_name(job.fair)
+        # The stored file gets a unique name, the download uses file_name
+        stored_name = f'{uuid.uuid4().hex}-{job.file_name}'
+        # taken before building, so changes made meanwhile cause a rebuild next time
+        watermark = fair_export_watermark(job.fair_id) if settings.EXPORT_CACHE_MAX_MB else None
+        artifact = find_export_artifact(job.fair_id, job.export_type, watermark) if watermark else None
+        if artifact is not None:
+            # the fair's data is unchanged since the export was last built, so the stored
+            # download is copied rather than built again (see export_cache.py)
+            with artifact.file.open('rb') as export_file:
+                job.file.save(stored_name, File(export_file), save=False)
+        else:
+            with _spool(stream_export(job.fair)) as export_file:
+                job.file.save(stored_name, File(export_file), save=False)
+                if watermark:
+                    export_file.seek(0)
+                    store_export_artifact(job.fair_id, job.export_type, watermark, File(export_file), content_type,
+                                          f'attachment; filename="{job.file_name}"')
+        job.status = 'completed'
+    except Exception as e:
+        logger.error(f"Error building {job.export_type} export for fair {job.fair_id}: {str(e)}", exc_info=True)
+        job.status = 'failed'
+        job.error = str(e)
+
+    job.finished = timezone.now()
+    job.save()
+    return True
+
+
+def run_queued_export_jobs():
+    """Run all queued jobs, oldest first. Returns the number of jobs run."""
+    fail_stale_export_jobs()
+    count = 0
+    for job_id in ExportJob.objects.filter(status='queued').order_by('added').values_list('id', flat=True):
+        if run_export_job(job_id):
+            count += 1
+    return count
+
+
+def purge_export_jobs():
+    """Delete finished jobs older than EXPORT_JOB_RETENTION, along with their files"""
+    cutoff = timezone.now() - EXPORT_JOB_RETENTION
+    for job in ExportJob.objects.filter(status__in=['completed', 'failed'], finished__lt=cutoff):
+        if job.file:
+            job.file.delete(save=False)
+        job.delete()
+
+
+def fail_stale_export_jobs():
+    """Mark the jobs left running by a worker that died (for longer than RUNNING_TIMEOUT) as failed"""
+    now = timezone.now()
+    stale = ExportJob.objects.filter(status='running', started__lt=now - RUNNING_TIMEOUT)
+    for job_id in stale.values_list('id', flat=True):
+        logger.warning(f"Export job {job_id} has been running for more than {RUNNING_TIMEOUT}, marking it failed")
+    stale.update(status='failed', error='The export was interrupted, please try again.', finished=now)
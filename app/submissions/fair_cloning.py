@@ -0,0 +1,57 @@
+from .models import Languoid, Tribe, Category, Accessory, Instructor, Student
+from .reference_data import invalidate_fair_reference_data
+
+# A new fair starts as a copy of the languoids, tribes, categories and accessories of an
+# earlier one (the template fair). Each table is copied with one bulk insert, so opening a
+# fair takes the same handful of statements however long the template's lists are. The
+# rosters (each user's instructors and students) can be carried forward too, for programs
+# that return every year. A student's grade and t-shirt size change from year to year, so
+# they are left blank for the program to fill in again.
+
+# model -> the fields copied to the new fair
+REFERENCE_FIELDS = {
+    Languoid: ('name', 'glottocode', 'isocode', 'level', 'active'),
+    Tribe: ('name', 'active'),
+    Category: ('name', 'material_submission', 'max_students'),
+    Accessory: ('name',),
+}
+ROSTER_FIELDS = {
+    Instructor: ('user_id', 'lastname', 'firstname'),
+    Student: ('user_id', 'lastname', 'firstname', 'hometown', 'state'),
+}
+
+
+def _copy_rows(model, fields, template_fair, new_fair, modified_by):
+    # returns {template row id: copy id}
+    rows = list(model.objects.filter(fair=template_fair).order_by('pk').values('pk', *fields))
+    copies = model.objects.bulk_create([
+        model(fair=new_fair, modified_by=modified_by, **{field: row[field] for field in fields})
+        for row in rows
+    ])
+    return {row['pk']: copy.pk for row, copy in zip(rows, copies)}
+
+
+def clone_fair(template_fair, new_fair, modified_by, rosters=False):
+    """
+    Copy the reference data of the template fair into the new fair and, with rosters, its
+    instructors and students (with their tribes). Returns the number of rows copied by table.
+    """
+    counts = {}
+    copied_ids = {}
+    for model, fields in {**REFERENCE_FIELDS, **(ROSTER_FIELDS if rosters else {})}.items():
+        copied_ids[model] = _copy_rows(model, fields, template_fair, new_fair, modified_by)
+        counts[str(model._meta.verbose_name_plural)] = len(copied_ids[model])
+
+    if rosters:
+        tribe_ids, student_ids = copied_ids[Tribe], copied_ids[Student]
+        links = Student.tribe.through.objects.filter(student__fair=template_fair).values_list('student_id', 'tribe_id')
+        Student.tribe.through.objects.bulk_create([
+            Student.tribe.through(student_id=student_ids[student_id], tribe_id=tribe_ids[tribe_id])
+            for student_id, tribe_id in links
+            # a tribe of another fair has no copy
+            if tribe_id in tribe_ids
+        ])
+
+    # bulk inserts don't send the signals that would do this (see signals.py)
+    invalidate_fair_reference_data(new_fair.id)
+    return counts
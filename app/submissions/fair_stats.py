@@ -0,0 +1,333 @@
+from collections import defaultdict
+from django.db.models import Sum
+from django.utils import timezone
+from .models import Languoid, Category, Accessory, Submission, Student, SubmissionAccessory, FairStatistics
+
+# Statuses that are counted on the fair info page
+COUNTED_STATUSES = ['approved', 'submitted']
+
+# Grade ranges by fair day
+PREK5_GRADE_RANGES = ['0_pk-2', '1_3-5']
+GRADE612_GRADE_RANGES = ['1_6-8', '1_9-12']
+ALL_GRADE_RANGES = PREK5_GRADE_RANGES + GRADE612_GRADE_RANGES
+
+
+def _summary(approved, submitted):
+    """Counts where the approved and submitted totals are simply added together"""
+    return {
+        "approved": approved,
+        "submitted": submitted,
+        "all": approved + submitted
+    }
+
+
+def _distinct_summary(approved, submitted):
+    """Counts of distinct items, where "all" is the size of the union of both sets"""
+    return {
+        "approved": len(approved),
+        "submitted": len(submitted),
+        "all": len(approved | submitted)
+    }
+
+
+def _other_key(other_value):
+    return f"Other: {other_value or 'Blank'}"
+
+
+def _sorted_other_keys(other_values):
+    """Sort the "Other: ..." keys alphabetically, with "Other: Blank" at the end"""
+    other_keys = {_other_key(value) for value in other_values}
+    sorted_other_keys = sorted(k for k in other_keys if k != "Other: Blank")
+    if "Other: Blank" in other_keys:
+        sorted_other_keys.append("Other: Blank")
+    return sorted_other_keys
+
+
+def build_fair_statistics(fair):
+    """
+    Compute all the counts shown on the fair info page for the given fair.
+
+    The data is loaded with a handful of queries (reference data for the fair, the
+    approved/submitted submissions, and their languoid and student links), and every
+    breakdown is then computed in a single pass in memory. The result only contains
+    plain dicts and ints, so it can be serialized as JSON.
+    """
+
+    ## Reference data for the fair
+
+    categories = list(Category.objects.filter(fair=fair).values_list('id', 'name', 'material_submission'))
+    material_by_category = {category_id: material for category_id, name, material in categories}
+
+    # LanguoidManager orders "Other" first, then case-insensitively by name
+    languoids = list(Languoid.objects.filter(fair=fair).values_list('id', 'name'))
+    other_languoid_id = next((languoid_id for languoid_id, name in languoids if name == 'Other'), None)
+    named_languoids = [(languoid_id, name) for languoid_id, name in languoids if name != 'Other']
+    named_languoid_ids = {languoid_id for languoid_id, name in named_languoids}
+
+    ## Approved and submitted submissions, with their languoids and students
+
+    submissions = {}
+    for submission_id, status, category_id, grade_range, other_languoid, user_id, organization in (
+        Submission.objects.filter(fair=fair, status__in=COUNTED_STATUSES)
+        .order_by()
+        .values_list('id', 'status', 'category_id', 'grade_range', 'other_languoid', 'user_id', 'user__organization')
+    ):
+        submissions[submission_id] = {
+            'status': status,
+            'category_id': category_id,
+            'grade_range': grade_range,
+            'other_languoid': other_languoid,
+            'user_id': user_id,
+            # programs are users with an organization (matches exclude(organization=''))
+            'is_program': organization != '',
+            'languoid_ids': set(),
+            'students': [],
+        }
+
+    for submission_id, languoid_id in (
+        Submission.languoids.through.objects
+        .filter(submission__fair=fair, submission__status__in=COUNTED_STATUSES)
+        .values_list('submission_id', 'languoid_id')
+    ):
+        submissions[submission_id]['languoid_ids'].add(languoid_id)
+
+    for submission_id, student_id, tshirt_size in (
+        Submission.students.through.objects
+        .filter(submission__fair=fair, submission__status__in=COUNTED_STATUSES)
+        .values_list('submission_id', 'student_id', 'student__tshirt_size')
+    ):
+        submissions[submission_id]['students'].append((student_id, tshirt_size))
+
+    ## Single pass over the submissions
+
+    # everything below is keyed by status ("approved" or "submitted")
+    submission_counts = defaultdict(int)
+    students = defaultdict(set)
+    programs = defaultdict(set)
+    category_counts = defaultdict(int)
+    grade_range_counts = defaultdict(int)
+    languoid_counts = defaultdict(int)
+    other_counts = defaultdict(int)
+    other_values = set()
+    tshirt_students = defaultdict(set)
+    material_students = defaultdict(set)
+    non_material_students = defaultdict(set)
+    programs_by_grade_range = defaultdict(set)
+    programs_by_languoid = defaultdict(set)
+    programs_by_other = defaultdict(set)
+    students_by_languoid = defaultdict(set)
+    students_by_other = defaultdict(set)
+    languoids_by_grade_range = defaultdict(set)
+    other_values_by_grade_range = defaultdict(set)
+
+    for submission in submissions.values():
+        status = submission['status']
+        grade_range = submission['grade_range']
+        user_id = submission['user_id']
+        student_ids = {student_id for student_id, tshirt_size in submission['students']}
+        languoid_ids = submission['languoid_ids'] & named_languoid_ids
+        has_other = other_languoid_id in submission['languoid_ids']
+        other_value = submission['other_languoid']
+
+        submission_counts[status] += 1
+        students[status] |= student_ids
+        category_counts[(status, submission['category_id'])] += 1
+        grade_range_counts[(status, grade_range)] += 1
+
+        if submission['is_program']:
+            programs[status].add(user_id)
+            programs_by_grade_range[(status, grade_range)].add(user_id)
+
+        for languoid_id in languoid_ids:
+            languoid_counts[(status, languoid_id)] += 1
+            students_by_languoid[(status, languoid_id)] |= student_ids
+            languoids_by_grade_range[(status, grade_range)].add(languoid_id)
+            if submission['is_program']:
+                programs_by_languoid[(status, languoid_id)].add(user_id)
+
+        if has_other:
+            other_values.add(other_value)
+            other_counts[(status, other_value)] += 1
+            students_by_other[(status, other_value)] |= student_ids
+            other_values_by_grade_range[(status, grade_range)].add(other_value)
+            if submission['is_program']:
+                programs_by_other[(status, other_value)].add(user_id)
+
+        # material submissions are categories flagged as such; submissions without a category are neither
+        material = material_by_category.get(submission['category_id'])
+        if material is True:
+            material_students[status] |= student_ids
+        elif material is False:
+            non_material_students[status] |= student_ids
+            for student_id, tshirt_size in submission['students']:
+                tshirt_students[(status, tshirt_size)].add(student_id)
+
+    def by_status(counts, key):
+        return _summary(counts[('approved', key)], counts[('submitted', key)])
+
+    def distinct_by_status(sets, keys):
+        approved = set().union(*(sets[('approved', key)] for key in keys))
+        submitted = set().union(*(sets[('submitted', key)] for key in keys))
+        return _distinct_summary(approved, submitted)
+
+    ## Submissions
+
+    submissions_by_category = {}
+    for category_id, name, material in categories:
+        submissions_by_category[name] = by_status(category_counts, category_id)
+
+    sorted_other_keys = _sorted_other_keys(other_values)
+    other_values_by_key = defaultdict(list)
+    for other_value in other_values:
+        other_values_by_key[_other_key(other_value)].append(other_value)
+
+    def by_language(named_counts, other_counts, summarize):
+        """Build a language breakdown (named languoids, then "Other: ..." values), dropping empty rows"""
+        language_summary = {}
+        for languoid_id, name in named_languoids:
+            language_summary[name] = summarize(named_counts, [languoid_id])
+        for key in sorted_other_keys:
+            language_summary[key] = summarize(other_counts, other_values_by_key[key])
+        return {k: v for k, v in language_summary.items() if v['all'] != 0}
+
+    def summed_by_status(counts, keys):
+        return _summary(
+            sum(counts[('approved', key)] for key in keys),
+            sum(counts[('submitted', key)] for key in keys)
+        )
+
+    submissions_by_language = by_language(languoid_counts, other_counts, summed_by_status)
+
+    submissions_by_grade_range = {}
+    for grade_range, grade_range_display_value in Submission.GRADE_RANGES:
+        submissions_by_grade_range[grade_range_display_value] = by_status(grade_range_counts, grade_range)
+
+    ## Students
+
+    tshirt_sizes_summary = {}
+    for tshirt_size, tshirt_size_display_value in Student.TSHIRT_SIZES:
+        tshirt_sizes_summary[tshirt_size_display_value] = _summary(
+            len(tshirt_students[('approved', tshirt_size)]),
+            len(tshirt_students[('submitted', tshirt_size)])
+        )
+
+    # students that are only in material submissions get a bag
+    bag_count = _summary(
+        len(material_students['approved'] - non_material_students['approved']),
+        len(material_students['submitted'] - non_material_students['submitted'])
+    )
+
+    students_by_language = by_language(students_by_languoid, students_by_other, distinct_by_status)
+
+    ## Accessories
+
+    accessory_totals = defaultdict(int)
+    for accessory_id, submission_status, total in (
+        SubmissionAccessory.objects
+        .filter(accessory__fair=fair, submission__status__in=COUNTED_STATUSES)
+        .values_list('accessory_id', 'submission__status')
+        .annotate(total=Sum('count'))
+        .order_by()
+    ):
+        accessory_totals[(submission_status, accessory_id)] = total or 0
+
+    accessories_summary = {}
+    for accessory_id, name in Accessory.objects.filter(fair=fair).values_list('id', 'name'):
+        accessories_summary[name] = by_status(accessory_totals, accessory_id)
+
+    ## Programs
+
+    programs_summary = _distinct_summary(programs['approved'], programs['submitted'])
+    prek5_programs = distinct_by_status(programs_by_grade_range, PREK5_GRADE_RANGES)
+    grade612_programs = distinct_by_status(programs_by_grade_range, GRADE612_GRADE_RANGES)
+    programs_by_language = by_language(programs_by_languoid, programs_by_other, distinct_by_status)
+
+    ## Languages
+
+    def count_languages(grade_ranges):
+        # distinct named languoids, plus distinct "Other" values
+        languages = distinct_by_status(languoids_by_grade_range, grade_ranges)
+        other_languages = distinct_by_status(other_values_by_grade_range, grade_ranges)
+        return {k: languages[k] + other_languages[k] for k in languages}
+
+    prek5_languages = count_languages(PREK5_GRADE_RANGES)
+    grade612_languages = count_languages(GRADE612_GRADE_RANGES)
+    all_languages = count_languages(ALL_GRADE_RANGES)
+
+    students_summary = _distinct_summary(students['approved'], students['submitted'])
+
+    return {
+        'submissions_submitted_count': submission_counts['submitted'],
+        'submissions_approved_count': submission_counts['approved'],
+        'submissions_total_count': submission_counts['approved'] + submission_counts['submitted'],
+        'students_approved': students_summary['approved'],
+        'students_submitted': students_summary['submitted'],
+        'students_total': students_summary['all'],
+        'submissions_by_category': submissions_by_category,
+        'submissions_by_language': submissions_by_language,
+        'submissions_by_grade_range': submissions_by_grade_range,
+        'tshirt_sizes_summary': tshirt_sizes_summary,
+        'bag_count': bag_count,
+        'accessories_summary': accessories_summary,
+        'prek5_programs': prek5_programs,
+        'grade612_programs': grade612_programs,
+        'prek5_languages': prek5_languages,
+        'programs_by_language': programs_by_language,
+        'grade612_languages': grade612_languages,
+        'programs_submitted_count': programs_summary['submitted'],
+        'programs_approved_count': programs_summary['approved'],
+        'programs_total_count': programs_summary['all'],
+        'students_by_language': students_by_language,
+        'languages_submitted_count': all_languages['submitted'],
+        'languages_approved_count': all_languages['approved'],
+        'languages_total_count': all_languages['all'],
+    }
+
+
+# The breakdowns of the statistics are dicts in display order. The snapshot is stored as
+# jsonb on PostgreSQL, which doesn't keep the order of keys, so these are stored as lists
+# of [key, counts] pairs and turned back into dicts when the snapshot is read.
+ORDERED_BREAKDOWNS = (
+    'submissions_by_category',
+    'submissions_by_language',
+    'submissions_by_grade_range',
+    'tshirt_sizes_summary',
+    'accessories_summary',
+    'programs_by_language',
+    'students_by_language',
+)
+
+
+def _to_snapshot(data):
+    return {key: list(map(list, value.items())) if key in ORDERED_BREAKDOWNS else value for key, value in data.items()}
+
+
+def _from_snapshot(data):
+    return {key: dict(value) if key in ORDERED_BREAKDOWNS else value for key, value in data.items()}
+
+
+def get_fair_statistics(fair):
+    """
+    Return the statistics snapshot for the fair, rebuilding it first if it is
+    missing or has been marked stale by one of the signal receivers.
+    """
+    snapshot = FairStatistics.objects.filter(fair=fair).first()
+    if snapshot and not snapshot.stale:
+        return _from_snapshot(snapshot.data)
+    return rebuild_fair_statistics(fair)
+
+
+def rebuild_fair_statistics(fair):
+    """Recompute the statistics for the fair and store them as its snapshot"""
+    # Claim the snapshot before computing, so that an invalidation that happens
+    # while we compute leaves it stale instead of being overwritten
+    FairStatistics.objects.update_or_create(fair=fair, defaults={'stale': False})
+    data = build_fair_statistics(fair)
+    FairStatistics.objects.filter(fair=fair, stale=False).update(data=_to_snapshot(data), updated=timezone.now())
+    return data
+
+
+def invalidate_fair_statistics(fair_id):
+    """Mark the fair's snapshot as stale; it is rebuilt the next time it is read"""
+    if fair_id:
+        FairStatistics.objects.filter(fair_id=fair_id, stale=False).update(stale=True)
@@ -11,6 +11,7 @@ class SubmissionForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         selected_category = kwargs.pop('selected_category', None)
         current_fair = kwargs.pop('current_fair', None)
+        reference_data = kwargs.pop('reference_data', None)
         super(SubmissionForm, self).__init__(*args, **kwargs)
 
         # Filter the category queryset by fair
@@ -25,16 +26,30 @@ class SubmissionForm(forms.ModelForm):
         self.fields['other_languoid'].required = False
         self.fields['other_languoid'].label = "Other language name"
 
+        if reference_data is not None:
+            # render the choices from the fair's cached reference data (see reference_data.py)
+            # rather than querying for them, submitted values are still checked against the querysets
+            category_choices = [(category.pk, str(category)) for category in reference_data['categories']]
+            if self.fields['category'].empty_label is not None:
+                category_choices.insert(0, ('', self.fields['category'].empty_label))
+            self.fields['category'].choices = category_choices
+            self.fields['languoids'].choices = [(languoid.pk, str(languoid)) for languoid in reference_data['languoids']]
+
         # Only set initial category if we don't have an instance
         if selected_category and not self.instance.pk:
-            try:
-                category_instance = Category.objects.get(
-                    name=selected_category,
-                    fair=current_fair
-                )
-                self.fields['category'].initial = category_instance
-            except Category.DoesNotExist:
-                pass
+            if reference_data is not None:
+                category_instance = reference_data['categories_by_name'].get(selected_category)
+                if category_instance:
+                    self.fields['category'].initial = category_instance
+            else:
+                try:
+                    category_instance = Category.objects.get(
+                        name=selected_category,
+                        fair=current_fair
+                    )
+                    self.fields['category'].initial = category_instance
+                except Category.DoesNotExist:
+                    pass
 
         # Make the 'title' field optional in Django's server-side validation
         self.fields['title'].required = False
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from submissions.models import Fair
+from submissions.fair_stats import rebuild_fair_statistics
+
+class Command(BaseCommand):
+    help = 'Rebuilds the statistics snapshots shown on the fair info page'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fair', type=int, action='append', dest='fair_ids', help='Only rebuild the fair with this id (can be repeated)')
+
+    def handle(self, *args, **options):
+        fairs = Fair.objects.all()
+        if options['fair_ids']:
+            fairs = fairs.filter(id__in=options['fair_ids'])
+
+        for fair in fairs:
+            rebuild_fair_statistics(fair)
+            self.stdout.write(f'Rebuilt statistics for fair {fair.name}')
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt statistics for {fairs.count()} fair(s)'))
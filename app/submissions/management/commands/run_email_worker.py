@@ -0,0 +1,27 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from submissions.outbox import deliver_queued_emails, purge_sent_emails
+
+class Command(BaseCommand):
+    help = 'Sends the emails waiting in the outbox (use with EMAIL_OUTBOX_IN_PROCESS=False)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Send the emails that are currently due, then exit')
+        parser.add_argument('--interval', type=int, default=5, help='Seconds to wait between checks for new emails')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Email worker started')
+        while True:
+            count = deliver_queued_emails()
+            if count:
+                self.stdout.write(f'Sent {count} email(s)')
+            purge_sent_emails()
+
+            if options['once']:
+                break
+
+            close_old_connections()
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS('Email worker finished'))
@@ -0,0 +1,27 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from submissions.exports import run_queued_export_jobs, purge_export_jobs
+
+class Command(BaseCommand):
+    help = 'Runs queued fair export jobs (use with EXPORT_JOBS_IN_PROCESS=False)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run the jobs that are currently queued, then exit')
+        parser.add_argument('--interval', type=int, default=5, help='Seconds to wait between checks for new jobs')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Export worker started')
+        while True:
+            count = run_queued_export_jobs()
+            if count:
+                self.stdout.write(f'Ran {count} export job(s)')
+            purge_export_jobs()
+
+            if options['once']:
+                break
+
+            close_old_connections()
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS('Export worker finished'))
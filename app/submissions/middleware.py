@@ -1,6 +1,14 @@
 import os
 import time
+import logging
+from contextlib import ExitStack
 from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from .current_fair import get_current_fair
+from .request_stats import QueryRecorder, record_request
+
+logger = logging.getLogger(__name__)
 
 class DemoTimestampMiddleware:
     def __init__(self, get_response):
@@ -23,4 +31,53 @@ class DemoTimestampMiddleware:
             with open(self.modified_file, 'w') as f:
                 f.write(str(int(time.time())))
         
-        return response
\ No newline at end of file
+        return response
+
+
+class CurrentFairMiddleware:
+    """Resolve the current fair once per request, available as request.current_fair"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        get_current_fair(request)
+        return self.get_response(request)
+
+
+class RequestStatsMiddleware:
+    """
+    Record the wall time, query count and database time of each request per view (see
+    request_stats.py), and log the requests slower than SLOW_REQUEST_MS along with the
+    queries they spent the most time on. Only used when REQUEST_STATS_ENABLED is on.
+    """
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_STATS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        resolver_match = getattr(request, 'resolver_match', None)
+        view_name = (resolver_match.view_name or resolver_match._func_path) if resolver_match else '(unresolved)'
+        record_request(view_name, duration, recorder.count, recorder.duration)
+
+        if duration * 1000 >= settings.SLOW_REQUEST_MS:
+            top_queries = "\n".join(
+                f"  {count}x {query_duration * 1000:.1f}ms: {sql}"
+                for sql, count, query_duration in recorder.top_fingerprints(5)
+            )
+            logger.warning(
+                f"Slow request: {request.method} {request.path} ({view_name}) took {duration * 1000:.0f}ms, "
+                f"{recorder.count} queries in {recorder.duration * 1000:.0f}ms\n{top_queries}"
+            )
+
+        return response
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.9 on 2026-10-18 14:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submissions', '0009_alter_category_accessory_verbose_names'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FairStatistics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.JSONField(blank=True, default=dict)),
+                ('stale', models.BooleanField(default=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('fair', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='fair_statistics', to='submissions.fair')),
+            ],
+            options={
+                'verbose_name': 'fair statistics',
+                'verbose_name_plural': 'fair statistics',
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.9 on 2026-10-18 14:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submissions', '0010_fairstatistics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('export_type', models.CharField(max_length=50)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='queued', max_length=12)),
+                ('file', models.FileField(blank=True, upload_to='exports/')),
+                ('file_name', models.CharField(blank=True, max_length=500)),
+                ('error', models.TextField(blank=True)),
+                ('started', models.DateTimeField(blank=True, null=True)),
+                ('finished', models.DateTimeField(blank=True, null=True)),
+                ('added', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('modified_by', models.CharField(max_length=255)),
+                ('fair', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fair_export_jobs', to='submissions.fair')),
+            ],
+            options={
+                'ordering': ['-added'],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.9 on 2026-10-18 14:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submissions', '0011_exportjob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['fair', '-updated', '-id'], name='submission_fair_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-18 15:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submissions', '0013_outboundemail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fair',
+            name='reference_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
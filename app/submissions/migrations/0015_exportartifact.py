@@ -0,0 +1,34 @@
+# Generated by Django 5.2.9 on 2026-10-18 15:26
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submissions', '0014_fair_reference_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportArtifact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('export_type', models.CharField(max_length=255)),
+                ('watermark', models.CharField(max_length=64)),
+                ('file', models.FileField(upload_to='export-cache/')),
+                ('content_type', models.CharField(max_length=255)),
+                ('content_disposition', models.CharField(blank=True, max_length=500)),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('last_used', models.DateTimeField(default=django.utils.timezone.now)),
+                ('added', models.DateTimeField(auto_now_add=True)),
+                ('fair', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fair_export_artifacts', to='submissions.fair')),
+            ],
+            options={
+                'ordering': ['-last_used'],
+                'constraints': [models.UniqueConstraint(fields=('fair', 'export_type', 'watermark'), name='exportartifact_unique_key')],
+            },
+        ),
+    ]
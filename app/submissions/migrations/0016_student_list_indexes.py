@@ -0,0 +1,27 @@
+# Generated by Django 5.2.9 on 2026-10-18 15:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submissions', '0015_exportartifact'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['fair', 'lastname', 'firstname'], name='student_fair_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['fair', 'grade', 'lastname', 'firstname'], name='student_fair_grade_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['fair', 'state', 'hometown'], name='student_fair_location_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.9 on 2026-10-18 15:56
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submissions', '0016_student_list_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='instructor',
+            index=models.Index(fields=['fair', 'user'], name='instructor_fair_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='languoid',
+            index=models.Index(models.F('fair'), models.Case(models.When(name='Other', then=models.Value(0)), default=models.Value(1), output_field=models.IntegerField()), django.db.models.functions.text.Lower('name'), name='languoid_fair_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['fair', 'user'], name='student_fair_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['fair', 'user', '-updated', '-id'], name='submission_fair_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(condition=models.Q(('poster', True)), fields=['fair', '-updated', '-id'], name='submission_fair_poster_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['fair', 'status'], name='submission_fair_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['fair', 'category'], name='submission_fair_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tribe',
+            index=models.Index(models.F('fair'), models.Case(models.When(name='Other', then=models.Value(0)), default=models.Value(1), output_field=models.IntegerField()), django.db.models.functions.text.Lower('name'), name='tribe_fair_order_idx'),
+        ),
+    ]
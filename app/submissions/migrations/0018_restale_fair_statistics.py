@@ -0,0 +1,19 @@
+from django.db import migrations
+
+
+def mark_fair_statistics_stale(apps, schema_editor):
+    # snapshots stored before the breakdowns were [key, counts] pairs have lost their order
+    # on PostgreSQL, so they are rebuilt the next time they are read (see fair_stats.py)
+    FairStatistics = apps.get_model('submissions', 'FairStatistics')
+    FairStatistics.objects.update(stale=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submissions', '0017_fair_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(mark_fair_statistics_stale, migrations.RunPython.noop),
+    ]
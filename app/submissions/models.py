@@ -1,5 +1,6 @@
 from django.db import models
 from django.db.models.functions import Lower
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 
 def get_superuser():
@@ -72,6 +73,8 @@ class Fair(models.Model):
     registration_open = models.BooleanField(default=False)
     notes = models.CharField(max_length=255, blank=True)
     material_submission_deadline = models.CharField(max_length=50, default="March 1", blank=True)
+    # bumped whenever the fair's languoids, tribes, categories or accessories change, see reference_data.py
+    reference_version = models.PositiveIntegerField(default=0)
     added = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
     modified_by = models.CharField(max_length=255)
@@ -91,14 +94,18 @@ class CurrentFair(models.Model):
     def __str__(self):
         return self.name
 
+def other_first():
+    # 0 for the 'Other' entry of a fair's languoids or tribes, which is listed first, 1 for the rest
+    return models.Case(
+        models.When(name='Other', then=models.Value(0)),
+        default=models.Value(1),
+        output_field=models.IntegerField(),
+    )
+
 class LanguoidManager(models.Manager):
     def get_queryset(self):
         return super().get_queryset().annotate(
-            is_other=models.Case(
-                models.When(name='Other', then=models.Value(0)),
-                default=models.Value(1),
-                output_field=models.IntegerField(),
-            ),
+            is_other=other_first(),
             name_lower=Lower('name')
         ).order_by('is_other', 'name_lower')
 
@@ -120,6 +127,10 @@ class Languoid(models.Model):
 
     class Meta:
         ordering = ['name']
+        indexes = [
+            # a fair's languoids in the order of LanguoidManager
+            models.Index(models.F('fair'), other_first(), Lower('name'), name='languoid_fair_order_idx'),
+        ]
     def __str__(self):
         return self.name
 
@@ -129,10 +140,7 @@ class TribeManager(models.Manager):
         return super().get_queryset().annotate(
             name_lower=Lower('name')
         ).order_by(
-            models.Case(
-                models.When(name='Other', then=models.Value(0)),
-                default=models.Value(1)
-            ),
+            other_first(),
             'name_lower'
         )
 
@@ -148,6 +156,10 @@ class Tribe(models.Model):
     
     class Meta:
         ordering = ['-fair', Lower('name')]
+        indexes = [
+            # a fair's tribes in the order of TribeManager
+            models.Index(models.F('fair'), other_first(), Lower('name'), name='tribe_fair_order_idx'),
+        ]
     def __str__(self):
         return self.name
 
@@ -162,6 +174,10 @@ class Instructor(models.Model):
     modified_by = models.CharField(max_length=255)
     class Meta:
         ordering = ['lastname', 'firstname']
+        indexes = [
+            # a user's instructors in a fair
+            models.Index(fields=['fair', 'user'], name='instructor_fair_user_idx'),
+        ]
     def __str__(self):
         return self.lastname + ', ' + self.firstname
 
@@ -204,6 +220,14 @@ class Student(models.Model):
     modified_by = models.CharField(max_length=255)
     class Meta:
         ordering = ['lastname', 'firstname']
+        indexes = [
+            # the sorts of the student list (see student_filters.py)
+            models.Index(fields=['fair', 'lastname', 'firstname'], name='student_fair_name_idx'),
+            models.Index(fields=['fair', 'grade', 'lastname', 'firstname'], name='student_fair_grade_idx'),
+            models.Index(fields=['fair', 'state', 'hometown'], name='student_fair_location_idx'),
+            # a user's students in a fair
+            models.Index(fields=['fair', 'user'], name='student_fair_user_idx'),
+        ]
     def __str__(self):
         return self.lastname + ', ' + self.firstname
 
@@ -303,9 +327,98 @@ class Submission(models.Model):
     modified_by = models.CharField(max_length=255)
     class Meta:
         ordering = ['-fair', 'title']
+        indexes = [
+            # cursor pagination of submission_list
+            models.Index(fields=['fair', '-updated', '-id'], name='submission_fair_updated_idx'),
+            # a user's submissions in a fair, newest first (submission_list with a user_id)
+            models.Index(fields=['fair', 'user', '-updated', '-id'], name='submission_fair_user_idx'),
+            # the pages of poster_list
+            models.Index(fields=['fair', '-updated', '-id'], condition=models.Q(poster=True), name='submission_fair_poster_idx'),
+            # the status and category filters of the moderation pages, exports and statistics
+            models.Index(fields=['fair', 'status'], name='submission_fair_status_idx'),
+            models.Index(fields=['fair', 'category'], name='submission_fair_category_idx'),
+        ]
     def __str__(self):
         return "(" + self.fair.name + ") " + self.title
 
+class FairStatistics(models.Model):
+    # snapshot of the counts shown on the fair info page, see fair_stats.py
+    fair = models.OneToOneField('Fair', related_name='fair_statistics', on_delete=models.CASCADE)
+    data = models.JSONField(default=dict, blank=True)
+    stale = models.BooleanField(default=True)
+    updated = models.DateTimeField(auto_now=True)
+    class Meta:
+        verbose_name = 'fair statistics'
+        verbose_name_plural = 'fair statistics'
+    def __str__(self):
+        return "(" + self.fair.name + ") statistics"
+
+class ExportJob(models.Model):
+    # background build of a fair export (see exports.py)
+    EXPORT_STATUS = (('queued', 'Queued'),
+                    ('running', 'Running'),
+                    ('completed', 'Completed'),
+                    ('failed', 'Failed'))
+    fair = models.ForeignKey('Fair', related_name='fair_export_jobs', on_delete=models.CASCADE)
+    export_type = models.CharField(max_length=50)
+    status = models.CharField(max_length=12, choices=EXPORT_STATUS, default="queued")
+    file = models.FileField(upload_to='exports/', blank=True)
+    file_name = models.CharField(max_length=500, blank=True)
+    error = models.TextField(blank=True)
+    started = models.DateTimeField(null=True, blank=True)
+    finished = models.DateTimeField(null=True, blank=True)
+    added = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+    modified_by = models.CharField(max_length=255)
+    class Meta:
+        ordering = ['-added']
+    def __str__(self):
+        return "(" + self.fair.name + ") " + self.export_type + " export"
+
+class ExportArtifact(models.Model):
+    # a stored download of a fair export, reused while the fair's data is unchanged (see export_cache.py)
+    fair = models.ForeignKey('Fair', related_name='fair_export_artifacts', on_delete=models.CASCADE)
+    export_type = models.CharField(max_length=255)
+    watermark = models.CharField(max_length=64)
+    file = models.FileField(upload_to='export-cache/')
+    content_type = models.CharField(max_length=255)
+    content_disposition = models.CharField(max_length=500, blank=True)
+    size = models.PositiveBigIntegerField(default=0)
+    last_used = models.DateTimeField(default=timezone.now)
+    added = models.DateTimeField(auto_now_add=True)
+    class Meta:
+        ordering = ['-last_used']
+        constraints = [
+            models.UniqueConstraint(fields=['fair', 'export_type', 'watermark'], name='exportartifact_unique_key'),
+        ]
+    def __str__(self):
+        return "(" + self.fair.name + ") " + self.export_type + " artifact"
+
+class OutboundEmail(models.Model):
+    # email waiting to be delivered by the outbox (see outbox.py)
+    EMAIL_STATUS = (('queued', 'Queued'),
+                    ('sending', 'Sending'),
+                    ('sent', 'Sent'),
+                    ('failed', 'Failed'))
+    subject = models.CharField(max_length=998)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255, blank=True)
+    recipients = models.JSONField(default=list)
+    status = models.CharField(max_length=12, choices=EMAIL_STATUS, default="queued")
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt = models.DateTimeField(default=timezone.now)
+    error = models.TextField(blank=True)
+    sent = models.DateTimeField(null=True, blank=True)
+    added = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+    class Meta:
+        ordering = ['-added']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt'], name='outboundemail_due_idx'),
+        ]
+    def __str__(self):
+        return self.subject
+
 # for perf in perfs:
 #     if perf.poster:
 #         print(perf.id)
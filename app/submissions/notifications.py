@@ -0,0 +1,51 @@
+# The emails sent to teachers about their submissions. Each function returns the keyword
+# arguments for queue_email (see outbox.py).
+
+STAFF_EMAIL = 'onaylf.samnoblemuseum@ou.edu'
+
+
+def _recipient_list(submission):
+    # Create recipient list excluding nal.ou.edu emails
+    recipient_list = [STAFF_EMAIL]
+    if not submission.user.email.endswith('@nal.ou.edu'):
+        recipient_list.append(submission.user.email)
+    return recipient_list
+
+
+def _short_title(submission):
+    if len(submission.title) > 40:
+        return submission.title[:40].strip() + "..."
+    return submission.title
+
+
+def submitted_email(submission, fair):
+    year = fair.name
+    material_deadline = fair.material_submission_deadline or "March 1"
+    subject = f"[ONAYLF {year}] Submission submitted: {_short_title(submission)}"
+    body = f"""Submission title: {submission.title}
+
+Thank you for registering your student's submission for the {year} ONAYLF.
+
+Please remember that your students' material submissions (Books, Comics & Cartoons, Film & Video, Mobile Video, Poster Art, and Puppet Shows) must be postmarked or submitted on or before {material_deadline}, {year}.
+
+You will receive an email when this submission is approved by ONAYLF staff.
+
+You can contact us at {STAFF_EMAIL} with any questions.
+
+Thank you,
+ONAYLF Team"""
+    return {'subject': subject, 'body': body, 'recipient_list': _recipient_list(submission)}
+
+
+def approved_email(submission, fair):
+    year = fair.name
+    subject = f"[ONAYLF {year}] Submission approved: {_short_title(submission)}"
+    body = f"""Submission title: {submission.title}
+
+Your students' submission has been approved by the ONAYLF Team. We look forward to seeing you and your students at the Fair.
+
+You can contact us at {STAFF_EMAIL} with any questions.
+
+Thank you,
+ONAYLF Team"""
+    return {'subject': subject, 'body': body, 'recipient_list': _recipient_list(submission)}
@@ -0,0 +1,170 @@
+import logging
+import threading
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction, close_old_connections
+from django.utils import timezone
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+## Email outbox
+# Emails are not sent within the request: queue_email stores an OutboundEmail row as part
+# of the current transaction, and once it is committed the email is delivered by a single
+# background thread in the web process (or by the run_email_worker management command when
+# EMAIL_OUTBOX_IN_PROCESS is off). Failed deliveries are retried with a growing delay.
+
+# Give up on an email after this many failed attempts
+MAX_ATTEMPTS = 5
+
+# Delay before the first retry; doubled for every further attempt
+RETRY_DELAY = timedelta(minutes=1)
+
+# Emails left "sending" for this long belong to a worker that died, and are queued again
+SENDING_TIMEOUT = timedelta(minutes=10)
+
+# Sent emails are removed after this long
+SENT_EMAIL_RETENTION = timedelta(days=30)
+
+_executor = None
+_retry_timer = None
+_retry_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        # one thread, so that a batch of emails goes out over a single SMTP connection
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='email-outbox')
+    return _executor
+
+
+def queue_email(subject, body, recipient_list, from_email=None):
+    """Queue an email to be sent once the current transaction commits"""
+    return queue_emails([{
+        'subject': subject,
+        'body': body,
+        'recipient_list': recipient_list,
+        'from_email': from_email,
+    }])[0]
+
+
+def queue_emails(emails):
+    """
+    Queue several emails (dicts of queue_email's arguments) with a single insert. They are
+    sent together, over one connection, once the current transaction commits.
+    """
+    queued = OutboundEmail.objects.bulk_create([
+        OutboundEmail(
+            subject=email['subject'],
+            body=email['body'],
+            from_email=email.get('from_email') or settings.DEFAULT_FROM_EMAIL or '',
+            recipients=list(email['recipient_list']),
+        )
+        for email in emails
+    ])
+
+    if queued and settings.EMAIL_OUTBOX_IN_PROCESS:
+        transaction.on_commit(_schedule_delivery)
+
+    return queued
+
+
+def _schedule_delivery():
+    _get_executor().submit(_deliver_in_thread)
+
+
+def _deliver_in_thread():
+    try:
+        deliver_queued_emails()
+        _schedule_retry()
+        # the in-process delivery stands in for the worker command, so it prunes the outbox too
+        purge_sent_emails()
+    except Exception as e:
+        logger.error(f"Error delivering queued emails: {str(e)}", exc_info=True)
+    finally:
+        # Threads get their own database connection, which is not closed by the request cycle
+        close_old_connections()
+
+
+def _schedule_retry():
+    """Wake the in-process delivery up again when the next failed email is due for a retry"""
+    global _retry_timer
+    next_attempt = OutboundEmail.objects.filter(status='queued').order_by('next_attempt').values_list('next_attempt', flat=True).first()
+    if next_attempt is None:
+        return
+    with _retry_lock:
+        if _retry_timer is not None:
+            _retry_timer.cancel()
+        delay = max((next_attempt - timezone.now()).total_seconds(), 0)
+        _retry_timer = threading.Timer(delay, _schedule_delivery)
+        _retry_timer.daemon = True
+        _retry_timer.start()
+
+
+def _retry_delay(attempts):
+    return RETRY_DELAY * (2 ** (attempts - 1))
+
+
+def deliver_queued_emails():
+    """Send all the emails that are due, over one connection. Returns the number sent."""
+    now = timezone.now()
+    OutboundEmail.objects.filter(status='sending', updated__lt=now - SENDING_TIMEOUT).update(status='queued')
+
+    sent_count = 0
+    connection = None
+    try:
+        for email_id in OutboundEmail.objects.filter(status='queued', next_attempt__lte=now).order_by('added').values_list('id', flat=True):
+            # Claim the email, so that it is only sent once even with several workers
+            claimed = OutboundEmail.objects.filter(pk=email_id, status='queued').update(status='sending', updated=timezone.now())
+            if not claimed:
+                continue
+            email = OutboundEmail.objects.get(pk=email_id)
+
+            if connection is None:
+                connection = get_connection()
+                connection.open()
+
+            try:
+                EmailMessage(
+                    subject=email.subject,
+                    body=email.body,
+                    from_email=email.from_email or None,
+                    to=email.recipients,
+                    connection=connection,
+                ).send(fail_silently=False)
+            except Exception as e:
+                email.attempts += 1
+                email.error = str(e)
+                if email.attempts >= MAX_ATTEMPTS:
+                    email.status = 'failed'
+                    logger.error(f"Giving up on email {email.id} ({email.subject}) after {email.attempts} attempts: {str(e)}")
+                else:
+                    email.status = 'queued'
+                    email.next_attempt = timezone.now() + _retry_delay(email.attempts)
+                    logger.warning(f"Error sending email {email.id} ({email.subject}), will retry: {str(e)}")
+                email.save()
+                # start over with a fresh connection, the error may have broken this one
+                connection.close()
+                connection = None
+                continue
+
+            email.attempts += 1
+            email.status = 'sent'
+            email.error = ''
+            email.sent = timezone.now()
+            email.save()
+            sent_count += 1
+            logger.info(f"Email {email.id} sent successfully: {email.subject}")
+    finally:
+        if connection is not None:
+            connection.close()
+
+    return sent_count
+
+
+def purge_sent_emails():
+    """Delete sent emails older than SENT_EMAIL_RETENTION"""
+    OutboundEmail.objects.filter(status='sent', sent__lt=timezone.now() - SENT_EMAIL_RETENTION).delete()
@@ -0,0 +1,16 @@
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class SubmissionCursorPagination(CursorPagination):
+    """Pages through submissions most recently updated first, with id breaking ties"""
+    ordering = ('-updated', '-id')
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+
+class StudentPagination(PageNumberPagination):
+    """Numbered pages of the student list, which can be sorted in several ways"""
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
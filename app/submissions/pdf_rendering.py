@@ -0,0 +1,92 @@
+import os
+import re
+import threading
+from django.conf import settings
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import Flowable
+
+# Shared pieces of the PDF reports (judging sheets, submission sheets, registration cover
+# sheets and submission cards). The fonts are registered and the banner image is decoded
+# once per process. The parts of a page that are the same on every page are drawn once per
+# document as a form XObject, and each page only refers to it.
+
+FONTS = {
+    'AboriginalSansREGULAR': 'AboriginalSansREGULAR.ttf',
+    'AboriginalSansBOLD': 'AboriginalSansBOLD.ttf',
+}
+
+_lock = threading.Lock()
+_fonts_registered = False
+_images = {}
+
+
+def register_fonts():
+    global _fonts_registered
+    with _lock:
+        if not _fonts_registered:
+            for font_name, file_name in FONTS.items():
+                pdfmetrics.registerFont(TTFont(font_name, os.path.join(settings.STATIC_ROOT, file_name)))
+            _fonts_registered = True
+
+
+def get_image(file_name):
+    """The image from STATIC_ROOT, decoded once and shared by all documents"""
+    with _lock:
+        if file_name not in _images:
+            _images[file_name] = ImageReader(os.path.join(settings.STATIC_ROOT, file_name))
+        return _images[file_name]
+
+
+def draw_form(canvas, name, draw):
+    """
+    Draw the form XObject called name on the canvas. The first time it is used in the
+    document the form is defined by calling draw(canvas).
+    """
+    if not hasattr(canvas, 'defined_forms'):
+        canvas.defined_forms = set()
+    if name not in canvas.defined_forms:
+        canvas.beginForm(name)
+        draw(canvas)
+        canvas.endForm()
+        canvas.defined_forms.add(name)
+    canvas.doForm(name)
+
+
+def draw_image(canvas, file_name, x, y, width, height):
+    """Draw the image at the given position and size, embedding it only once per document"""
+    def draw(form_canvas):
+        form_canvas.drawImage(get_image(file_name), 0, 0, width, height, mask='auto')
+    canvas.saveState()
+    canvas.translate(x, y)
+    draw_form(canvas, _form_name('Image', file_name, width, height), draw)
+    canvas.restoreState()
+
+
+def scaled_height(file_name, width):
+    """The height of the image drawn at the given width, keeping its aspect ratio"""
+    image_width, image_height = get_image(file_name).getSize()
+    return width * image_height / float(image_width)
+
+
+def _form_name(*parts):
+    # form names end up as PDF names, so keep to letters, digits and underscores
+    return re.sub(r'[^A-Za-z0-9]', '_', '_'.join(str(part) for part in parts))
+
+
+class BannerImage(Flowable):
+    """A platypus flowable for an image from STATIC_ROOT, drawn with draw_image"""
+
+    def __init__(self, file_name, width, height, hAlign='CENTER'):
+        super().__init__()
+        self.file_name = file_name
+        self.width = width
+        self.height = height
+        self.hAlign = hAlign
+
+    def wrap(self, available_width, available_height):
+        return self.width, self.height
+
+    def draw(self):
+        draw_image(self.canv, self.file_name, 0, 0, self.width, self.height)
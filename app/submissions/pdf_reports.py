@@ -0,0 +1,242 @@
+import io
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from reportlab.pdfgen import canvas as reportlab_canvas
+from reportlab.lib.pagesizes import letter as reportlab_letter
+from reportlab.lib.colors import white as reportlab_white, black as reportlab_black, Color as reportlab_Color
+from .pdf_rendering import register_fonts, draw_form, draw_image, scaled_height
+
+# Judging sheets and submission cards. The submissions are first turned into plain rows
+# (judge_sheet_rows, submission_card_rows), and the render functions draw the rows into a
+# PDF. Rendering doesn't need the database, so a fair's rows can also be split by category
+# and rendered in a pool of worker processes (render_by_category), one PDF per category.
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn rather than fork, the web process has threads and open database connections
+            _pool = ProcessPoolExecutor(max_workers=settings.PDF_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def _languoid_text(submission):
+    languoid_text = []
+    for languoid in submission.languoids.all():
+        if languoid.name == 'Other':
+            other_text = f"Other: {submission.other_languoid or 'Blank'}"
+            languoid_text.append(other_text)
+        else:
+            languoid_text.append(languoid.name)
+    return ', '.join(languoid_text)
+
+
+def judge_sheet_rows(submissions):
+    submissions = submissions.select_related('category').prefetch_related('languoids')
+    return [{
+        'category_id': submission.category_id,
+        'category': submission.category.name,
+        'organization': submission.organization,
+        'grade_range': submission.get_grade_range_display(),
+        'group': submission.group,
+        'title': submission.title,
+        'languoids': _languoid_text(submission),
+        'submission_type': submission.get_submission_type_display(),
+    } for submission in submissions]
+
+
+def submission_card_rows(submissions):
+    submissions = submissions.select_related('category').prefetch_related('languoids', 'instructors')
+    return [{
+        'category_id': submission.category_id,
+        'category': submission.category.name,
+        'organization': submission.organization,
+        'grade_range': submission.get_grade_range_display(),
+        'group': submission.group,
+        'title': submission.title,
+        'languoids': _languoid_text(submission),
+        'submission_type': submission.get_submission_type_display(),
+        'instructors': ', '.join([instructor.lastname for instructor in submission.instructors.all()]),
+    } for submission in submissions]
+
+
+def render_judge_sheets(rows, fair_name, human_readable_title, banner_image):
+    """Draw one judging sheet per row, returning the PDF"""
+    output = io.BytesIO()
+    p = reportlab_canvas.Canvas(output, pagesize=reportlab_letter)
+    p.setTitle(f'Fair {fair_name} - Judging Sheets')
+    width, height = reportlab_letter
+
+    register_fonts()
+
+    # Title banner image, with the width matching the page width (with margins)
+    image_width = width - 60  # 30px margin on each side
+    image_height = scaled_height(banner_image, image_width)
+
+    # everything but the submission's details is the same on all the sheets of a category,
+    # so it is drawn once per category (as a form) and reused
+    def draw_static_elements(p, category_name):
+        draw_image(p, banner_image, 30, height-100, image_width, image_height)
+        # Subtitle with Blue Background
+        sky_blue = reportlab_Color(0.429, 0.708, 0.982)  # RGB values for light blue
+        p.setFillColor(sky_blue)
+        rectangle_width = width * 0.8  # 80% of the page width
+        rectangle_x = (width - rectangle_width) / 2  # Calculate the x-coordinate to center the rectangle
+
+        p.rect(rectangle_x, height-140, rectangle_width, 30, fill=True, stroke=False)
+        p.setFillColor(reportlab_white)
+        p.setFont("Helvetica", 14)
+        p.drawString(130, height-130, f"{human_readable_title} {fair_name}")
+
+        p.setFillColor(reportlab_black)
+        # Horizontal Rule after Dynamic Text
+        p.line(30, height-300, width-30, height-300)
+
+        p.setFont("Helvetica", 9)
+        p.drawString(35, height-315, f"Please rate the {category_name}")
+        p.drawString(35, height-325, "using a scale of 1 to 5.")
+        p.drawString(435, height-315, "Circle score for each")
+        p.drawString(435, height-325, "critera:")
+        p.setFont("Helvetica-Bold", 9)
+        p.drawString(35, height-345, "1 = Poor")
+        p.drawString(35, height-355, "2 = Below Average")
+        p.drawString(35, height-365, "3 = Average")
+        p.drawString(35, height-375, "4 = Above Average")
+        p.drawString(35, height-385, "5 = Excellent")
+
+        # Likert-style Ratings
+        ratings = ["                                                   Use of Language:",
+                   "Originality & Creativity in Illustration & Content:",
+                   "                                                                       Effort:"]
+        y_position = height - 345  # Subtract 100 from the y-coordinate
+        for rating in ratings:
+            p.drawString(220, y_position, rating)
+            for i in range(1, 6):
+                p.drawString(420 + 15*i, y_position, str(i))
+            y_position -= 20
+
+        # Horizontal Rule after Likerts
+        p.line(30, y_position-10, width-30, y_position-10)
+
+        # Total Score Box, Comments Box, Judge Name and Signature
+        p.drawString(350, y_position-20, "Total Score:")
+        p.rect(420, y_position-40, 100, 30)
+        p.drawString(50, y_position-60, "Comments:")
+        p.rect(48, y_position-225, width-100, 150)
+        p.drawString(130, y_position-280, "Judge Name:")
+        p.line(200, y_position-280, width-130, y_position-280)
+        p.drawString(130, y_position-320, "Signature:")
+        p.line(200, y_position-320, width-130, y_position-320)
+
+        # Horizontal Rule before footer
+        p.line(30, 40, width-30, 40)
+        # Footer
+        p.setFont("Helvetica", 8)
+        p.drawString(30, 30, f"{human_readable_title} {fair_name} Judging Sheet - {category_name}")
+
+    for row in rows:
+        draw_form(p, f"JudgingSheet{row['category_id']}", lambda p: draw_static_elements(p, row['category']))
+
+        # Dynamic text drawing goes here
+        p.setFont("AboriginalSansREGULAR", 10)
+        p.drawString(30, height-155, "Program/School: ")
+        p.drawString(150, height-155, f"{row['organization']}")
+        p.drawString(30, height-175, "Grade: ")
+        p.drawString(150, height-175, f"{row['grade_range']}")
+        p.drawString(30, height-195, "Presenting Group: ")
+        p.drawString(150, height-195, f"{row['group']}")
+        p.drawString(30, height-215, "Title: ")
+        p.drawString(150, height-215, f"{row['title']}")
+        p.drawString(30, height-235, "Language: ")
+        p.drawString(150, height-235, f"{row['languoids']}")
+        p.drawString(30, height-255, "Category: ")
+        p.drawString(150, height-255, f"{row['category']}")
+        p.drawString(30, height-275, "Type: ")
+        p.drawString(150, height-275, f"{row['submission_type']}")
+
+        p.showPage()
+
+    p.save()
+    return output.getvalue()
+
+
+def render_submission_cards(rows, fair_name, banner_image):
+    """Draw the rows as submission cards, two per page, returning the PDF"""
+    output = io.BytesIO()
+    p = reportlab_canvas.Canvas(output, pagesize=reportlab_letter)
+    p.setTitle(f'Fair {fair_name} - Submission Cards')
+    width, height = reportlab_letter
+
+    register_fonts()
+
+    def draw_static_elements(p):
+        p.line(30, height-398, width-30, height-398)
+
+    # the banner and heading of a card, relative to the card's position
+    def draw_card_heading(p):
+        # Title banner image
+        draw_image(p, banner_image, 30, 30, 330, 50)
+        p.setFont("AboriginalSansBOLD", 14)
+        p.drawString(380, 60, "Submission card")
+
+    def draw_dynamic_elements(y_position, row):
+        p.saveState()
+        p.translate(0, y_position)
+        draw_form(p, 'SubmissionCardHeading', draw_card_heading)
+        p.restoreState()
+
+        # Dynamic text drawing goes here
+        p.setFont("AboriginalSansREGULAR", 10)
+        p.drawString(50, y_position, "Presenting Group: ")
+        p.drawString(80, y_position-20, f"{row['group']}")
+        p.drawString(350, y_position, "Category: ")
+        p.drawString(380, y_position-20, f"{row['category']}")
+        p.drawString(50, y_position-60, "Program/School: ")
+        p.drawString(80, y_position-80, f"{(row['organization'] or '')[:50]}")
+        p.drawString(350, y_position-60, "Grade: ")
+        p.drawString(380, y_position-80, f"{row['grade_range']}")
+        p.drawString(50, y_position-120, "Title of Presentation: ")
+        p.drawString(80, y_position-140, f"{(row['title'] or '')[:50]}")
+        p.drawString(350, y_position-120, "Type: ")
+        p.drawString(380, y_position-140, f"{row['submission_type']}")
+        p.drawString(50, y_position-180, "Language(s): ")
+        p.drawString(80, y_position-200, f"{row['languoids']}")
+        p.drawString(350, y_position-180, "Instructor(s): ")
+        p.drawString(380, y_position-200, f"{row['instructors']}")
+
+    # two cards per page
+    for i in range(0, len(rows), 2):
+        draw_form(p, 'SubmissionCardsPage', draw_static_elements)
+        draw_dynamic_elements(height-130, rows[i])
+        if i + 1 < len(rows):
+            draw_dynamic_elements(height-530, rows[i+1])
+
+        p.showPage()
+
+    p.save()
+    return output.getvalue()
+
+
+def render_by_category(render, rows, **kwargs):
+    """
+    Split the rows by category and render each category's rows with render() in the worker
+    processes. Yields (category name, PDF) pairs in the order of the rows.
+    """
+    shards = {}
+    for row in rows:
+        shards.setdefault(row['category_id'], []).append(row)
+
+    if settings.PDF_WORKERS <= 1:
+        for category_rows in shards.values():
+            yield category_rows[0]['category'], render(category_rows, **kwargs)
+        return
+
+    futures = [(category_rows[0]['category'], _get_pool().submit(render, category_rows, **kwargs)) for category_rows in shards.values()]
+    for category_name, future in futures:
+        yield category_name, future.result()
@@ -0,0 +1,63 @@
+import copy
+import threading
+from django.db.models import F
+from .models import Fair, Languoid, Tribe, Category, Accessory
+
+# The languoids, tribes, categories and accessories of a fair are read by every submission
+# form and page, but rarely change. They are loaded together into a bundle that is kept
+# in a process-level cache, tagged with the fair's reference_version. The version is
+# bumped whenever one of them is saved or deleted (see the receivers in signals.py), so
+# each request only has to check the version to know whether its copy is current.
+
+_cache_lock = threading.Lock()
+_cached_bundles = {}
+
+
+def _build_reference_data(fair_id):
+    categories = list(Category.objects.filter(fair_id=fair_id))
+    languoids = list(Languoid.objects.filter(fair_id=fair_id))
+    tribes = list(Tribe.objects.filter(fair_id=fair_id))
+    accessories = list(Accessory.objects.filter(fair_id=fair_id).select_related('fair'))
+    return {
+        'categories': categories,
+        'categories_by_id': {category.id: category for category in categories},
+        'categories_by_name': {category.name: category for category in categories},
+        'material_submission_categories': [category.name for category in categories if category.material_submission],
+        'non_material_submission_categories': [category.name for category in categories if not category.material_submission],
+        'category_list': [{'name': category.name, 'max_students': category.max_students} for category in categories],
+        'category_student_max': {category.name: category.max_students for category in categories},
+        'languoids': languoids,
+        'other_languoid_id': next((languoid.id for languoid in languoids if languoid.name == 'Other'), None),
+        'tribes': tribes,
+        'other_tribe_id': next((tribe.id for tribe in tribes if tribe.name == 'Other'), None),
+        'accessories': accessories,
+    }
+
+
+def get_fair_reference_data(fair_id, request=None):
+    """
+    Return the reference data bundle of the fair. Given the request, it is loaded only once
+    for the whole request.
+    """
+    if request is not None:
+        if not hasattr(request, 'fair_reference_data'):
+            request.fair_reference_data = {}
+        if fair_id not in request.fair_reference_data:
+            request.fair_reference_data[fair_id] = get_fair_reference_data(fair_id)
+        return request.fair_reference_data[fair_id]
+
+    version = Fair.objects.filter(pk=fair_id).values_list('reference_version', flat=True).first()
+    with _cache_lock:
+        cached = _cached_bundles.get(fair_id)
+    if cached is None or cached[0] != version:
+        # the version is read before the data, so the data is never older than its version
+        cached = (version, _build_reference_data(fair_id))
+        with _cache_lock:
+            _cached_bundles[fair_id] = cached
+    # hand out copies, so that changes made by one caller (e.g. accessory counts) don't leak into the cache
+    return copy.deepcopy(cached[1])
+
+
+def invalidate_fair_reference_data(fair_id):
+    """Mark the fair's reference data as changed, in every process"""
+    Fair.objects.filter(pk=fair_id).update(reference_version=F('reference_version') + 1)
@@ -0,0 +1,126 @@
+import re
+from collections import Counter
+from users.models import User
+from .models import Submission, Student
+
+# Data preparation for the PDF reports. Everything a report needs is fetched with a few
+# queries up front and grouped in Python, so the cost doesn't grow with the number of
+# programs.
+
+# create a mapping from display values to sorted non-display values (this should have been done in models)
+TSHIRT_SIZE_MAPPING = {
+    'Youth Small (YS)': '1_ys',
+    'Youth Medium (YM)': '2_ym',
+    'Youth Large (YL)': '3_yl',
+    'Adult Small (S)': '4_s',
+    'Adult Medium (M)': '5_m',
+    'Adult Large (L)': '6_l',
+    'Adult Extra Large (XL)': '7_xl',
+    'Adult Extra Extra Large (XXL)': '8_xxl',
+    'Adult Extra Extra Extra Large (XXXL)': '9_xxxl'
+}
+
+
+def _group_by_user(links, related_field):
+    # links are the through rows of Submission.students or Submission.instructors, in the
+    # order the people should be listed; keep each person once per user
+    grouped = {}
+    for link in links:
+        people = grouped.setdefault(link.submission.user_id, {})
+        person = getattr(link, related_field)
+        people.setdefault(person.pk, person)
+    return {user_id: list(people.values()) for user_id, people in grouped.items()}
+
+
+def registration_cover_sheets_data(fair):
+    """
+    One dictionary per program (user with students in the fair's approved submissions),
+    sorted by organization, with the people and counts shown on its registration cover sheet
+    """
+    # get a list of all the users that have students that are in the approved submissions of the fair
+    approved_submissions = Submission.objects.filter(fair=fair, status__in=["approved"])
+    users = list(User.objects.filter(student_user__submission_student__in=approved_submissions).distinct())
+    user_ids = [user.pk for user in users]
+
+    # the students and instructors in each user's submissions of the fair, sorted by name
+    student_links = (Submission.students.through.objects
+        .filter(submission__fair=fair, submission__user_id__in=user_ids)
+        .select_related('submission', 'student')
+        .order_by('student__lastname', 'student__firstname'))
+    students_by_user = _group_by_user(student_links, 'student')
+
+    instructor_links = (Submission.instructors.through.objects
+        .filter(submission__fair=fair, submission__user_id__in=user_ids)
+        .select_related('submission', 'instructor')
+        .order_by('instructor__lastname', 'instructor__firstname'))
+    instructors_by_user = _group_by_user(instructor_links, 'instructor')
+
+    # the students that are in any non-material submission of the fair
+    non_material_student_ids = set(Submission.students.through.objects.filter(
+        submission__fair=fair,
+        submission__category__fair=fair,
+        submission__category__material_submission=False,
+    ).values_list('student_id', flat=True))
+
+    # Convert GRADES to a dictionary
+    grades_dict = dict(Student.GRADES)
+
+    # make a list of dictionaries for each user, with the organization of the user, address, city and state of the user, phone, fax and email of the user
+    users_list = []
+    for user in users:
+
+        # make a clean organization name, that strips the characters that are escaped from the beginning of the organization name
+        if user.organization is not None:
+            clean_organization = re.sub(r'^\W+', '', user.organization)
+        else:
+            clean_organization = ""
+
+        students = students_by_user.get(user.pk, [])
+
+        # make a list of dictionaries for each student, with the first name, last name, grade, and tshirt size of the student
+        students_list = []
+        for student in students:
+            # Only include tshirt size if student has non-material submissions
+            tshirt_size = student.get_tshirt_size_display() if student.pk in non_material_student_ids else ""
+
+            students_list.append({
+                'firstname': student.firstname,
+                'lastname': student.lastname,
+                'grade': student.get_grade_display(),
+                'tshirt_size': tshirt_size
+            })
+
+        # using students_list, get a count of the tshirts of each size as a dictionary
+        tshirt_sizes = Counter([student['tshirt_size'] for student in students_list])
+
+        # remove the count for blank t-shirt sizes and set it to bag_count
+        bag_count = tshirt_sizes.pop('', 0)
+
+        # sort tshirt_sizes based on the non-display value of the vocabulary
+        tshirt_sizes = {k: v for k, v in sorted(tshirt_sizes.items(), key=lambda item: TSHIRT_SIZE_MAPPING[item[0]])}
+
+        instructors = instructors_by_user.get(user.pk, [])
+
+        # get the grades of the students, as display values
+        grades = [grades_dict[grade] for grade in sorted(set(student.grade for student in students))]
+
+        users_list.append({
+            'first_name': user.first_name,
+            'last_name': user.last_name,
+            'organization': clean_organization,
+            'address': user.address,
+            'city_state_zip': ", ".join(filter(None, [user.city, " ".join(filter(None, [user.state, user.zip]))])),
+            'phone': ", ".join(filter(None, [user.phone, user.alt_phone])),
+            'fax': user.fax or '',
+            'email': ', '.join(filter(None, [user.email, user.alt_email])) or '',
+            'grades': ", ".join([str(grade) for grade in grades]),
+            'students': students_list,
+            'student_count': len(students),
+            'tshirt_sizes': tshirt_sizes,
+            'bag_count': bag_count,
+            'instructors': instructors,
+            'instructor_count': len(instructors)
+        })
+
+    # sort the list of users by the organization name, ignoring None values
+    return sorted(users_list, key=lambda x: (x['organization'] is None, x['organization'].lower() if x['organization'] else ''))
@@ -0,0 +1,95 @@
+import re
+import time
+import threading
+from collections import defaultdict
+
+# Per-view request statistics collected by RequestStatsMiddleware when REQUEST_STATS_ENABLED
+# is on. The totals are kept in memory, so each web process has its own, and they are
+# lost when the process restarts.
+
+_stats_lock = threading.Lock()
+_view_stats = {}
+
+# Django passes parameters separately, so the SQL only needs placeholder lists and stray
+# literals folded to get one fingerprint per query shape
+_IN_LIST = re.compile(r'\(\s*%s(?:\s*,\s*%s)+\s*\)')
+_NUMBER = re.compile(r'\b\d+\b')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+
+
+def fingerprint(sql):
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('(...)', sql)
+    return sql
+
+
+class QueryRecorder:
+    """Database execute wrapper counting the queries of a request and the time spent on them"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = defaultdict(lambda: [0, 0.0])
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.duration += duration
+            query_stats = self.fingerprints[fingerprint(sql)]
+            query_stats[0] += 1
+            query_stats[1] += duration
+
+    def top_fingerprints(self, limit=10):
+        """The query shapes that took the most time, as (fingerprint, count, seconds)"""
+        ranked = sorted(self.fingerprints.items(), key=lambda item: item[1][1], reverse=True)
+        return [(sql, count, duration) for sql, (count, duration) in ranked[:limit]]
+
+
+def record_request(view_name, duration, query_count, query_duration):
+    with _stats_lock:
+        stats = _view_stats.setdefault(view_name, {
+            'requests': 0,
+            'total_ms': 0.0,
+            'max_ms': 0.0,
+            'total_queries': 0,
+            'max_queries': 0,
+            'total_db_ms': 0.0,
+        })
+        stats['requests'] += 1
+        stats['total_ms'] += duration * 1000
+        stats['max_ms'] = max(stats['max_ms'], duration * 1000)
+        stats['total_queries'] += query_count
+        stats['max_queries'] = max(stats['max_queries'], query_count)
+        stats['total_db_ms'] += query_duration * 1000
+
+
+def get_request_stats():
+    """Aggregated stats per view, slowest (by total time) first"""
+    with _stats_lock:
+        snapshot = [(view_name, dict(stats)) for view_name, stats in _view_stats.items()]
+
+    results = []
+    for view_name, stats in snapshot:
+        requests = stats['requests']
+        results.append({
+            'view': view_name,
+            'requests': requests,
+            'avg_ms': round(stats['total_ms'] / requests, 1),
+            'max_ms': round(stats['max_ms'], 1),
+            'total_ms': round(stats['total_ms'], 1),
+            'avg_queries': round(stats['total_queries'] / requests, 1),
+            'max_queries': stats['max_queries'],
+            'avg_db_ms': round(stats['total_db_ms'] / requests, 1),
+        })
+    results.sort(key=lambda result: result['total_ms'], reverse=True)
+    return results
+
+
+def reset_request_stats():
+    with _stats_lock:
+        _view_stats.clear()
@@ -5,6 +5,7 @@ import logging
 from django.conf import settings
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
+from submissions.current_fair import clear_current_fair_cache
 
 logger = logging.getLogger(__name__)
 
@@ -100,6 +101,9 @@ class DemoResetScheduler:
                 
             if os.path.exists(self.clean_db):
                 shutil.copy2(self.clean_db, self.live_db)
+
+                # the cached current fair came from the old database
+                clear_current_fair_cache()
                 
                 # Update the last reset timestamp
                 self.update_last_reset_timestamp()
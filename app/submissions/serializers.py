@@ -1,6 +1,10 @@
-from django.db.models import Prefetch
-from rest_framework import serializers, viewsets
-from .models import CurrentFair, Category, Submission, Instructor, Student, Accessory, SubmissionAccessory, Tribe
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.db import connections
+from django.db.models import Prefetch, Aggregate, CharField, OuterRef, Subquery, Value
+from django.db.models.functions import Concat
+from rest_framework import serializers
+from django.urls import reverse
+from .models import Category, Submission, Instructor, Student, Accessory, SubmissionAccessory, Tribe, ExportJob
 from users.models import User
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -24,6 +28,47 @@ class SubmissionSerializer(serializers.ModelSerializer):
         model = Submission
         fields = ['id', 'user', 'title', 'group', 'category', 'grade_range', 'grade_range_display', 'poster', 'submission_type', 'submission_type_display', 'instructors', 'students', 'accessories', 'instructors_status', 'students_status', 'accessories_status', 'review_status', 'status', 'status_display', 'updated']
 
+# separate the (submission title, category name) pairs joined by group_concat on SQLite,
+# and the title from the name, control characters so they can't be in a title or name
+CATEGORY_NAMES_SEPARATOR = '\x1f'
+CATEGORY_TITLE_SEPARATOR = '\x1e'
+
+class _GroupConcat(Aggregate):
+    function = 'GROUP_CONCAT'
+    output_field = CharField()
+
+def with_submission_categories(queryset):
+    """
+    Annotate students or instructors with the names of the categories of their submissions
+    (submission_category_names), computed in SQL so that serializing them doesn't take
+    queries per student or instructor
+    """
+    owner = queryset.model._meta.model_name
+    links = getattr(Submission, f'{owner}s').through.objects.filter(
+        **{owner: OuterRef('pk')}, submission__category__isnull=False
+    ).order_by().values(owner)
+    if connections[queryset.db].vendor == 'postgresql':
+        names = links.annotate(names=ArrayAgg('submission__category__name', order_by=('submission__title',)))
+    else:
+        # group_concat has no order, so each name carries its submission's title to be sorted by (see submission_category_names)
+        pairs = Concat('submission__title', Value(CATEGORY_TITLE_SEPARATOR), 'submission__category__name', output_field=CharField())
+        names = links.annotate(names=_GroupConcat(pairs, Value(CATEGORY_NAMES_SEPARATOR)))
+    return queryset.annotate(submission_category_names=Subquery(names.values('names')))
+
+def submission_category_names(obj, submissions_field):
+    """The submission_category_names annotated by with_submission_categories, or else read from the submissions"""
+    if not hasattr(obj, 'submission_category_names'):
+        submissions = getattr(obj, submissions_field).all()
+        return [submission.category.name for submission in submissions if submission.category]
+    names = obj.submission_category_names
+    if names is None:
+        return []
+    if isinstance(names, str):
+        # by submission title, as ArrayAgg orders them on PostgreSQL
+        pairs = sorted(pair.split(CATEGORY_TITLE_SEPARATOR, 1) for pair in names.split(CATEGORY_NAMES_SEPARATOR))
+        return [name for title, name in pairs]
+    return names
+
 class InstructorSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
 
@@ -31,6 +76,22 @@ class InstructorSerializer(serializers.ModelSerializer):
         model = Instructor
         fields = ['id', 'user', 'lastname', 'firstname']
 
+class InstructorCategoriesSerializer(InstructorSerializer):
+    """An instructor with the categories of their submissions, for InstructorViewSet"""
+    submission_categories = serializers.SerializerMethodField()
+
+    class Meta(InstructorSerializer.Meta):
+        fields = ['id', 'user', 'lastname', 'firstname', 'submission_categories']
+
+    def get_submission_categories(self, obj):
+        return submission_category_names(obj, 'submission_instructor')
+
+class InstructorPickerSerializer(serializers.ModelSerializer):
+    """The fields of an instructor the submission form's instructor picker uses"""
+    class Meta:
+        model = Instructor
+        fields = ['id', 'lastname', 'firstname']
+
 class StudentSerializer(serializers.ModelSerializer):
     grade_display = serializers.CharField(source='get_grade_display', read_only=True)
     submission_categories = serializers.SerializerMethodField()
@@ -40,14 +101,34 @@ class StudentSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'lastname', 'firstname', 'tribe', 'grade', 'grade_display', 'hometown', 'state', 'tshirt_size', 'submission_categories']
 
     def get_submission_categories(self, obj):
+        return submission_category_names(obj, 'submission_student')
 
-        # Get the submissions associated with the student
-        submissions = obj.submission_student.all()
+class StudentPickerSerializer(StudentSerializer):
+    """The fields of a student the submission form's student picker uses"""
+    class Meta(StudentSerializer.Meta):
+        fields = ['id', 'lastname', 'firstname', 'tribe', 'grade', 'grade_display', 'hometown', 'state', 'tshirt_size', 'submission_categories']
 
-        # Get the categories of these submissions
-        categories = [submission.category.name for submission in submissions]
+class StudentListSerializer(serializers.ModelSerializer):
+    """A row of the student list page (see student_list_get)"""
+    grade_display = serializers.CharField(source='get_grade_display', read_only=True)
+    tshirt_size_display = serializers.CharField(source='get_tshirt_size_display', read_only=True)
+    organization = serializers.CharField(source='user.organization', read_only=True)
+    tribes = serializers.SerializerMethodField()
+    submissions = serializers.SerializerMethodField()
 
-        return categories
+    class Meta:
+        model = Student
+        fields = ['id', 'lastname', 'firstname', 'grade', 'grade_display', 'hometown', 'state', 'tshirt_size_display', 'organization', 'tribes', 'submissions']
+
+    def get_tribes(self, obj):
+        return [tribe.name for tribe in obj.tribe.all()]
+
+    def get_submissions(self, obj):
+        return [{
+            'id': submission.id,
+            'title': submission.title,
+            'category': submission.category.name if submission.category else '',
+        } for submission in obj.submission_student.all()]
 
 class TribeSerializer(serializers.ModelSerializer):
     class Meta:
@@ -84,9 +165,34 @@ class SubmissionJsonSerializer(serializers.ModelSerializer):
         model = Submission
         fields = ['id', 'user', 'title', 'group', 'category', 'grade_range', 'grade_range_display', 'poster', 'submission_type', 'instructors', 'students', 'accessories', 'status', 'status_display', 'updated', 'modified_by']
 
-
-
-class PosterSerializer(serializers.ModelSerializer):
+def submission_json_queryset(submissions=None):
+    """
+    Load everything SubmissionJsonSerializer reads along with the submissions, so that
+    serializing them takes the same number of queries however many there are
+    """
+    if submissions is None:
+        submissions = Submission.objects.all()
+    return submissions.select_related('user', 'category').prefetch_related(
+        Prefetch('instructors', queryset=Instructor.objects.select_related('user')),
+        Prefetch('students', queryset=Student.objects.select_related('user').prefetch_related(
+            'tribe',
+            # for submission_categories
+            Prefetch('submission_student', queryset=Submission.objects.select_related('category')),
+        )),
+        Prefetch('submissionaccessory_set', queryset=SubmissionAccessory.objects.select_related('accessory')),
+    )
+
+
+
+class SelectableFieldsMixin:
+    """Serializers taking fields, the names of the fields to send (all of them if None)"""
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+class PosterSerializer(SelectableFieldsMixin, serializers.ModelSerializer):
     user = UserSerializer()
     students = StudentSerializer(many=True)
     grade_range_display = serializers.CharField(source='get_grade_range_display', read_only=True)
@@ -95,3 +201,19 @@ class PosterSerializer(serializers.ModelSerializer):
         model = Submission
         fields = ['id', 'user', 'title', 'students', 'grade_range_display']
 
+class ExportJobSerializer(serializers.ModelSerializer):
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    status_url = serializers.SerializerMethodField()
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ExportJob
+        fields = ['id', 'fair', 'export_type', 'status', 'status_display', 'file_name', 'error', 'added', 'finished', 'status_url', 'download_url']
+
+    def get_status_url(self, obj):
+        return reverse('export-job-get', args=[obj.id])
+
+    def get_download_url(self, obj):
+        if obj.status != 'completed':
+            return None
+        return reverse('export-job-download', args=[obj.id])
@@ -1,11 +1,17 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
 from django.dispatch import receiver
-from django.core.mail import send_mail
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db import transaction
-from .models import CurrentFair, Submission
+from django.utils import timezone
+from .models import Fair, CurrentFair, Submission, Student, Instructor, SubmissionAccessory, Category, Languoid, Tribe, Accessory, ExportArtifact
+from .fair_stats import invalidate_fair_statistics
+from .outbox import queue_email
+from .notifications import submitted_email, approved_email
+from .current_fair import get_current_fair, clear_current_fair_cache
+from .reference_data import invalidate_fair_reference_data
 import logging
+import traceback
 
 logger = logging.getLogger(__name__)
 
@@ -32,7 +38,7 @@ def update_submissions_organization(sender, instance, created, raw, update_field
                 logger.info("Organization changed - updating submissions")
                 
                 # Get current fair
-                current_fair = CurrentFair.objects.first()
+                current_fair = get_current_fair()
                 
                 if current_fair:
                     # Update all submissions for this user in the current fair
@@ -44,6 +50,10 @@ def update_submissions_organization(sender, instance, created, raw, update_field
                     logger.info(f"Updated {updated_count} submissions")
                 else:
                     logger.warning("No current fair found")
+
+                # Program counts depend on the user's organization
+                for fair_id in Submission.objects.filter(user=instance).values_list('fair_id', flat=True).distinct():
+                    invalidate_fair_statistics(fair_id)
             else:
                 logger.info("Organization unchanged - no updates needed")
                 
@@ -70,54 +80,20 @@ def mark_submission_submitted(sender, instance, created, **kwargs):
             
             instance.submitted_email_sent = True
             instance.save(update_fields=['submitted_email_sent'])
-            currentFair = CurrentFair.objects.first()
+            currentFair = get_current_fair()
             
             if not currentFair:
                 logger.error("No current fair found")
                 return
 
-            # Create recipient list excluding nal.ou.edu emails
-            recipient_list = ['onaylf.samnoblemuseum@ou.edu']
-            if not instance.user.email.endswith('@nal.ou.edu'):
-                recipient_list.append(instance.user.email)
-                
-            year = currentFair.name
-            material_deadline = currentFair.fair.material_submission_deadline or "March 1"
-            submission_title = instance.title
-            if len(submission_title) > 40:
-                short_title = submission_title[:40].strip() + "..."
-            else:
-                short_title = submission_title
-
-            subject = f"[ONAYLF {year}] Submission submitted: {short_title}"
-            body = f"""Submission title: {submission_title}
-
-Thank you for registering your student's submission for the {year} ONAYLF.
-
-Please remember that your students' material submissions (Books, Comics & Cartoons, Film & Video, Mobile Video, Poster Art, and Puppet Shows) must be postmarked or submitted on or before {material_deadline}, {year}.
-
-You will receive an email when this submission is approved by ONAYLF staff.
-
-You can contact us at onaylf.samnoblemuseum@ou.edu with any questions.
-
-Thank you,
-ONAYLF Team"""
-
-            logger.info(f"Attempting to send email with subject: {subject}")
+            email = submitted_email(instance, currentFair.fair)
+            logger.info(f"Queueing email with subject: {email['subject']}")
             
-            send_mail(
-                subject=subject,
-                message=body,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=recipient_list,
-                fail_silently=False,
-            )
-            logger.info(f"Email sent successfully for submission {instance.id}")
+            queue_email(from_email=settings.DEFAULT_FROM_EMAIL, **email)
+            logger.info(f"Email queued for submission {instance.id}")
         except Exception as e:
-            logger.error(f"Error sending email: {str(e)}")
+            logger.error(f"Error queueing email: {str(e)}")
             logger.error(f"Error type: {type(e).__name__}")
-            # If there's a traceback available
-            import traceback
             logger.error(f"Traceback: {traceback.format_exc()}")
 
 @receiver(post_save, sender=Submission)
@@ -131,44 +107,121 @@ def at_submission_approved(sender, instance, created, **kwargs):
         try:
             instance.approved_email_sent = True
             instance.save(update_fields=['approved_email_sent'])
-            currentFair = CurrentFair.objects.first()
+            currentFair = get_current_fair()
             
             if not currentFair:
                 logger.error("No current fair found")
                 return
 
-            # Create recipient list excluding nal.ou.edu emails
-            recipient_list = ['onaylf.samnoblemuseum@ou.edu']
-            if not instance.user.email.endswith('@nal.ou.edu'):
-                recipient_list.append(instance.user.email)
-                
-            year = currentFair.name
-            submission_title = instance.title
-            if len(submission_title) > 40:
-                short_title = submission_title[:40].strip() + "..."
-            else:
-                short_title = submission_title
-
-            subject = f"[ONAYLF {year}] Submission approved: {short_title}"
-            body = f"""Submission title: {submission_title}
-
-Your students' submission has been approved by the ONAYLF Team. We look forward to seeing you and your students at the Fair.
-
-You can contact us at onaylf.samnoblemuseum@ou.edu with any questions.
-
-Thank you,
-ONAYLF Team"""
-
-            send_mail(
-                subject=subject,
-                message=body,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=recipient_list,
-                fail_silently=False,
-            )
-            logger.info(f"Approval email sent successfully for submission {instance.id}")
+            queue_email(from_email=settings.DEFAULT_FROM_EMAIL, **approved_email(instance, currentFair.fair))
+            logger.info(f"Approval email queued for submission {instance.id}")
         except Exception as e:
-            logger.error(f"Error sending approval email: {str(e)}")
+            logger.error(f"Error queueing approval email: {str(e)}")
             logger.error(f"Error type: {type(e).__name__}")
             logger.error(f"Traceback: {traceback.format_exc()}")
 
+# Keep the fair statistics snapshots (see fair_stats.py) in step with the data they count
+
+@receiver(post_save, sender=Submission)
+@receiver(post_delete, sender=Submission)
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Languoid)
+@receiver(post_delete, sender=Languoid)
+@receiver(post_save, sender=Accessory)
+@receiver(post_delete, sender=Accessory)
+def invalidate_fair_statistics_on_change(sender, instance, **kwargs):
+    invalidate_fair_statistics(instance.fair_id)
+
+@receiver(post_save, sender=SubmissionAccessory)
+@receiver(post_delete, sender=SubmissionAccessory)
+def invalidate_fair_statistics_on_accessory_change(sender, instance, **kwargs):
+    invalidate_fair_statistics(instance.submission.fair_id)
+
+@receiver(m2m_changed, sender=Submission.languoids.through)
+@receiver(m2m_changed, sender=Submission.students.through)
+def invalidate_fair_statistics_on_m2m_change(sender, instance, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        # instance is a Submission, or a Languoid/Student for reverse changes; all have a fair
+        invalidate_fair_statistics(instance.fair_id)
+
+
+# Keep Submission.updated covering changes to the rows linked to a submission, so it
+# can be used as a watermark for conditional GETs (see conditional.py)
+
+# link table between submissions and each model they link to
+SUBMISSION_LINK_TABLES = {
+    Student: Submission.students.through,
+    Instructor: Submission.instructors.through,
+    Languoid: Submission.languoids.through,
+}
+
+def touch_submissions(submission_ids):
+    Submission.objects.filter(pk__in=submission_ids).update(updated=timezone.now())
+
+def _linked_submission_ids(instance):
+    link_table = SUBMISSION_LINK_TABLES[type(instance)]
+    return list(
+        link_table.objects.filter(**{f'{instance._meta.model_name}_id': instance.pk})
+        .values_list('submission_id', flat=True)
+    )
+
+@receiver(m2m_changed, sender=Submission.languoids.through)
+@receiver(m2m_changed, sender=Submission.students.through)
+@receiver(m2m_changed, sender=Submission.instructors.through)
+def touch_submissions_on_m2m_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            touch_submissions([instance.pk])
+    elif action == 'pre_clear':
+        # pk_set is not given for clear, so remember the submissions before the links are removed
+        instance._cleared_submission_ids = _linked_submission_ids(instance)
+    elif action == 'post_clear':
+        touch_submissions(getattr(instance, '_cleared_submission_ids', []))
+    elif action in ('post_add', 'post_remove'):
+        touch_submissions(pk_set)
+
+@receiver(post_save, sender=SubmissionAccessory)
+@receiver(post_delete, sender=SubmissionAccessory)
+def touch_submission_on_accessory_change(sender, instance, **kwargs):
+    touch_submissions([instance.submission_id])
+
+@receiver(pre_delete, sender=Student)
+@receiver(pre_delete, sender=Instructor)
+@receiver(pre_delete, sender=Languoid)
+def touch_submissions_on_linked_delete(sender, instance, **kwargs):
+    # the links are removed by the cascade, which sends no m2m_changed
+    touch_submissions(_linked_submission_ids(instance))
+
+
+# The current fair is cached per process (see current_fair.py)
+
+@receiver(post_save, sender=CurrentFair)
+@receiver(post_delete, sender=CurrentFair)
+@receiver(post_save, sender=Fair)
+@receiver(post_delete, sender=Fair)
+def clear_current_fair_cache_on_change(sender, **kwargs):
+    clear_current_fair_cache()
+
+# The fair's reference data is cached per process (see reference_data.py)
+
+@receiver(post_save, sender=Languoid)
+@receiver(post_delete, sender=Languoid)
+@receiver(post_save, sender=Tribe)
+@receiver(post_delete, sender=Tribe)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Accessory)
+@receiver(post_delete, sender=Accessory)
+def invalidate_fair_reference_data_on_change(sender, instance, **kwargs):
+    invalidate_fair_reference_data(instance.fair_id)
+
+# Stored export downloads (see export_cache.py) take their file with them, including
+# when they are removed along with their fair
+
+@receiver(post_delete, sender=ExportArtifact)
+def delete_export_artifact_file(sender, instance, **kwargs):
+    if instance.file:
+        instance.file.delete(save=False)
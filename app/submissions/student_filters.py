@@ -0,0 +1,61 @@
+from django.db.models import Q, Exists, OuterRef, Value
+from django.db.models.functions import Concat
+from .models import Student, Submission
+
+# Filtering and sorting of the student list (see student_list_get). The filters come from
+# the query string, and can be given more than once (e.g. ?grade=2_01&grade=2_02):
+#   q             the name, program/school, hometown, state or a tribe contains the text
+#   grade         one of the grades
+#   category      in a submission of one of the categories ('none': in no submission)
+#   tribe         one of the tribes (ids)
+#   organization  the program/school contains the text
+# sort is one of STUDENT_SORTS, with a leading '-' for descending order.
+
+# sort -> fields. The name, grade and location sorts follow the Student indexes on the fair and these fields
+STUDENT_SORTS = {
+    'name': ('lastname', 'firstname'),
+    'grade': ('grade', 'lastname', 'firstname'),
+    'location': ('state', 'hometown', 'lastname', 'firstname'),
+    'organization': ('user__organization', 'lastname', 'firstname'),
+}
+DEFAULT_STUDENT_SORT = 'name'
+
+
+def filter_students(students, params):
+    """Apply the filters given in params (a QueryDict) to the students"""
+    if q := params.get('q', '').strip():
+        students = students.annotate(full_name=Concat('firstname', Value(' '), 'lastname')).filter(
+            Q(full_name__icontains=q)
+            | Q(user__organization__icontains=q)
+            | Q(hometown__icontains=q)
+            | Q(state__icontains=q)
+            | Exists(Student.tribe.through.objects.filter(student_id=OuterRef('pk'), tribe__name__icontains=q))
+        )
+
+    if grades := [grade for grade in params.getlist('grade') if grade]:
+        students = students.filter(grade__in=grades)
+
+    if categories := [category for category in params.getlist('category') if category]:
+        submission_links = Submission.students.through.objects.filter(student_id=OuterRef('pk'))
+        category_ids = [int(category) for category in categories if category.isdigit()]
+        condition = Exists(submission_links.filter(submission__category_id__in=category_ids))
+        if 'none' in categories:
+            condition |= ~Exists(submission_links)
+        students = students.filter(condition)
+
+    if tribe_ids := [int(tribe) for tribe in params.getlist('tribe') if tribe.isdigit()]:
+        students = students.filter(Exists(Student.tribe.through.objects.filter(student_id=OuterRef('pk'), tribe_id__in=tribe_ids)))
+
+    if organization := params.get('organization', '').strip():
+        students = students.filter(user__organization__icontains=organization)
+
+    return students
+
+
+def sort_students(students, sort):
+    """Order the students by one of STUDENT_SORTS, with the id breaking ties so that pages are stable"""
+    descending = sort.startswith('-')
+    fields = STUDENT_SORTS.get(sort.lstrip('-'), STUDENT_SORTS[DEFAULT_STUDENT_SORT])
+    if descending:
+        return students.order_by(*[f'-{field}' for field in fields], '-id')
+    return students.order_by(*fields, 'id')
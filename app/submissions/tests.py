@@ -1,3 +1,537 @@
-from django.test import TestCase
+import os
+import re
+import random
+import shutil
+import tempfile
+from unittest import mock
+from datetime import timedelta
+from django.db import connection
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.core import mail
+from django.core.files.base import ContentFile
+from django.core.mail.backends.base import BaseEmailBackend
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from users.models import User
+from .models import Fair, Languoid, Tribe, Category, Accessory, Instructor, Student, Submission, SubmissionAccessory, FairStatistics, OutboundEmail, ExportArtifact
+from .export_cache import evict_export_artifacts
+from . import outbox, views
+from .fair_stats import ORDERED_BREAKDOWNS, build_fair_statistics, get_fair_statistics, rebuild_fair_statistics
+from .serializers import SubmissionJsonSerializer, submission_json_queryset
+from .student_filters import sort_students
 
-# Create your tests here.
+
+class SubmissionJsonQuerysetTests(TestCase):
+    def setUp(self):
+        self.fair = Fair.objects.create(name='2025', modified_by='test')
+        self.tribe = Tribe.objects.create(fair=self.fair, name='Tribe', modified_by='test')
+        self.category = Category.objects.create(fair=self.fair, name='Poster', material_submission=True, modified_by='test')
+        self.accessory = Accessory.objects.create(fair=self.fair, name='Chair', modified_by='test')
+
+    def add_submissions(self, count):
+        for i in range(count):
+            user = User.objects.create_user(email=f'user{Submission.objects.count()}@example.com', password='test')
+            instructor = Instructor.objects.create(fair=self.fair, user=user, firstname='Instructor', lastname=str(i), modified_by='test')
+            students = []
+            for j in range(2):
+                student = Student.objects.create(fair=self.fair, user=user, firstname=f'Student{j}', lastname=str(i), grade='2_03', modified_by='test')
+                student.tribe.add(self.tribe)
+                students.append(student)
+            submission = Submission.objects.create(fair=self.fair, user=user, title=f'Submission {i}', category=self.category, modified_by='test')
+            submission.instructors.add(instructor)
+            submission.students.add(*students)
+            SubmissionAccessory.objects.create(submission=submission, accessory=self.accessory, count=1)
+
+    def count_export_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            data = SubmissionJsonSerializer(submission_json_queryset(Submission.objects.filter(fair=self.fair)), many=True).data
+        return len(queries), data
+
+    def test_query_count_does_not_depend_on_submission_count(self):
+        self.add_submissions(2)
+        few_queries, few_data = self.count_export_queries()
+        self.add_submissions(5)
+        many_queries, many_data = self.count_export_queries()
+
+        self.assertEqual(len(few_data), 2)
+        self.assertEqual(len(many_data), 7)
+        self.assertEqual(few_queries, many_queries)
+
+    def test_matches_unoptimized_serialization(self):
+        self.add_submissions(3)
+        submissions = Submission.objects.filter(fair=self.fair).order_by('id')
+        expected = SubmissionJsonSerializer(submissions, many=True).data
+        _, data = self.count_export_queries()
+        self.assertEqual(sorted(data, key=lambda submission: submission['id']), list(expected))
+
+
+class QueryPlanTests(TestCase):
+    """The per-fair queries of the busiest views use an index rather than reading whole tables"""
+    FAIRS = 20
+    USERS = 10
+    SUBMISSIONS_PER_USER = 15
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.fairs = Fair.objects.bulk_create([Fair(name=str(2000 + i), modified_by='test') for i in range(cls.FAIRS)])
+        cls.users = [User.objects.create_user(email=f'user{i}@example.com', password='test') for i in range(cls.USERS)]
+        Languoid.objects.bulk_create([Languoid(fair=fair, name=name, glottocode='g', isocode='i', modified_by='test') for fair in cls.fairs for name in ['Other', *[f'Languoid {i}' for i in range(30)]]])
+        Tribe.objects.bulk_create([Tribe(fair=fair, name=name, modified_by='test') for fair in cls.fairs for name in ['Other', *[f'Tribe {i}' for i in range(30)]]])
+        Category.objects.bulk_create([Category(fair=fair, name=f'Category {i}', modified_by='test') for fair in cls.fairs for i in range(5)])
+        categories = list(Category.objects.all())
+        Instructor.objects.bulk_create([Instructor(fair=fair, user=user, firstname='Instructor', lastname=str(i), modified_by='test') for fair in cls.fairs for user in cls.users for i in range(2)])
+        Student.objects.bulk_create([Student(fair=fair, user=user, firstname='Student', lastname=str(i), grade=Student.GRADES[i % len(Student.GRADES)][0], modified_by='test') for fair in cls.fairs for user in cls.users for i in range(15)])
+        Submission.objects.bulk_create([
+            Submission(
+                fair=category.fair, user=user, title=f'Submission {i}', category=category, poster=i % 4 == 0,
+                status=Submission.PERFORMANCE_STATUS[i % len(Submission.PERFORMANCE_STATUS)][0], modified_by='test',
+            )
+            for user in cls.users for i in range(cls.SUBMISSIONS_PER_USER) for category in categories[i % 5::5]
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        cls.fair = cls.fairs[-1]
+        cls.user = cls.users[-1]
+        cls.category = Category.objects.filter(fair=cls.fair).first()
+
+    def assertUsesIndex(self, queryset, index=None):
+        table = queryset.model._meta.db_table
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # the test tables are small enough for Postgres to prefer reading them whole,
+                # the question is whether there is an index it can use
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = queryset.explain()
+        if connection.vendor == 'postgresql':
+            sequential = f'Seq Scan on {table}' in plan
+        else:
+            # SQLite SEARCHes an index, or SCANs the table (or a whole index)
+            sequential = re.search(rf'\bSCAN {table}\b', plan) is not None
+        self.assertFalse(sequential, f'{table} is read sequentially:\n{plan}')
+        if index:
+            self.assertIn(index, plan)
+
+    def test_submission_list(self):
+        self.assertUsesIndex(Submission.objects.filter(fair=self.fair).order_by('-updated', '-id')[:100], 'submission_fair_updated_idx')
+
+    def test_submission_list_of_user(self):
+        self.assertUsesIndex(Submission.objects.filter(fair=self.fair, user=self.user).order_by('-updated', '-id')[:100], 'submission_fair_user_idx')
+
+    def test_poster_list(self):
+        self.assertUsesIndex(Submission.objects.filter(fair=self.fair, poster=True).order_by('-updated', '-id')[:100], 'submission_fair_poster_idx')
+
+    def test_submissions_by_status(self):
+        self.assertUsesIndex(Submission.objects.filter(fair=self.fair, status='approved'), 'submission_fair_status_idx')
+
+    def test_submissions_by_category(self):
+        self.assertUsesIndex(Submission.objects.filter(fair=self.fair, category=self.category), 'submission_fair_category_idx')
+
+    def test_students_of_user(self):
+        self.assertUsesIndex(Student.objects.filter(fair=self.fair, user=self.user), 'student_fair_user_idx')
+
+    def test_instructors_of_user(self):
+        self.assertUsesIndex(Instructor.objects.filter(fair=self.fair, user=self.user), 'instructor_fair_user_idx')
+
+    def test_student_list_sorts(self):
+        for sort, index in [('name', 'student_fair_name_idx'), ('-name', 'student_fair_name_idx'), ('grade', 'student_fair_grade_idx'), ('location', 'student_fair_location_idx')]:
+            with self.subTest(sort=sort):
+                self.assertUsesIndex(sort_students(Student.objects.filter(fair=self.fair), sort)[:50], index)
+
+    def test_languoids_and_tribes(self):
+        # SQLite doesn't match the 'Other' of the managers' ordering, a query parameter, with the
+        # one in languoid_fair_order_idx and tribe_fair_order_idx, so only the fair's index is certain
+        self.assertUsesIndex(Languoid.objects.filter(fair=self.fair))
+        self.assertUsesIndex(Tribe.objects.filter(fair=self.fair))
+
+
+def _per_count_fair_statistics(fair):
+    """The counts of the fair info page with a COUNT query each, as fair_detail worked them out before fair_stats.py"""
+    approved = Submission.objects.filter(fair=fair, status='approved')
+    submitted = Submission.objects.filter(fair=fair, status='submitted')
+    both = approved | submitted
+    programs = User.objects.exclude(organization='')
+    languoids = Languoid.objects.filter(fair=fair)
+    other = languoids.filter(name='Other').first()
+    prek5, grade612 = ['0_pk-2', '1_3-5'], ['1_6-8', '1_9-12']
+
+    def summed(count):
+        # "all" is the sum of the approved and submitted counts
+        approved_count, submitted_count = count(approved), count(submitted)
+        return {'approved': approved_count, 'submitted': submitted_count, 'all': approved_count + submitted_count}
+
+    def distinct(count):
+        # "all" is counted over the approved and submitted submissions together
+        return {'approved': count(approved), 'submitted': count(submitted), 'all': count(both)}
+
+    def by_language(named, other_value):
+        counts = {languoid.name: named(languoid) for languoid in languoids.exclude(name='Other')}
+        if other:
+            values = set(both.filter(languoids=other).values_list('other_languoid', flat=True))
+            for value in sorted(value for value in values if value) + ([''] if '' in values else []):
+                counts[f"Other: {value or 'Blank'}"] = other_value(value)
+        return {key: value for key, value in counts.items() if value['all'] != 0}
+
+    def count_languages(submissions, grade_ranges):
+        count = languoids.exclude(name='Other').filter(submission_languoids__in=submissions, submission_languoids__grade_range__in=grade_ranges).distinct().count()
+        if other:
+            count += len(set(submissions.filter(languoids=other, grade_range__in=grade_ranges).values_list('other_languoid', flat=True)))
+        return count
+
+    def students_in(submissions):
+        return Student.objects.filter(submission_student__in=submissions)
+
+    students = distinct(lambda submissions: students_in(submissions).distinct().count())
+    program_counts = distinct(lambda submissions: programs.filter(submission_user__in=submissions).distinct().count())
+    languages = distinct(lambda submissions: count_languages(submissions, prek5 + grade612))
+    return {
+        'submissions_submitted_count': submitted.count(),
+        'submissions_approved_count': approved.count(),
+        'submissions_total_count': approved.count() + submitted.count(),
+        'students_approved': students['approved'],
+        'students_submitted': students['submitted'],
+        'students_total': students['all'],
+        'submissions_by_category': {
+            category.name: summed(lambda submissions: submissions.filter(category=category).count())
+            for category in Category.objects.filter(fair=fair)
+        },
+        'submissions_by_language': by_language(
+            lambda languoid: summed(lambda submissions: submissions.filter(languoids=languoid).count()),
+            lambda value: summed(lambda submissions: submissions.filter(languoids=other, other_languoid=value).count()),
+        ),
+        'submissions_by_grade_range': {
+            display: summed(lambda submissions: submissions.filter(grade_range=grade_range).count())
+            for grade_range, display in Submission.GRADE_RANGES
+        },
+        'tshirt_sizes_summary': {
+            display: summed(lambda submissions: submissions.filter(category__material_submission=False, students__tshirt_size=size).values('students').distinct().count())
+            for size, display in Student.TSHIRT_SIZES
+        },
+        # students in material submissions who are not in a non-material one, for both statuses
+        'bag_count': summed(lambda submissions: students_in(submissions.filter(category__material_submission=True)).exclude(
+            id__in=students_in(submissions.filter(category__material_submission=False))
+        ).distinct().count()),
+        'accessories_summary': {
+            accessory.name: summed(lambda submissions: sum(SubmissionAccessory.objects.filter(accessory=accessory, submission__in=submissions).values_list('count', flat=True)))
+            for accessory in Accessory.objects.filter(fair=fair)
+        },
+        'prek5_programs': distinct(lambda submissions: programs.filter(submission_user__in=submissions, submission_user__grade_range__in=prek5).distinct().count()),
+        'grade612_programs': distinct(lambda submissions: programs.filter(submission_user__in=submissions, submission_user__grade_range__in=grade612).distinct().count()),
+        'prek5_languages': distinct(lambda submissions: count_languages(submissions, prek5)),
+        'programs_by_language': by_language(
+            lambda languoid: distinct(lambda submissions: programs.filter(submission_user__in=submissions, submission_user__languoids=languoid).distinct().count()),
+            lambda value: distinct(lambda submissions: programs.filter(submission_user__in=submissions.filter(languoids=other), submission_user__other_languoid=value).distinct().count()),
+        ),
+        'grade612_languages': distinct(lambda submissions: count_languages(submissions, grade612)),
+        'programs_submitted_count': program_counts['submitted'],
+        'programs_approved_count': program_counts['approved'],
+        'programs_total_count': program_counts['all'],
+        'students_by_language': by_language(
+            lambda languoid: distinct(lambda submissions: Student.objects.filter(submission_student__in=submissions, submission_student__languoids=languoid).distinct().count()),
+            lambda value: distinct(lambda submissions: Student.objects.filter(submission_student__in=submissions.filter(languoids=other), submission_student__other_languoid=value).distinct().count()),
+        ),
+        'languages_submitted_count': languages['submitted'],
+        'languages_approved_count': languages['approved'],
+        'languages_total_count': languages['all'],
+    }
+
+
+class FairStatisticsTests(TestCase):
+    """The counts of the fair info page (see fair_stats.py)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(1)
+        cls.fair = Fair.objects.create(name='2025', modified_by='test')
+        categories = [
+            Category.objects.create(fair=cls.fair, name=name, material_submission=material, modified_by='test')
+            for name, material in [('Song', False), ('poster', True), ('Book', True), ('Spoken', False)]
+        ]
+        languoids = [Languoid.objects.create(fair=cls.fair, name=name, glottocode='g', isocode='i', modified_by='test') for name in ['kiowa', 'Other', 'Cherokee', 'Osage']]
+        other = languoids[1]
+        accessories = [Accessory.objects.create(fair=cls.fair, name=name, modified_by='test') for name in ['Table', 'Chair']]
+        grades = [''] + [grade for grade, _ in Student.GRADES]
+        tshirt_sizes = [''] + [size for size, _ in Student.TSHIRT_SIZES]
+        for i, organization in enumerate(['Program A', 'Program B', '', None, 'Program C']):
+            user = User.objects.create_user(email=f'user{i}@example.com', password='test', organization=organization)
+            students = [
+                Student.objects.create(fair=cls.fair, user=user, firstname='Student', lastname=str(j), grade=rng.choice(grades), tshirt_size=rng.choice(tshirt_sizes), modified_by='test')
+                for j in range(5)
+            ]
+            for j in range(8):
+                submission_languoids = rng.sample(languoids, rng.randint(1, 2))
+                submission = Submission.objects.create(
+                    fair=cls.fair, user=user, title=f'Submission {i} {j}', modified_by='test',
+                    status=rng.choice([status for status, _ in Submission.PERFORMANCE_STATUS]),
+                    category=rng.choice(categories + [None]),
+                    grade_range=rng.choice([''] + [grade_range for grade_range, _ in Submission.GRADE_RANGES]),
+                    other_languoid=rng.choice(['', 'Zuni', 'apache', 'Lakota']) if other in submission_languoids else '',
+                )
+                submission.languoids.add(*submission_languoids)
+                submission.students.add(*rng.sample(students, rng.randint(0, 3)))
+                for accessory in rng.sample(accessories, rng.randint(0, 2)):
+                    SubmissionAccessory.objects.create(submission=submission, accessory=accessory, count=rng.randint(0, 3))
+
+    def test_snapshot_keeps_breakdown_order(self):
+        built = build_fair_statistics(self.fair)
+        rebuild_fair_statistics(self.fair)
+
+        # jsonb on PostgreSQL stores the keys of objects by length and then bytes
+        def jsonb(value):
+            if isinstance(value, dict):
+                return {key: jsonb(value[key]) for key in sorted(value, key=lambda key: (len(key.encode()), key.encode()))}
+            if isinstance(value, list):
+                return [jsonb(item) for item in value]
+            return value
+        snapshot = FairStatistics.objects.get(fair=self.fair)
+        FairStatistics.objects.filter(pk=snapshot.pk).update(data=jsonb(snapshot.data))
+
+        statistics = get_fair_statistics(self.fair)
+        self.assertEqual(statistics, built)
+        for key in ORDERED_BREAKDOWNS:
+            with self.subTest(key=key):
+                self.assertEqual(list(statistics[key]), list(built[key]))
+        self.assertEqual(list(statistics['submissions_by_category']), ['Book', 'poster', 'Song', 'Spoken'])
+        self.assertEqual(list(statistics['submissions_by_grade_range']), [display for _, display in Submission.GRADE_RANGES])
+        self.assertEqual(list(statistics['tshirt_sizes_summary']), [display for _, display in Student.TSHIRT_SIZES])
+        self.assertEqual(list(statistics['submissions_by_language'])[-1], 'Other: Blank')
+
+    def test_matches_per_count_calculation(self):
+        statistics = build_fair_statistics(self.fair)
+        expected = _per_count_fair_statistics(self.fair)
+        self.assertEqual(statistics, expected)
+        for key in ORDERED_BREAKDOWNS:
+            with self.subTest(key=key):
+                self.assertEqual(list(statistics[key]), list(expected[key]))
+        # the fixture covers what the counts single out
+        self.assertTrue(any(key.startswith('Other: ') and key != 'Other: Blank' for key in statistics['submissions_by_language']))
+        self.assertIn('Other: Blank', statistics['submissions_by_language'])
+        self.assertTrue(statistics['bag_count']['approved'] and statistics['bag_count']['submitted'])
+
+
+class SubmissionBulkStatusTests(TestCase):
+    url = '/api/submission/bulk-status/'
+
+    def setUp(self):
+        self.fair = Fair.objects.create(name='2025', modified_by='test')
+        self.category = Category.objects.create(fair=self.fair, name='Poster', material_submission=True, modified_by='test')
+        self.moderator = User.objects.create_user(email='moderator@example.com', password='test')
+        self.moderator.groups.add(Group.objects.create(name='moderator'))
+        self.teacher = User.objects.create_user(email='teacher@example.com', password='test')
+        self.submitted = [self.add_submission('submitted'), self.add_submission('submitted')]
+        self.in_progress = self.add_submission('in_progress')
+        self.approved = self.add_submission('approved', approved_email_sent=True)
+
+    def add_submission(self, status, **fields):
+        return Submission.objects.create(fair=self.fair, user=self.teacher, title=f'Submission {Submission.objects.count()}', category=self.category, status=status, modified_by='test', **fields)
+
+    def post(self, user, ids, new_status):
+        self.client.force_login(user)
+        return self.client.post(self.url, {'ids': ids, 'status': new_status}, content_type='application/json')
+
+    def test_requires_moderator(self):
+        response = self.post(self.teacher, [self.submitted[0].pk], 'approved')
+        self.assertEqual(response.status_code, 403)
+        self.submitted[0].refresh_from_db()
+        self.assertEqual(self.submitted[0].status, 'submitted')
+
+    def test_rejects_disallowed_transition(self):
+        response = self.post(self.moderator, [self.in_progress.pk], 'approved')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [{'id': self.in_progress.pk, 'result': 'invalid_transition', 'status': 'in_progress'}])
+        self.in_progress.refresh_from_db()
+        self.assertEqual(self.in_progress.status, 'in_progress')
+
+        response = self.post(self.moderator, [self.submitted[0].pk], 'submitted')
+        self.assertEqual(response.status_code, 400)
+
+    def test_updates_submissions_and_invalidates_statistics(self):
+        rebuild_fair_statistics(self.fair)
+        before = {submission.pk: submission.updated for submission in self.submitted}
+        ids = [submission.pk for submission in self.submitted] + [self.approved.pk, 0]
+        response = self.post(self.moderator, ids, 'in_progress')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['result'] for result in response.json()['results']], ['updated', 'updated', 'updated', 'not_found'])
+        for submission in Submission.objects.filter(pk__in=ids):
+            self.assertEqual(submission.status, 'in_progress')
+            self.assertEqual(submission.review_status, 'pending')
+            self.assertEqual(submission.modified_by, 'moderator@example.com')
+            if submission.pk in before:
+                self.assertGreater(submission.updated, before[submission.pk])
+        self.assertTrue(FairStatistics.objects.get(fair=self.fair).stale)
+
+    @override_settings(DEMO_MODE=False, EMAIL_OUTBOX_IN_PROCESS=False)
+    def test_queues_one_approval_email_per_moved_submission(self):
+        ids = [submission.pk for submission in self.submitted] + [self.approved.pk]
+        response = self.post(self.moderator, ids, 'approved')
+        self.assertEqual([result['result'] for result in response.json()['results']], ['updated', 'updated', 'unchanged'])
+        emails = list(OutboundEmail.objects.all())
+        self.assertEqual(len(emails), 2)
+        for email, submission in zip(sorted(emails, key=lambda email: email.subject), self.submitted):
+            self.assertIn(submission.title, email.subject)
+            self.assertIn('teacher@example.com', email.recipients)
+        self.assertTrue(all(Submission.objects.filter(pk__in=ids).values_list('approved_email_sent', flat=True)))
+
+        # approving them again sends nothing more
+        self.post(self.moderator, ids, 'approved')
+        self.assertEqual(OutboundEmail.objects.count(), 2)
+
+
+class ExportCacheTests(TestCase):
+    """The stored downloads of the fair exports (see export_cache.py)"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root, EXPORT_CACHE_MAX_MB=500)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.fair = Fair.objects.create(name='2025', modified_by='test')
+        category = Category.objects.create(fair=self.fair, name='Poster', material_submission=True, modified_by='test')
+        moderator = User.objects.create_user(email='moderator@example.com', password='test')
+        moderator.groups.add(Group.objects.create(name='moderator'))
+        self.submission = Submission.objects.create(fair=self.fair, user=moderator, title='Submission', category=category, status='approved', modified_by='test')
+        self.client.force_login(moderator)
+        self.build = mock.patch.object(views, 'stream_fair_export', wraps=views.stream_fair_export).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def download(self, query=''):
+        response = self.client.get(f'/api/fair/{self.fair.pk}/download/{query}')
+        self.assertEqual(response.status_code, 200)
+        content = b''.join(response.streaming_content)
+        response.close()
+        return content
+
+    def test_sends_the_stored_download_again(self):
+        first = self.download()
+        self.assertEqual(ExportArtifact.objects.filter(fair=self.fair, export_type='fair_data').count(), 1)
+        self.assertEqual(self.download(), first)
+        self.assertEqual(self.build.call_count, 1)
+
+    def test_stores_downloads_per_query_string(self):
+        self.download()
+        self.download('?split=category')
+        self.download('?split=category')
+        self.assertEqual(self.build.call_count, 2)
+        self.assertEqual(sorted(ExportArtifact.objects.values_list('export_type', flat=True)), ['fair_data', 'fair_data?split=category'])
+
+    def test_rebuilds_once_the_data_changes(self):
+        self.download()
+        artifact = ExportArtifact.objects.get()
+        self.submission.title = 'Changed'
+        self.submission.save()
+        self.download()
+        self.assertEqual(self.build.call_count, 2)
+        # the download of the older data is removed with its file
+        replacement = ExportArtifact.objects.get()
+        self.assertNotEqual(replacement.watermark, artifact.watermark)
+        self.assertFalse(os.path.exists(artifact.file.path))
+
+    def test_stores_nothing_for_a_failed_stream(self):
+        def failing_export(fair):
+            yield b'partial'
+            raise RuntimeError('build failed')
+        self.build.side_effect = failing_export
+        response = self.client.get(f'/api/fair/{self.fair.pk}/download/')
+        with self.assertRaises(RuntimeError):
+            b''.join(response.streaming_content)
+        response.close()
+        self.assertFalse(ExportArtifact.objects.exists())
+        cache_dir = os.path.join(settings.MEDIA_ROOT, 'export-cache')
+        self.assertEqual(os.listdir(cache_dir) if os.path.isdir(cache_dir) else [], [])
+
+    def test_evicts_least_recently_used(self):
+        now = timezone.now()
+        artifacts = []
+        for i in range(4):
+            artifact = ExportArtifact(fair=self.fair, export_type=f'export{i}', watermark='w', content_type='application/zip', size=400 * 1024, last_used=now - timedelta(hours=4 - i))
+            artifact.file.save(f'export{i}', ContentFile(b'x' * artifact.size), save=False)
+            artifact.save()
+            artifacts.append(artifact)
+        with override_settings(EXPORT_CACHE_MAX_MB=1):
+            evict_export_artifacts()
+        # 1600KB goes down to 800KB, keeping the two used last
+        self.assertEqual(sorted(ExportArtifact.objects.values_list('export_type', flat=True)), ['export2', 'export3'])
+        self.assertEqual([os.path.exists(artifact.file.path) for artifact in artifacts], [False, False, True, True])
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise ConnectionRefusedError('SMTP server unavailable')
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend', EMAIL_OUTBOX_IN_PROCESS=False)
+class OutboxTests(TestCase):
+    def make_due(self, email):
+        OutboundEmail.objects.filter(pk=email.pk).update(next_attempt=timezone.now())
+
+    @override_settings(EMAIL_OUTBOX_IN_PROCESS=True)
+    def test_delivers_after_commit(self):
+        with mock.patch.object(outbox, '_schedule_delivery') as schedule_delivery:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                outbox.queue_email('Approved', 'Your submission was approved', ['student@example.com'])
+                schedule_delivery.assert_not_called()
+        self.assertEqual(len(callbacks), 1)
+        schedule_delivery.assert_called_once_with()
+        self.assertEqual(mail.outbox, [])
+
+        self.assertEqual(outbox.deliver_queued_emails(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['student@example.com'])
+        email = OutboundEmail.objects.get()
+        self.assertEqual((email.status, email.attempts), ('sent', 1))
+        self.assertIsNotNone(email.sent)
+
+    def test_retries_with_growing_delay(self):
+        email = outbox.queue_email('Approved', 'Your submission was approved', ['student@example.com'])
+        with override_settings(EMAIL_BACKEND='submissions.tests.FailingEmailBackend'):
+            for attempts in (1, 2, 3):
+                before = timezone.now()
+                self.assertEqual(outbox.deliver_queued_emails(), 0)
+                after = timezone.now()
+                email.refresh_from_db()
+                self.assertEqual((email.status, email.attempts), ('queued', attempts))
+                self.assertEqual(email.error, 'SMTP server unavailable')
+                delay = outbox.RETRY_DELAY * 2 ** (attempts - 1)
+                self.assertTrue(before + delay <= email.next_attempt <= after + delay)
+                # not due again before the delay is over
+                self.assertEqual(outbox.deliver_queued_emails(), 0)
+                email.refresh_from_db()
+                self.assertEqual(email.attempts, attempts)
+                self.make_due(email)
+
+        self.assertEqual(outbox.deliver_queued_emails(), 1)
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts, email.error), ('sent', 4, ''))
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_gives_up_after_max_attempts(self):
+        email = outbox.queue_email('Approved', 'Your submission was approved', ['student@example.com'])
+        with override_settings(EMAIL_BACKEND='submissions.tests.FailingEmailBackend'):
+            for _ in range(outbox.MAX_ATTEMPTS):
+                self.make_due(email)
+                outbox.deliver_queued_emails()
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('failed', outbox.MAX_ATTEMPTS))
+
+        self.make_due(email)
+        self.assertEqual(outbox.deliver_queued_emails(), 0)
+        self.assertEqual(mail.outbox, [])
+
+    def test_purges_old_sent_emails(self):
+        now = timezone.now()
+        emails = {
+            name: OutboundEmail.objects.create(subject=name, body='', recipients=['student@example.com'], status=status, sent=sent)
+            for name, status, sent in [
+                ('old', 'sent', now - outbox.SENT_EMAIL_RETENTION - timedelta(hours=1)),
+                ('recent', 'sent', now - outbox.SENT_EMAIL_RETENTION + timedelta(hours=1)),
+                ('failed', 'failed', None),
+                ('queued', 'queued', None),
+            ]
+        }
+        OutboundEmail.objects.filter(pk__in=[emails['failed'].pk, emails['queued'].pk]).update(added=now - timedelta(days=60))
+
+        outbox.purge_sent_emails()
+        self.assertEqual(sorted(OutboundEmail.objects.values_list('subject', flat=True)), ['failed', 'queued', 'recent'])
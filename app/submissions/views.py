@@ -1,45 +1,53 @@
-import json, os, re, copy
-from io import BytesIO
-import zipfile
-from collections import Counter
-from openpyxl import Workbook, load_workbook
-from openpyxl.styles import Color, PatternFill, Font, Border
-from openpyxl.styles.borders import Side
-from openpyxl.utils import get_column_letter
-from reportlab.pdfgen import canvas as reportlab_canvas
+import json, os
+from itertools import chain
+from urllib.parse import urlencode
 from reportlab.lib.pagesizes import letter as reportlab_letter
-from reportlab.lib.colors import white as reportlab_white, black as reportlab_black, Color as reportlab_Color
-from reportlab.platypus import Image as reportlab_Image
-from reportlab.pdfbase import pdfmetrics as reportlab_pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont as reportlab_TTFont
+from reportlab.lib.colors import Color as reportlab_Color
 from reportlab.lib import colors as reportlab_colors
-from reportlab.platypus import SimpleDocTemplate as reportlab_SimpleDocTemplate, BaseDocTemplate as reportlab_BaseDocTemplate, PageTemplate as reportlab_PageTemplate, Frame as reportlab_Frame, Table as reportlab_Table, TableStyle as reportlab_TableStyle, Paragraph as reportlab_Paragraph, Spacer as reportlab_Spacer, PageBreak as reportlab_PageBreak, HRFlowable as reportlab_HRFlowable, Flowable as reportlab_Flowable
+from reportlab.platypus import SimpleDocTemplate as reportlab_SimpleDocTemplate, Table as reportlab_Table, TableStyle as reportlab_TableStyle, Paragraph as reportlab_Paragraph, Spacer as reportlab_Spacer, PageBreak as reportlab_PageBreak, HRFlowable as reportlab_HRFlowable
 from reportlab.lib.styles import getSampleStyleSheet as reportlab_getSampleStyleSheet, ParagraphStyle as reportlab_ParagraphStyle
 from django.db import models
-from django.db.models import Min, Max, Sum, Count, Q, Prefetch
+from django.db.models import Max, Prefetch, prefetch_related_objects
 from django.db.models.functions import Coalesce, Lower
 from django.shortcuts import render, get_object_or_404, redirect
+from django.urls import reverse
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.views.generic.edit import FormView, DeleteView
 from django.views.decorators.http import require_http_methods
-from django.core.mail import send_mail
-from django.core.files.base import ContentFile
-from django.core.files.storage import default_storage
 from django.conf import settings
-from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.http import Http404, HttpResponse, StreamingHttpResponse, FileResponse
 from django.utils.html import escape
 from rest_framework import generics, viewsets, status
 from rest_framework.views import APIView
 from rest_framework.decorators import api_view
+from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.utils.encoders import JSONEncoder as DRFJSONEncoder
 from users.models import User
-from .models import STATE_CHOICES, Fair, CurrentFair, Languoid, Tribe, Submission, Category, Instructor, Student, Accessory, SubmissionAccessory
-from .serializers import CategorySerializer, SubmissionSerializer, PosterSerializer, InstructorSerializer, StudentSerializer, SubmissionAccessorySerializer, SubmissionJsonSerializer
+from .models import STATE_CHOICES, Fair, CurrentFair, Languoid, Tribe, Submission, Category, Instructor, Student, Accessory, SubmissionAccessory, ExportJob
+from .serializers import CategorySerializer, SubmissionSerializer, PosterSerializer, InstructorSerializer, InstructorCategoriesSerializer, InstructorPickerSerializer, StudentSerializer, StudentPickerSerializer, SubmissionAccessorySerializer, ExportJobSerializer, StudentListSerializer, with_submission_categories
 from .forms import SubmissionForm, SubmissionCommentsForm, InstructorForm, StudentForm, PosterForm
+from .fair_stats import get_fair_statistics, invalidate_fair_statistics
+from .pagination import SubmissionCursorPagination, StudentPagination
+from .student_filters import STUDENT_SORTS, DEFAULT_STUDENT_SORT, filter_students, sort_students
+from .current_fair import get_current_fair
+from .request_stats import get_request_stats, reset_request_stats
+from .conditional import conditional_view, queryset_watermark, combine_watermarks, ConditionalReadMixin
+from .exports import EXPORT_TYPES, stream_fair_export, fair_export_file_name, enqueue_export, resume_queued_export_job, stream_zip
+from .outbox import queue_emails
+from .notifications import approved_email
+from .assembly import save_submitted_submission
+from .reference_data import get_fair_reference_data
+from .report_data import registration_cover_sheets_data
+from .pdf_rendering import register_fonts, BannerImage
+from .export_cache import cached_export
+from .fair_cloning import clone_fair
+from .pdf_reports import judge_sheet_rows, submission_card_rows, render_judge_sheets, render_submission_cards, render_by_category
 from users.utils import generate_registration_code
+from users.roles import MODERATOR, has_role, is_moderator
 from datetime import timedelta
 
 
@@ -59,8 +67,6 @@ else:
     human_readable_title = "Oklahoma Native American Youth Language Fair"
     banner_image = "onaylf.png"
 
-def is_moderator(user):
-    return user.groups.filter(name='moderator').exists()
 
 def is_admin(user):
     return user.is_superuser or user.is_staff
@@ -69,7 +75,7 @@ def custom_500_view(request):
     return render(request, "500.html", status=500)
 
 def contact_info(request):
-    currentFair = CurrentFair.objects.first()
+    currentFair = get_current_fair(request)
 
     template = 'contact_info.html'
     context = {
@@ -77,7 +83,20 @@ def contact_info(request):
     }
     return render(request, template, context)
 
+def _submission_list_watermark(request):
+    fair_id = request.GET.get('fair_id')
+    if not fair_id:
+        current_fair = get_current_fair(request)
+        if not current_fair:
+            return None
+        fair_id = current_fair.fair_id
+    submissions = Submission.objects.filter(fair_id=fair_id)
+    if user_id := request.GET.get('user_id'):
+        submissions = submissions.filter(user_id=user_id)
+    return queryset_watermark(submissions, ('updated', 'user__updated_at', 'category__updated'))
+
 @api_view(['GET'])
+@conditional_view(_submission_list_watermark)
 def submission_list(request):
     if not request.user.is_authenticated:
         return Response({'detail': 'Authentication credentials were not provided.'}, 
@@ -88,13 +107,35 @@ def submission_list(request):
     if fair_id:
         fair = get_object_or_404(Fair, pk=fair_id)
     else:
-        current_fair = CurrentFair.objects.first()
+        current_fair = get_current_fair(request)
         if not current_fair:
             return Response({'detail': 'No current fair set.'}, status=status.HTTP_404_NOT_FOUND)
         fair = current_fair.fair
 
+    submissions = _submission_list_queryset(fair)
+
+    # Apply filters based on query parameters
+    if user_id := request.GET.get('user_id'):
+        submissions = submissions.filter(user_id=user_id)
+
+    # ?stream=ndjson streams one submission per line instead of building the whole list in memory
+    if request.GET.get('stream') == 'ndjson':
+        submissions = submissions.order_by(*SubmissionCursorPagination.ordering)
+        return StreamingHttpResponse(_stream_ndjson(submissions, SubmissionSerializer), content_type='application/x-ndjson')
+
+    # asking for a cursor or a page size returns a page of results with the link to the next page
+    if 'cursor' in request.GET or 'page_size' in request.GET:
+        paginator = SubmissionCursorPagination()
+        page = paginator.paginate_queryset(submissions, request)
+        serializer = SubmissionSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    serializer = SubmissionSerializer(submissions, many=True)
+    return Response(serializer.data)
+
+def _submission_list_queryset(fair):
     # Start with optimized query using select_related and prefetch_related
-    submissions = (Submission.objects
+    return (Submission.objects
         .select_related('user', 'category', 'fair')  # For foreign keys
         .prefetch_related(
             'students',
@@ -105,20 +146,80 @@ def submission_list(request):
         .filter(fair=fair)
     )
 
-    # Apply filters based on query parameters
-    if user_id := request.GET.get('user_id'):
+def _submission_list_bootstrap(request, fair, user_id=None):
+    """
+    The first page of submission_list for the fair (and user), as the home page would ask
+    for it, so that it can be embedded in the page instead of being fetched after loading
+    """
+    params = {'fair_id': fair.id}
+    submissions = _submission_list_queryset(fair)
+    if user_id:
+        params['user_id'] = user_id
         submissions = submissions.filter(user_id=user_id)
-    
-    serializer = SubmissionSerializer(submissions, many=True)
-    return Response(serializer.data)
 
+    paginator = SubmissionCursorPagination()
+    page = paginator.paginate_queryset(submissions, Request(request))
+    # the link to the next page points at the API rather than the page being rendered
+    params['page_size'] = paginator.page_size
+    paginator.base_url = request.build_absolute_uri(f"{reverse('submissions-get-list')}?{urlencode(params)}")
+    return {
+        'fair_id': fair.id,
+        'next': paginator.get_next_link(),
+        'results': SubmissionSerializer(page, many=True).data,
+    }
+
+def _stream_ndjson(queryset, serializer_class, chunk_size=500):
+    # iterator() with a chunk_size still runs the prefetches, one chunk at a time
+    for obj in queryset.iterator(chunk_size=chunk_size):
+        yield json.dumps(serializer_class(obj).data, cls=DRFJSONEncoder) + '\n'
+
+def _poster_list_watermark(request):
+    fair_id = request.GET.get('fair_id')
+    if not fair_id:
+        current_fair = get_current_fair(request)
+        if not current_fair:
+            return None
+        fair_id = current_fair.fair_id
+    return queryset_watermark(
+        Submission.objects.filter(fair_id=fair_id, poster=True),
+        ('updated', 'user__updated_at', 'students__updated', 'students__submission_student__category__updated')
+    )
+
+# an API view with a page of the posters of the fair (fair_id, defaulting to the current fair). ?fields=id,title,... sends only those fields.
 @api_view(['GET'])
+@conditional_view(_poster_list_watermark)
 def poster_list(request):
     if not request.user.is_authenticated:
         return Response({'detail': 'Authentication credentials were not provided.'}, status=status.HTTP_401_UNAUTHORIZED)
-    submissions = Submission.objects.filter(poster=True)
-    serializer = PosterSerializer(submissions, many=True)
-    return Response(serializer.data)
+
+    fair_id = request.GET.get('fair_id')
+    if fair_id:
+        fair = get_object_or_404(Fair, pk=fair_id)
+    else:
+        current_fair = get_current_fair(request)
+        if not current_fair:
+            return Response({'detail': 'No current fair set.'}, status=status.HTTP_404_NOT_FOUND)
+        fair = current_fair.fair
+
+    fields = None
+    if request.GET.get('fields'):
+        fields = [field.strip() for field in request.GET['fields'].split(',') if field.strip()]
+        if unknown := [field for field in fields if field not in PosterSerializer.Meta.fields]:
+            return Response({'detail': f"Unknown fields: {', '.join(unknown)}. fields can be: {', '.join(PosterSerializer.Meta.fields)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+    # only the relations of the fields being sent are loaded
+    submissions = Submission.objects.filter(fair=fair, poster=True)
+    if fields is None or 'user' in fields:
+        submissions = submissions.select_related('user')
+    if fields is None or 'students' in fields:
+        submissions = submissions.prefetch_related(
+            Prefetch('students', queryset=with_submission_categories(Student.objects.prefetch_related('tribe')))
+        )
+
+    paginator = SubmissionCursorPagination()
+    page = paginator.paginate_queryset(submissions, request)
+    serializer = PosterSerializer(page, many=True, fields=fields)
+    return paginator.get_paginated_response(serializer.data)
 
 # @api_view(['GET'])
 # def submission_poster_list(request):
@@ -145,18 +246,92 @@ def poster_list(request):
 #     serializer = SubmissionSerializer(submissions, many=True)
 #     return Response(serializer.data)
 
+def _submission_get_watermark(request, perf_pk):
+    return queryset_watermark(Submission.objects.filter(pk=perf_pk), ('updated', 'user__updated_at', 'category__updated'))
+
 @api_view(['GET'])
+@conditional_view(_submission_get_watermark)
 def submission_get(request, perf_pk):
     if not request.user.is_authenticated:
         return Response({'detail': 'Authentication credentials were not provided.'}, status=status.HTTP_401_UNAUTHORIZED)
         # Check if the user is in the "moderator" group
     submission = get_object_or_404(Submission, pk=perf_pk)
-    if not request.user.groups.filter(name='moderator').exists():
+    if not has_role(request.user, MODERATOR):
         if not request.user == submission.user:
             return Response({'detail': 'You do not have permission to perform this action.'}, status=status.HTTP_403_FORBIDDEN)
     serializer = SubmissionSerializer(submission)
     return Response(serializer.data)
 
+# The statuses a submission can be moved from, for each status the bulk endpoint can set
+BULK_STATUS_TRANSITIONS = {
+    'approved': ('submitted',),
+    'in_progress': ('submitted', 'approved'),
+    'disqualified': ('submitted', 'approved'),
+}
+
+@api_view(['POST'])
+def submission_bulk_status(request):
+    """
+    Move many submissions to a new status at once, e.g. {"ids": [1, 2, 3], "status": "approved"}.
+    The submissions are updated with one query and their approval emails are queued
+    together. Returns a result for each id: updated, unchanged, invalid_transition or not_found.
+    """
+    if not request.user.is_authenticated:
+        return Response({'detail': 'Authentication credentials were not provided.'}, status=status.HTTP_401_UNAUTHORIZED)
+    if not is_moderator(request.user):
+        return Response({'detail': 'You do not have permission to perform this action.'}, status=status.HTTP_403_FORBIDDEN)
+
+    new_status = request.data.get('status')
+    if new_status not in BULK_STATUS_TRANSITIONS:
+        return Response({'detail': f"status must be one of: {', '.join(BULK_STATUS_TRANSITIONS)}"}, status=status.HTTP_400_BAD_REQUEST)
+    ids = request.data.get('ids')
+    if not isinstance(ids, list) or not ids:
+        return Response({'detail': 'ids must be a non-empty list of submission ids.'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        ids = list(dict.fromkeys(int(submission_id) for submission_id in ids))
+    except (TypeError, ValueError):
+        return Response({'detail': 'ids must be a non-empty list of submission ids.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    results = []
+    with transaction.atomic():
+        submissions = Submission.objects.select_for_update(of=('self',)).select_related('user', 'fair').in_bulk(ids)
+
+        to_update = []
+        for submission_id in ids:
+            submission = submissions.get(submission_id)
+            if submission is None:
+                results.append({'id': submission_id, 'result': 'not_found'})
+            elif submission.status == new_status:
+                results.append({'id': submission_id, 'result': 'unchanged', 'status': submission.status})
+            elif submission.status not in BULK_STATUS_TRANSITIONS[new_status]:
+                results.append({'id': submission_id, 'result': 'invalid_transition', 'status': submission.status})
+            else:
+                to_update.append(submission)
+                results.append({'id': submission_id, 'result': 'updated', 'status': new_status})
+
+        if to_update:
+            changes = {'status': new_status, 'updated': timezone.now(), 'modified_by': request.user.get_username()}
+            if new_status == 'in_progress':
+                # unapproving sends the submission back to review, as on the home page
+                changes['review_status'] = 'pending'
+            Submission.objects.filter(pk__in=[submission.pk for submission in to_update]).update(**changes)
+
+            # update() skips the post_save receivers, so send the approval emails and
+            # refresh the fair statistics here
+            if new_status == 'approved' and not getattr(settings, 'DEMO_MODE', False):
+                to_email = [submission for submission in to_update if not submission.approved_email_sent]
+                if to_email:
+                    Submission.objects.filter(pk__in=[submission.pk for submission in to_email]).update(approved_email_sent=True)
+                    queue_emails([
+                        dict(approved_email(submission, submission.fair), from_email=settings.DEFAULT_FROM_EMAIL)
+                        for submission in to_email
+                    ])
+            for fair_id in {submission.fair_id for submission in to_update}:
+                invalidate_fair_statistics(fair_id)
+
+    logger.info(f"{request.user.get_username()} moved {len(to_update)} submission(s) to {new_status}")
+    return Response({'status': new_status, 'results': results})
+
 class CategoryUpdateView(LoginRequiredMixin, generics.UpdateAPIView):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
@@ -165,7 +340,7 @@ class CategoryUpdateView(LoginRequiredMixin, generics.UpdateAPIView):
 class InstructorAddView(APIView):
     def post(self, request):
         # Get the current fair
-        currentFair = CurrentFair.objects.first()
+        currentFair = get_current_fair(request)
         # Get the user id from the request data
         user_id = request.data.get('user_id')
 
@@ -206,11 +381,18 @@ class InstructorUpdateView(APIView):
         except Instructor.DoesNotExist:
             raise Http404
 
-class InstructorViewSet(LoginRequiredMixin, viewsets.ModelViewSet):
-    serializer_class = InstructorSerializer
+class InstructorViewSet(LoginRequiredMixin, ConditionalReadMixin, viewsets.ModelViewSet):
+    serializer_class = InstructorCategoriesSerializer
+    watermark_fields = ('updated', 'user__updated_at', 'submission_instructor__updated', 'submission_instructor__category__updated')
+
+    def get_serializer_class(self):
+        # ?picker=1 sends only what the submission form's instructor picker uses
+        if self.request.query_params.get('picker'):
+            return InstructorPickerSerializer
+        return InstructorCategoriesSerializer
 
     def get_queryset(self):
-        queryset = Instructor.objects.all()
+        queryset = with_submission_categories(Instructor.objects.select_related('user'))
         user_id = self.request.query_params.get('user_id', None)
         submission_id = self.request.query_params.get('submission_id', None)
         fair_id = self.request.query_params.get('fair_id', None)
@@ -218,7 +400,7 @@ class InstructorViewSet(LoginRequiredMixin, viewsets.ModelViewSet):
         if fair_id is not None:
             queryset = queryset.filter(fair_id=fair_id)
         elif not submission_id:  # If no fair_id and no submission_id, use current fair
-            current_fair = CurrentFair.objects.first()
+            current_fair = get_current_fair(self.request)
             if current_fair:
                 queryset = queryset.filter(fair=current_fair.fair)
 
@@ -233,7 +415,7 @@ class InstructorViewSet(LoginRequiredMixin, viewsets.ModelViewSet):
 class StudentAddView(APIView):
     def post(self, request):
         # Get the current fair
-        currentFair = CurrentFair.objects.first()
+        currentFair = get_current_fair(request)
         # Get the user id from the request data
         user_id = request.data.get('user_id')
 
@@ -267,7 +449,7 @@ class StudentAddView(APIView):
 class StudentUpdateView(APIView):
     def put(self, request, stud_pk):
         # Get the current fair
-        currentFair = CurrentFair.objects.first()
+        currentFair = get_current_fair(request)
         # Get the user id from the request data
         user_id = request.data.get('user_id')
 
@@ -300,11 +482,18 @@ class StudentUpdateView(APIView):
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class StudentViewSet(LoginRequiredMixin, viewsets.ModelViewSet):
+class StudentViewSet(LoginRequiredMixin, ConditionalReadMixin, viewsets.ModelViewSet):
     serializer_class = StudentSerializer
+    watermark_fields = ('updated', 'submission_student__updated', 'submission_student__category__updated')
+
+    def get_serializer_class(self):
+        # ?picker=1 sends only what the submission form's student picker uses
+        if self.request.query_params.get('picker'):
+            return StudentPickerSerializer
+        return StudentSerializer
 
     def get_queryset(self):
-        queryset = Student.objects.all()
+        queryset = with_submission_categories(Student.objects.prefetch_related('tribe'))
         user_id = self.request.query_params.get('user_id', None)
         submission_id = self.request.query_params.get('submission_id', None)
         fair_id = self.request.query_params.get('fair_id', None)
@@ -312,7 +501,7 @@ class StudentViewSet(LoginRequiredMixin, viewsets.ModelViewSet):
         if fair_id is not None:
             queryset = queryset.filter(fair_id=fair_id)
         elif not submission_id:  # If no fair_id and no submission_id, use current fair
-            current_fair = CurrentFair.objects.first()
+            current_fair = get_current_fair(self.request)
             if current_fair:
                 queryset = queryset.filter(fair=current_fair.fair)
 
@@ -399,7 +588,7 @@ def fair_list(request):
     fairs = Fair.objects.all()
     
     # Get the current fair (system setting)
-    current_fair = CurrentFair.objects.first()
+    current_fair = get_current_fair(request)
     
     # Get the active fair for the UI (either from URL parameter or default to current fair)
     active_fair_id = request.GET.get('fair_id')
@@ -431,11 +620,28 @@ def fair_list(request):
     }
     return render(request, 'fair_list.html', context)
 
+def _fair_reference_watermark(fair_id):
+    # the fair and its reference data
+    return combine_watermarks(
+        queryset_watermark(Fair.objects.filter(pk=fair_id)),
+        queryset_watermark(Languoid.objects.filter(fair_id=fair_id)),
+        queryset_watermark(Tribe.objects.filter(fair_id=fair_id)),
+        queryset_watermark(Category.objects.filter(fair_id=fair_id)),
+        queryset_watermark(Accessory.objects.filter(fair_id=fair_id)),
+    )
+
+def _get_fair_watermark(request, pk):
+    # get_fair also says whether the fair is the current one
+    current_fair = get_current_fair(request)
+    watermark, last_modified = _fair_reference_watermark(pk)
+    return (watermark, current_fair and current_fair.fair_id), last_modified
+
 @login_required
 @require_http_methods(["GET"])
+@conditional_view(_get_fair_watermark)
 def get_fair(request, pk):
     fair = get_object_or_404(Fair, pk=pk)
-    current_fair = CurrentFair.objects.first()
+    current_fair = get_current_fair(request)
     
     return JsonResponse({
         'id': fair.id,
@@ -754,8 +960,12 @@ def check_accessory_delete(request, fair_id, accessory_id):
     
     return JsonResponse({'associations': []})
 
+def _get_fair_data_watermark(request, fair_pk):
+    return _fair_reference_watermark(fair_pk)
+
 @login_required
 @user_passes_test(is_moderator)
+@conditional_view(_get_fair_data_watermark)
 def get_fair_data(request, fair_pk):
     try:
         fair = get_object_or_404(Fair, pk=fair_pk)
@@ -850,41 +1060,8 @@ def add_fair(request):
             # Get template fair
             template_fair = Fair.objects.get(id=template_fair_id)
             
-            # Copy languoids
-            for languoid in template_fair.fair_languoids.all():
-                new_languoid = Languoid.objects.create(
-                    fair=new_fair,
-                    name=languoid.name,
-                    glottocode=languoid.glottocode,
-                    level=languoid.level,
-                    modified_by=request.user.get_username()
-                )
-            
-            # Copy tribes
-            for tribe in template_fair.fair_tribes.all():
-                new_tribe = Tribe.objects.create(
-                    fair=new_fair,
-                    name=tribe.name,
-                    modified_by=request.user.get_username()
-                )
-            
-            # Copy categories
-            for category in template_fair.fair_categories.all():
-                new_category = Category.objects.create(
-                    fair=new_fair,
-                    name=category.name,
-                    material_submission=category.material_submission,
-                    max_students=category.max_students,
-                    modified_by=request.user.get_username()
-                )
-            
-            # Copy accessories
-            for accessory in template_fair.fair_accessories.all():
-                new_accessory = Accessory.objects.create(
-                    fair=new_fair,
-                    name=accessory.name,
-                    modified_by=request.user.get_username()
-                )
+            # Copy languoids, tribes, categories and accessories, and the rosters if asked
+            copied = clone_fair(template_fair, new_fair, request.user.get_username(), rosters=bool(data.get('copy_rosters')))
             
             # Set all fairs to registration_closed
             Fair.objects.all().update(registration_open=False)
@@ -901,6 +1078,7 @@ def add_fair(request):
             return JsonResponse({
                 'id': new_fair.id,
                 'name': new_fair.name,
+                'copied': copied,
                 'success': True
             })
             
@@ -914,9 +1092,9 @@ def home(request):
     currentUser = User.objects.get(email=currentUserEmail)
     
     # Check if the user is a moderator
-    is_moderator = currentUser.groups.filter(name='moderator').exists()
+    is_moderator = has_role(request.user, MODERATOR)
 
-    currentFair = CurrentFair.objects.first()
+    currentFair = get_current_fair(request)
 
     # First check query param, then URL param, then default to current fair
     fair_id = request.GET.get('fair_id')
@@ -926,9 +1104,9 @@ def home(request):
         fair = currentFair.fair
 
     # Add debugging
-    print(f"Fair ID being viewed: {fair.id if fair else 'None'}")
+    logger.debug(f"Fair ID being viewed: {fair.id if fair else 'None'}")
     categories = Category.objects.filter(fair=fair) if fair else []
-    print(f"Categories for this fair: {[(c.id, c.name) for c in categories]}")
+    logger.debug(f"Categories for this fair: {[(c.id, c.name) for c in categories]}")
     
     # If no fair exists, render a template informing the user
     if not fair:
@@ -940,16 +1118,10 @@ def home(request):
         }
         return render(request, template, context)
 
-    submissions = Submission.objects.prefetch_related("user", "category").filter(fair=fair)
+    # the first page of the submissions table is sent with the page, the table only asks the API for the rest
+    submissions_bootstrap = _submission_list_bootstrap(request, fair, user_id=None if is_moderator else currentUser.id)
+    submissions_bootstrap['current_fair_id'] = currentFair.fair_id
 
-    if not is_moderator:
-        submissions = submissions.filter(user=currentUser)
-
-    # Add debugging
-    print(f"Fair ID being viewed: {fair.id if fair else 'None'}")
-    categories = Category.objects.filter(fair=fair) if fair else []
-    print(f"Categories for this fair: {[(c.id, c.name) for c in categories]}")
-    
     # Create the data first so we can inspect it
     data = {
         'gradeRanges': dict(Submission.GRADE_RANGES),
@@ -977,7 +1149,7 @@ def home(request):
         'moderator': is_moderator,
         'registrationOpen': fair.registration_open,
         'currentFair': currentFair.name,
-        'submissions': submissions,
+        'submissionsBootstrap': submissions_bootstrap,
         'no_fair': fair is None,
         **json_data  # Add the JSON encoded data
 
@@ -989,10 +1161,10 @@ def home(request):
 @user_passes_test(is_moderator)
 def user_list(request):
 
-    currentFair = CurrentFair.objects.first()
+    currentFair = get_current_fair(request)
 
     # Check if the user is a moderator
-    is_moderator = request.user.groups.filter(name='moderator').exists()
+    is_moderator = has_role(request.user, MODERATOR)
 
     # Get all fair names sorted alphabetically
     fair_names = Fair.objects.values_list('name', flat=True).order_by('name')
@@ -1048,10 +1220,10 @@ def user_detail(request, user_pk):
 
     currentUser = User.objects.get(pk=user_pk)
 
-    currentFair = CurrentFair.objects.first()
+    currentFair = get_current_fair(request)
 
     # Check if the user is a moderator
-    is_moderator = request.user.groups.filter(name='moderator').exists()
+    is_moderator = has_role(request.user, MODERATOR)
 
     allSubmissions = Submission.objects.prefetch_related("user", "students").filter(fair=currentFair.fair).filter(user=currentUser.pk)
 
@@ -1072,40 +1244,32 @@ def user_detail(request, user_pk):
 @login_required
 def submission_detail(request, perf_pk):
 
-    currentFair = CurrentFair.objects.first()
+    currentFair = get_current_fair(request)
 
     # Check if the user is a moderator
-    is_moderator = request.user.groups.filter(name='moderator').exists()
+    is_moderator = has_role(request.user, MODERATOR)
 
     submission = get_object_or_404(
         Submission.objects.prefetch_related('instructors', 'students', 'accessories'),
         pk=perf_pk
     )
 
-    # get the non material submission categories for the current fair
-    non_material_submission_categories = list(Category.objects.filter(fair=currentFair.fair, material_submission=False).values_list('name', flat=True))
-    # check if this submission is a non-material submission
-    non_material_submission = submission.category.name in non_material_submission_categories
+    reference_data = get_fair_reference_data(currentFair.fair_id, request)
 
-    # Optimized accessory queries
-    accessories = Accessory.objects.filter(fair=currentFair.fair).prefetch_related(
-        'submissionaccessory_set'
-    )
-    accessory_counts = {
-        acc.id: acc.submissionaccessory_set.get(submission_id=perf_pk).count 
-        for acc in accessories 
-        if acc.submissionaccessory_set.filter(submission_id=perf_pk).exists()
-    }
+    # check if this submission is a non-material submission (for the current fair)
+    non_material_submission = submission.category.name in reference_data['non_material_submission_categories']
 
     # Update the count attribute of each accessory with the count from the submission_accessories
+    accessories = reference_data['accessories']
+    accessory_counts = dict(SubmissionAccessory.objects.filter(submission_id=perf_pk).values_list('accessory_id', 'count'))
     for accessory in accessories:
         if accessory.id in accessory_counts:
             accessory.count = accessory_counts[accessory.id]
 
     # Get the "Other" languoid specific to this submission's fair
-    other_languoid = Languoid.objects.get(name='Other', fair=submission.fair)
+    other_languoid_id = get_fair_reference_data(submission.fair_id, request)['other_languoid_id']
 
-    submission_includes_other_languoid = submission.languoids.filter(pk=other_languoid.pk).exists()
+    submission_includes_other_languoid = submission.languoids.filter(pk=other_languoid_id).exists()
 
     template = 'submission_detail.html'
     context = {
@@ -1129,8 +1293,9 @@ class submission_add(LoginRequiredMixin, FormView):
 
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
-        current_fair = CurrentFair.objects.first()
+        current_fair = get_current_fair(self.request)
         kwargs['current_fair'] = current_fair.fair
+        kwargs['reference_data'] = get_fair_reference_data(current_fair.fair_id, self.request)
         kwargs['selected_category'] = self.get_initial_category()
         return kwargs
 
@@ -1146,33 +1311,20 @@ class submission_add(LoginRequiredMixin, FormView):
         context['owning_user'] = user
         context['organization_preview'] = user.organization
 
-        currentFair = CurrentFair.objects.first()
+        currentFair = get_current_fair(self.request)
         context['currentFair'] = currentFair.name
         context['selected_category'] = self.get_initial_category()
 
         # Filter everything by current fair
-        material_submission_categories = list(Category.objects.filter(
-            fair=currentFair.fair, 
-            material_submission=True
-        ).values_list('name', flat=True))
-        context['material_submission_categories'] = json.dumps(material_submission_categories)
-
-        non_material_submission_categories = list(Category.objects.filter(
-            fair=currentFair.fair, 
-            material_submission=False
-        ).values_list('name', flat=True))
-        context['non_material_submission_categories'] = json.dumps(non_material_submission_categories)
-
-        categories = Category.objects.filter(fair=currentFair.fair)
-        categories_list = list(categories.values('name', 'max_students'))
-        context['categories'] = json.dumps(categories_list)
-
-        categories_dict = {category.name: category.max_students for category in categories}
-        context['category_student_max'] = json.dumps(categories_dict)
-
-        context['accessories'] = Accessory.objects.filter(fair=currentFair.fair)
+        reference_data = get_fair_reference_data(currentFair.fair_id, self.request)
+        context['material_submission_categories'] = json.dumps(reference_data['material_submission_categories'])
+        context['non_material_submission_categories'] = json.dumps(reference_data['non_material_submission_categories'])
+        context['categories'] = json.dumps(reference_data['category_list'])
+        context['category_student_max'] = json.dumps(reference_data['category_student_max'])
+
+        context['accessories'] = reference_data['accessories']
         context['grades'] = Student.GRADES
-        context['tribes'] = Tribe.objects.filter(fair=currentFair.fair)
+        context['tribes'] = reference_data['tribes']
         context['states'] = STATE_CHOICES
         context['tshirt_sizes'] = Student.TSHIRT_SIZES
 
@@ -1183,7 +1335,7 @@ class submission_add(LoginRequiredMixin, FormView):
     
     def form_valid(self, form):
         if form.is_valid():
-            currentFair = CurrentFair.objects.first()
+            currentFair = get_current_fair(self.request)
             self.object = form.save(commit=False)
             self.object.fair = currentFair.fair
             if 'user_pk' in self.kwargs:
@@ -1197,84 +1349,7 @@ class submission_add(LoginRequiredMixin, FormView):
             else:
                 self.object.organization = ""
             self.object.modified_by = self.request.user.get_username()
-            self.object.save()
-            form.save_m2m()
-
-            # Get the instructors from the form data
-            instructors_json = self.request.POST.get('instructors')
-
-            # Check if instructors_json exists
-            if instructors_json:
-                # Parse the instructors_json as a JSON array
-                instructor_ids = json.loads(instructors_json)
-
-                # For each instructor_id in the instructor_ids array...
-                for instructor_id in instructor_ids:
-                    # Get the Instructor object with the given ID
-                    instructor = Instructor.objects.get(id=instructor_id)
-
-                    # Add the instructor to the submission's instructors
-                    self.object.instructors.add(instructor)
-
-            # Get the students from the form data
-            students_json = self.request.POST.get('students')
-
-            # Check if students_json exists
-            if students_json:
-                # Parse the students_json as a JSON array
-                student_ids = json.loads(students_json)
-
-                # For each student_id in the student_ids array...
-                for student_id in student_ids:
-                    # Get the Student object with the given ID
-                    student = Student.objects.get(id=student_id)
-
-                    # Add the student to the submission's students
-                    self.object.students.add(student)
-
-            # Set submission_type based on the numner of students
-            if self.object.students.count() > 1:
-                self.object.submission_type = "group"
-            else:
-                self.object.submission_type = "individual"
-
-            # get the student in the highest grade
-            max_grade = self.object.students.aggregate(Max('grade'))
-            max_grade_value = max_grade['grade__max']
-            # look up the grade range based on the highest grade
-            grade_range = Submission.GRADE_RANGES_DICT.get(max_grade_value)
-            # set the grade range (based on the student in the highest grade)
-            self.object.grade_range = grade_range
-
-            # Save the submission object to update the instructors and students
-            self.object.save()
-
-            # Get the submission_accessory_counts from the form data
-            submission_accessory_counts = self.request.POST.get('submission_accessory_counts')
-
-            # Check if submission_accessory_counts exists
-            if submission_accessory_counts:
-                # Parse the submission_accessory_counts as a JSON object
-                try:
-                    accessory_counts = json.loads(submission_accessory_counts)
-                except json.JSONDecodeError:
-                    print(f"Invalid JSON: {submission_accessory_counts}")
-                    accessory_counts = {}
-                # For each key-value pair in the accessory_counts object...
-                for accessory_id, count in accessory_counts.items():
-                    # Create a SubmissionAccessory object
-                    SubmissionAccessory.objects.create(
-                        submission=self.object,
-                        accessory_id=accessory_id,
-                        count=count
-                    )
-
-            self.object.instructors_status = "completed"
-            self.object.students_status = "completed"
-            self.object.accessories_status = "completed"
-            self.object.review_status = "completed"
-            self.object.status = "submitted"
-            self.object.save()
+            save_submitted_submission(self.object, form, self.request.POST)
 
             # Determine the redirect URL based on the request path
             if 'submit-and-add' in self.request.POST:
@@ -1289,12 +1364,12 @@ class submission_add(LoginRequiredMixin, FormView):
 
 class submission_add_admin(UserPassesTestMixin, submission_add):
     def test_func(self):
-        return self.request.user.groups.filter(name='moderator').exists()
+        return has_role(self.request.user, MODERATOR)
     
 @login_required
 def submission_instructors(request, perf_pk):
 
-    currentFair = CurrentFair.objects.first()
+    currentFair = get_current_fair(request)
 
     submission = Submission.objects.get(pk=perf_pk)
 
@@ -1316,7 +1391,7 @@ class instructor_add(LoginRequiredMixin, FormView):
     template_name = "instructor_add.html"
     def form_valid(self, form):
         if form.is_valid():
-            currentFair = CurrentFair.objects.first()
+            currentFair = get_current_fair(self.request)
             self.object = form.save(commit=False)
             self.object.fair = currentFair.fair
             if 'perf_pk' in self.kwargs:
@@ -1340,7 +1415,7 @@ class instructor_add(LoginRequiredMixin, FormView):
 @login_required    
 def instructor_edit(request, instr_pk, perf_pk=None):
 
-    currentFair = CurrentFair.objects.first()
+    currentFair = get_current_fair(request)
 
     instructor = get_object_or_404(Instructor, id=instr_pk)
 
@@ -1367,7 +1442,7 @@ def instructor_edit(request, instr_pk, perf_pk=None):
 @login_required
 def submission_students(request, perf_pk):
 
-    currentFair = CurrentFair.objects.first()
+    currentFair = get_current_fair(request)
 
     submission = Submission.objects.get(pk=perf_pk)
 
@@ -1389,7 +1464,7 @@ class student_add(LoginRequiredMixin, FormView):
     template_name = "student_add.html"
     def form_valid(self, form):
         if form.is_valid():
-            currentFair = CurrentFair.objects.first()
+            currentFair = get_current_fair(self.request)
             self.object = form.save(commit=False)
             self.object.fair = currentFair.fair
             if 'perf_pk' in self.kwargs:
@@ -1415,7 +1490,7 @@ class student_add(LoginRequiredMixin, FormView):
 @login_required
 def student_edit(request, stud_pk, perf_pk=None):
 
-    currentFair = CurrentFair.objects.first()
+    currentFair = get_current_fair(request)
 
     student = get_object_or_404(Student, id=stud_pk)
 
@@ -1438,7 +1513,7 @@ def student_edit(request, stud_pk, perf_pk=None):
 
 @login_required
 def student_list(request):
-    currentFair = CurrentFair.objects.first()
+    currentFair = get_current_fair(request)
 
     # Get fair_id from query params, default to current fair if not provided
     fair_id = request.GET.get('fair_id')
@@ -1448,50 +1523,59 @@ def student_list(request):
         fair = currentFair.fair
 
     # Check if user is a moderator
-    is_moderator = request.user.groups.filter(name='moderator').exists()
-
-    # Optimize the prefetch for submissions to include category
-    submission_prefetch = Prefetch(
-        'submission_student',
-        queryset=Submission.objects.select_related('category')
-    )
+    is_moderator = has_role(request.user, MODERATOR)
 
-    # Base queryset with optimized prefetching
-    base_queryset = Student.objects.filter(fair=fair)\
-        .select_related('user')\
-        .prefetch_related(
-            submission_prefetch,
-            'tribe'
-        )
-
-    # Apply user filter if not moderator
-    if not is_moderator:
-        students = base_queryset.filter(user=request.user)
-    else:
-        students = base_queryset
-
-    # Get all grades for filter dropdown
-    grades = Student.GRADES
-
-    # Get all categories for filter dropdown 
-    categories = Category.objects.filter(fair=fair)
+    # the students themselves are loaded by the page, a page at a time, from student_list_get
+    reference_data = get_fair_reference_data(fair.id, request)
 
     template = 'student_list.html'
     context = {
         'currentFair': currentFair.name,
         'fair': fair,
-        'students': students,
-        'grades': grades,
-        'categories': categories,
+        'grades': Student.GRADES,
+        'categories': reference_data['categories'],
+        'tribes': reference_data['tribes'],
+        'sorts': STUDENT_SORTS,
         'moderator': is_moderator
     }
     return render(request, template, context)
 
+# an API view with a page of the students of the fair (fair_id, defaulting to the current fair) for the student list page, filtered and sorted as described in student_filters.py. Moderators see all the students of the fair, other users only their own.
+@api_view(['GET'])
+def student_list_get(request):
+    if not request.user.is_authenticated:
+        return Response({'detail': 'Authentication credentials were not provided.'}, status=status.HTTP_401_UNAUTHORIZED)
+
+    fair_id = request.GET.get('fair_id')
+    if fair_id:
+        if not fair_id.isdigit():
+            return Response({'detail': 'fair_id must be a fair id.'}, status=status.HTTP_400_BAD_REQUEST)
+        fair = get_object_or_404(Fair, pk=fair_id)
+    else:
+        current_fair = get_current_fair(request)
+        if not current_fair:
+            return Response({'detail': 'No current fair set.'}, status=status.HTTP_404_NOT_FOUND)
+        fair = current_fair.fair
+
+    students = Student.objects.filter(fair=fair)
+    if not has_role(request.user, MODERATOR):
+        students = students.filter(user=request.user)
+
+    students = filter_students(students, request.GET)
+    students = sort_students(students, request.GET.get('sort', DEFAULT_STUDENT_SORT))
+
+    paginator = StudentPagination()
+    page = paginator.paginate_queryset(students, request)
+    # the related rows are only loaded for the students on the page
+    prefetch_related_objects(page, 'user', 'tribe', Prefetch('submission_student', queryset=Submission.objects.select_related('category')))
+    serializer = StudentListSerializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
+
 
 @login_required
 def submission_accessories(request, perf_pk):
 
-    currentFair = CurrentFair.objects.first()
+    currentFair = get_current_fair(request)
 
     submission = Submission.objects.get(pk=perf_pk)
 
@@ -1525,9 +1609,9 @@ def submission_accessories(request, perf_pk):
 def submission_edit(request, perf_pk):
 
     # Check if the user is a moderator
-    is_moderator = request.user.groups.filter(name='moderator').exists()
+    is_moderator = has_role(request.user, MODERATOR)
 
-    currentFair = CurrentFair.objects.first()
+    currentFair = get_current_fair(request)
 
     submission = get_object_or_404(Submission, id=perf_pk)
 
@@ -1547,47 +1631,26 @@ def submission_edit(request, perf_pk):
     if submission.status != 'in_progress':
         return redirect('submission_detail', perf_pk=perf_pk)
 
-    material_submission_categories = list(Category.objects.filter(
-        fair=submission.fair, 
-        material_submission=True
-    ).values_list('name', flat=True))
-    
-    non_material_submission_categories = list(Category.objects.filter(
-        fair=submission.fair, 
-        material_submission=False
-    ).values_list('name', flat=True))
-
-    categories = Category.objects.filter(fair=submission.fair)
-    categories_list = list(categories.values('name', 'max_students'))
-    categories_dict = {category.name: category.max_students for category in categories}
-
-    other_languoid = Languoid.objects.get(name='Other', fair=submission.fair)
+    reference_data = get_fair_reference_data(submission.fair_id, request)
 
-    submission_includes_other_languoid = submission.languoids.filter(pk=other_languoid.pk).exists()
+    submission_includes_other_languoid = submission.languoids.filter(pk=reference_data['other_languoid_id']).exists()
 
     # Get accessories with their counts for this specific submission
-    accessories = []
-    for acc in Accessory.objects.filter(fair=submission.fair):
-        try:
-            submission_acc = SubmissionAccessory.objects.get(
-                submission=submission,
-                accessory=acc
-            )
-            acc.count = submission_acc.count
-        except SubmissionAccessory.DoesNotExist:
-            acc.count = 0
-        accessories.append(acc)
+    accessory_counts = dict(SubmissionAccessory.objects.filter(submission=submission).values_list('accessory_id', 'count'))
+    accessories = reference_data['accessories']
+    for acc in accessories:
+        acc.count = accessory_counts.get(acc.id, 0)
 
     grades = Student.GRADES
 
-    tribes = Tribe.objects.filter(fair=currentFair.fair)
+    tribes = get_fair_reference_data(currentFair.fair_id, request)['tribes']
 
     states = STATE_CHOICES
 
     tshirt_sizes = Student.TSHIRT_SIZES
 
     if request.method == "POST":
-        form = SubmissionForm(request.POST, instance=submission, current_fair=submission.fair)
+        form = SubmissionForm(request.POST, instance=submission, current_fair=submission.fair, reference_data=reference_data)
         if form.is_valid():
             edited_submission = form.save(commit=False)
             if edited_submission.fair == currentFair.fair:
@@ -1597,83 +1660,7 @@ def submission_edit(request, perf_pk):
                 else:
                     edited_submission.organization = ""
             edited_submission.modified_by = request.user.get_username()
-            edited_submission.save()
-            form.save_m2m()
-
-            # Get the instructors from the form data
-            instructors_json = request.POST.get('instructors')
-
-            # Check if instructors_json exists
-            if instructors_json:
-                # Parse the instructors_json as a JSON array
-                instructor_ids = json.loads(instructors_json)
-
-                # Get the Instructor objects with the given IDs
-                instructors = Instructor.objects.filter(id__in=instructor_ids)
-
-                # Set the submission's instructors to match the provided list
-                edited_submission.instructors.set(instructors)
-
-            # Get the students from the form data
-            students_json = request.POST.get('students')
-
-            # Check if students_json exists
-            if students_json:
-                # Parse the students_json as a JSON array
-                student_ids = json.loads(students_json)
-
-                # Get the Student objects with the given IDs
-                students = Student.objects.filter(id__in=student_ids)
-
-                # Set the submission's students to match the provided list
-                edited_submission.students.set(students)
-
-            # if override_submission_type is checked, do nothing special with submission type
-            if not edited_submission.override_submission_type:
-            # otherwise: set submission_type based on the numner of students
-                if edited_submission.students.count() > 1:
-                    edited_submission.submission_type = "group"
-                else:
-                    edited_submission.submission_type = "individual"
-
-
-            # get the student in the highest grade
-            max_grade = edited_submission.students.aggregate(Max('grade'))
-            max_grade_value = max_grade['grade__max']
-            # look up the grade range based on the highest grade
-            grade_range = Submission.GRADE_RANGES_DICT.get(max_grade_value)
-            # set the grade range (based on the student in the highest grade)
-            edited_submission.grade_range = grade_range
-
-            # Save the submission object to update the instructors and students
-            edited_submission.save()
-
-            # Get the submission_accessory_counts from the form data
-            submission_accessory_counts = request.POST.get('submission_accessory_counts')
-
-            # Check if submission_accessory_counts exists
-            if submission_accessory_counts:
-                # Parse the submission_accessory_counts as a JSON object
-                try:
-                    accessory_counts = json.loads(submission_accessory_counts)
-                except json.JSONDecodeError:
-                    print(f"Invalid JSON: {submission_accessory_counts}")
-                    accessory_counts = {}
-                # For each key-value pair in the accessory_counts object...
-                for accessory_id, count in accessory_counts.items():
-                    # Create a SubmissionAccessory object
-                    SubmissionAccessory.objects.update_or_create(
-                        submission=edited_submission,
-                        accessory_id=accessory_id,
-                        defaults={'count': count}
-                    )
-            
-            edited_submission.instructors_status = "completed"
-            edited_submission.students_status = "completed"
-            edited_submission.accessories_status = "completed"
-            edited_submission.review_status = "completed"
-            edited_submission.status = "submitted"
-            edited_submission.save()
+            save_submitted_submission(edited_submission, form, request.POST)
 
             # Check if this is a submit-and-add request
             if 'submit-and-add' in request.POST:
@@ -1683,7 +1670,7 @@ def submission_edit(request, perf_pk):
 
             return redirect(".")
     else:
-        form = SubmissionForm(instance=submission, current_fair=submission.fair)
+        form = SubmissionForm(instance=submission, current_fair=submission.fair, reference_data=reference_data)
     template = 'submission_add.html'
     context = {
         'moderator': is_moderator,
@@ -1691,10 +1678,10 @@ def submission_edit(request, perf_pk):
         'submission': submission,
         'owning_user': owning_user,
         'organization_preview': organization_preview,
-        'material_submission_categories': json.dumps(material_submission_categories),
-        'non_material_submission_categories': json.dumps(non_material_submission_categories),
-        'categories': json.dumps(categories_list),
-        'category_student_max': json.dumps(categories_dict),
+        'material_submission_categories': json.dumps(reference_data['material_submission_categories']),
+        'non_material_submission_categories': json.dumps(reference_data['non_material_submission_categories']),
+        'categories': json.dumps(reference_data['category_list']),
+        'category_student_max': json.dumps(reference_data['category_student_max']),
         'includes_other_languoid': submission_includes_other_languoid,
         'accessories': accessories,
         'grades': grades,
@@ -1708,7 +1695,7 @@ def submission_edit(request, perf_pk):
 @login_required
 def submission_review(request, perf_pk):
 
-    currentFair = CurrentFair.objects.first()
+    currentFair = get_current_fair(request)
 
     submission = Submission.objects.prefetch_related("instructors", "students", "accessories").get(pk=perf_pk)
 
@@ -1716,23 +1703,15 @@ def submission_review(request, perf_pk):
         submission.review_status = "in_progress"
         submission.save()
 
-    # Optimized accessory queries
-    accessories = Accessory.objects.filter(fair=currentFair.fair).prefetch_related(
-        'submissionaccessory_set'
-    )
-    accessory_counts = {
-        acc.id: acc.submissionaccessory_set.get(submission_id=perf_pk).count 
-        for acc in accessories 
-        if acc.submissionaccessory_set.filter(submission_id=perf_pk).exists()
-    }
-
     # Update the count attribute of each accessory with the count from the submission_accessories
+    accessories = get_fair_reference_data(currentFair.fair_id, request)['accessories']
+    accessory_counts = dict(SubmissionAccessory.objects.filter(submission_id=perf_pk).values_list('accessory_id', 'count'))
     for accessory in accessories:
         if accessory.id in accessory_counts:
             accessory.count = accessory_counts[accessory.id]
     
-    other_languoid = Languoid.objects.get(name='Other')
-    submission_includes_other_languoid = submission.languoids.filter(pk=other_languoid.pk).exists()
+    other_languoid_id = get_fair_reference_data(submission.fair_id, request)['other_languoid_id']
+    submission_includes_other_languoid = submission.languoids.filter(pk=other_languoid_id).exists()
 
     if request.method == "POST":
         form = SubmissionCommentsForm(request.POST, instance=submission)
@@ -1775,7 +1754,7 @@ class poster_add(LoginRequiredMixin, FormView):
                 user = User.objects.get(pk=user_pk)  # Get the user object
             else:
                 user = self.request.user
-            currentFair = CurrentFair.objects.first()
+            currentFair = get_current_fair(self.request)
             self.object = form.save(commit=False)
             self.object.fair = currentFair.fair
             self.object.poster = True
@@ -1802,21 +1781,21 @@ class poster_add(LoginRequiredMixin, FormView):
 
 class poster_add_admin(UserPassesTestMixin, poster_add):
     def test_func(self):
-        return self.request.user.groups.filter(name='moderator').exists()
+        return has_role(self.request.user, MODERATOR)
 
 @login_required
 def poster_detail(request, post_pk):
 
-    currentFair = CurrentFair.objects.first()
+    currentFair = get_current_fair(request)
 
     # Check if the user is a moderator
-    is_moderator = request.user.groups.filter(name='moderator').exists()
+    is_moderator = has_role(request.user, MODERATOR)
 
     submission = Submission.objects.prefetch_related("instructors", "students").get(pk=post_pk)
 
-    other_languoid = Languoid.objects.get(name='Other')
+    other_languoid_id = get_fair_reference_data(submission.fair_id, request)['other_languoid_id']
 
-    submission_includes_other_languoid = submission.languoids.filter(pk=other_languoid.pk).exists()
+    submission_includes_other_languoid = submission.languoids.filter(pk=other_languoid_id).exists()
 
     template = 'poster_detail.html'
     context = {
@@ -1830,7 +1809,7 @@ def poster_detail(request, post_pk):
 
 @login_required
 def poster_edit(request, post_pk):
-    currentFair = CurrentFair.objects.first()
+    currentFair = get_current_fair(request)
 
     submission = Submission.objects.prefetch_related("instructors", "students", "accessories").get(pk=post_pk)
 
@@ -1868,9 +1847,9 @@ def poster_edit(request, post_pk):
 def fair_detail(request):
 
     # Check if the user is a moderator
-    is_moderator = request.user.groups.filter(name='moderator').exists()
+    is_moderator = has_role(request.user, MODERATOR)
 
-    currentFair = CurrentFair.objects.first()
+    currentFair = get_current_fair(request)
 
     # Determine which fair's data to show
     fair_id = request.GET.get('fair_id')
@@ -1879,1114 +1858,82 @@ def fair_detail(request):
     else:
         fair = currentFair.fair
 
-    # find the number of submissions that are approved
-    submissions_approved = Submission.objects.filter(fair=fair).filter(status="approved")
-    submissions_approved_count = submissions_approved.count()
-
-    # find the number of submissions that are submitted
-    submissions_submitted = Submission.objects.filter(fair=fair).filter(status="submitted")
-    submissions_submitted_count = submissions_submitted.count()
-
-    # find the number of submissions that are approved or submitted
-    submissions_total_count = submissions_approved_count + submissions_submitted_count
-
-    # find the number of students in submissions that are approved
-    students_approved = Student.objects.filter(submission_student__in=submissions_approved).distinct().count()
-
-    # find the number of students in submissions that are submitted
-    students_submitted = Student.objects.filter(submission_student__in=submissions_submitted).distinct().count()
-
-    # find the number of students in submissions that are approved or submitted
-    submissions_both = submissions_approved | submissions_submitted
-    students_total = Student.objects.filter(submission_student__in=submissions_both).distinct().count()
-
-    # find the number of approved submissions in each category
-    submissions_by_category = {}
-    categories = Category.objects.filter(fair=fair)
-    for category in categories:
-        submissions_by_category[category.name] = {
-            "approved": submissions_approved.filter(category=category).count(),
-            "submitted": submissions_submitted.filter(category=category).count(),
-            "all": submissions_approved.filter(category=category).count() + submissions_submitted.filter(category=category).count()
-        }
-
-    # find the number of submissions that are approved for each language, and store only the non-zero results
-    submissions_by_language = {}
-    languoids = Languoid.objects.filter(fair=fair)
-
-    # Get the "Other" languoid
-    other_languoid = languoids.filter(name='Other').first()
-
-    # Process non-"Other" languoids as before
-    for languoid in languoids.exclude(name='Other'):
-        submissions_by_language[languoid.name] = {
-            "approved": submissions_approved.filter(languoids=languoid).count(),
-            "submitted": submissions_submitted.filter(languoids=languoid).count(),
-            "all": submissions_approved.filter(languoids=languoid).count() + submissions_submitted.filter(languoids=languoid).count()
-        }
-
-    # Special processing for "Other" languoid submissions
-    if other_languoid:
-        # Get all submissions with "Other" languoid
-        other_approved = submissions_approved.filter(languoids=other_languoid)
-        other_submitted = submissions_submitted.filter(languoids=other_languoid)
-        
-        # Get unique other_languoid values
-        other_languoid_values = set(
-            list(other_approved.values_list('other_languoid', flat=True).distinct()) +
-            list(other_submitted.values_list('other_languoid', flat=True).distinct())
-        )
-        
-        # Create a temporary dictionary for other languages
-        other_languages = {}
-        
-        # Process each unique other_languoid value
-        for other_value in other_languoid_values:
-            key = f"Other: {other_value or 'Blank'}"
-            other_languages[key] = {
-                "approved": other_approved.filter(other_languoid=other_value).count(),
-                "submitted": other_submitted.filter(other_languoid=other_value).count(),
-                "all": (other_approved.filter(other_languoid=other_value).count() + 
-                       other_submitted.filter(other_languoid=other_value).count())
-            }
-        
-        # Sort other languages and add them to main dictionary
-        # First, get all keys except "Other: Blank"
-        sorted_other_keys = sorted([k for k in other_languages.keys() if k != "Other: Blank"])
-        # If "Other: Blank" exists, add it at the end
-        if "Other: Blank" in other_languages:
-            sorted_other_keys.append("Other: Blank")
-        
-        # Add sorted other languages to main dictionary
-        for key in sorted_other_keys:
-            submissions_by_language[key] = other_languages[key]
-
-    # remove any languages with no submissions
-    submissions_by_language = {k: v for k, v in submissions_by_language.items() if v['all'] != 0}
-
-    # find the number of submissions that are approved for each grade range
-    submissions_by_grade_range = {}
-    grade_ranges = Submission.GRADE_RANGES
-    for grade_range, grade_range_display_value in grade_ranges:
-        submissions_by_grade_range[grade_range_display_value] = {
-            "approved": submissions_approved.filter(grade_range=grade_range).count(),
-            "submitted": submissions_submitted.filter(grade_range=grade_range).count(),
-            "all": submissions_approved.filter(grade_range=grade_range).count() + submissions_submitted.filter(grade_range=grade_range).count()
-        }
-    
-    # filter submissions_approved and submissions_submitted to only include submissions with a category that is not a material submission
-    submissions_approved_non_material = submissions_approved.filter(category__material_submission=False)
-    submissions_submitted_non_material = submissions_submitted.filter(category__material_submission=False)
-
-    # find the total number of tshirts needed in each size for all the approved or submitted submissions
-    tshirt_sizes_summary = {}
-    tshirt_sizes = Student.TSHIRT_SIZES
-    for tshirt_size, tshirt_size_display_value in tshirt_sizes:
-        tshirt_sizes_summary[tshirt_size_display_value] = {
-            "approved": submissions_approved_non_material.filter(students__tshirt_size=tshirt_size).values("students").distinct().count(),
-            "submitted": submissions_submitted_non_material.filter(students__tshirt_size=tshirt_size).values("students").distinct().count(),
-            "all": submissions_approved_non_material.filter(students__tshirt_size=tshirt_size).values("students").distinct().count() + submissions_submitted_non_material.filter(students__tshirt_size=tshirt_size).values("students").distinct().count()
-        }
-
-    # filter submissions_approved and submissions_submitted to only include submissions with a category that is a material submission
-    submissions_approved_material = submissions_approved.filter(category__material_submission=True)
-    submissions_submitted_material = submissions_submitted.filter(category__material_submission=True)
-
-
-    ## find the number of students that are in an approved submission that is a material submission, but are not in a non-material submission
-    # Get all students in approved submissions that are material submissions
-    # students_in_approved_material_submissions = submissions_approved_material.values("students").distinct()
-    students_in_approved_material_submissions = Student.objects.filter(submission_student__in=submissions_approved_material).distinct()
-
-    # # print a list of students in approved material submissions
-    # print('students_in_approved_material_submissions')
-    # students_list = students_in_approved_material_submissions.values_list('id', 'firstname', 'lastname')
-    # # Get the list of students sorted by id
-    # sorted_students_list = sorted(students_list, key=lambda x: x[0])
-
-    # # Pretty print the sorted list of students
-    # for id, firstname, lastname in sorted_students_list:
-    #     print(f"ID: {id}, First Name: {firstname}, Last Name: {lastname}")
-    # print("length of sorted_students_list")
-    # print(len(sorted_students_list))
-    # print(students_in_approved_material_submissions.count())
-
-    # Get all students in approved submissions that are non-material submissions
-    # students_in_approved_non_material_submissions = submissions_approved_non_material.values("students").distinct()
-    students_in_approved_non_material_submissions = Student.objects.filter(submission_student__in=submissions_approved_non_material).distinct()
-
-
-    # students_list = students_in_approved_non_material_submissions.values_list('id', 'firstname', 'lastname')
-    # # Get the list of students sorted by id
-    # sorted_students_list = sorted(students_list, key=lambda x: x[0])
-
-    # # Pretty print the sorted list of students
-    # for id, firstname, lastname in sorted_students_list:
-    #     print(f"ID: {id}, First Name: {firstname}, Last Name: {lastname}")
-    # print("length of non material sorted_students_list")
-    # print(len(sorted_students_list))
-
-    # print(students_in_approved_non_material_submissions.count())
-
-    # Find students that are in an approved submission that is a material submission, but are not in a non-material submission
-    students_in_approved_material_not_in_non_material = students_in_approved_material_submissions.exclude(id__in=students_in_approved_non_material_submissions).distinct()
-
-    # print('students_in_approved_material_not_in_non_material')
-    # print(students_in_approved_material_not_in_non_material.count())
-    # print("students in both")
-    # print(students_in_approved_material_submissions.filter(id__in=students_in_approved_non_material_submissions).count())
-
-    # # find the intersection of the two sets
-    # print("intersection")
-    # print(students_in_approved_material_submissions.filter(id__in=students_in_approved_non_material_submissions).count())
-
-    # # find the difference of the two sets
-    # print("difference")
-    # print(students_in_approved_material_submissions.difference(students_in_approved_non_material_submissions).count())
-
-
-    ## find the number of students that are in a submitted submission that is a material submission, but are not in a non-material submission
-    # Get all students in submitted submissions that are material submissions
-    students_in_submitted_material_submissions = submissions_submitted_material.values("students").distinct()
-
-    # Get all students in submitted submissions that are non-material submissions
-    students_in_submitted_non_material_submissions = submissions_submitted_non_material.values("students").distinct()
-
-    # Find students that are in a submitted submission that is a material submission, but are not in a non-material submission
-    students_in_submitted_material_not_in_non_material = students_in_submitted_material_submissions.exclude(id__in=students_in_submitted_non_material_submissions)
-
-    # find number of students in material submissions for bag counts
-    bag_count = {
-            "approved": students_in_approved_material_not_in_non_material.count(),
-            "submitted": students_in_submitted_material_not_in_non_material.count(),
-            "all": students_in_approved_material_not_in_non_material.count() + students_in_submitted_material_not_in_non_material.count()
-        }
-
-    # # filter SubmissionAccessory instances to only include those related to submissions that are approved or submitted
-    # submission_accessories_approved = SubmissionAccessory.objects.filter(submission__in=submissions_approved)
-    # submission_accessories_submitted = SubmissionAccessory.objects.filter(submission__in=submissions_submitted)
-
-    # # filter submission_accessories_approved and submission_accessories_submitted to only include those related to submissions with a category that is not a material submission
-    # submission_accessories_approved_non_material = submission_accessories_approved.filter(submission__category__material_submission=False)
-    # submission_accessories_submitted_non_material = submission_accessories_submitted.filter(submission__category__material_submission=False)
-
-    # find the total number of accessories in each type of accessory for all the approved submissions
-    accessories = Accessory.objects.filter(fair=fair).prefetch_related(
-        'submissionaccessory_set'
-    )
-    accessories_summary = {}
-    for accessory in accessories:
-        approved_count = sum(sa.count for sa in accessory.submissionaccessory_set.filter(
-            submission__status='approved'
-        ))
-        submitted_count = sum(sa.count for sa in accessory.submissionaccessory_set.filter(
-            submission__status='submitted'
-        ))
-        accessories_summary[accessory.name] = {
-            "approved": approved_count,
-            "submitted": submitted_count,
-            "all": approved_count + submitted_count
-        }
-
-    # Get programs (users with organizations) that have submissions
-    programs_with_submissions = User.objects.exclude(organization='').filter(
-        submission_user__in=submissions_both
-    ).distinct()
-
-    # Get program counts using the same base query
-    programs_submitted_count = User.objects.exclude(organization='').filter(
-        submission_user__in=submissions_submitted
-    ).distinct().count()
-
-    programs_approved_count = User.objects.exclude(organization='').filter(
-        submission_user__in=submissions_approved
-    ).distinct().count()
-
-    programs_total_count = programs_with_submissions.count()
-
-    # Initialize counters for prek-5 and 6-12 programs
-    prek5_programs = {
-        "approved": 0,
-        "submitted": 0,
-        "all": 0
-    }
-    grade612_programs = {
-        "approved": 0,
-        "submitted": 0, 
-        "all": 0
-    }
-
-    # Count approved programs with prek-5 submissions
-    prek5_programs["approved"] = programs_with_submissions.filter(
-        submission_user__in=submissions_approved,
-        submission_user__grade_range__in=['0_pk-2', '1_3-5']
-    ).distinct().count()
-
-    # Count submitted programs with prek-5 submissions
-    prek5_programs["submitted"] = programs_with_submissions.filter(
-        submission_user__in=submissions_submitted,
-        submission_user__grade_range__in=['0_pk-2', '1_3-5']
-    ).distinct().count()
-
-    # Count total programs with prek-5 submissions
-    prek5_programs["all"] = programs_with_submissions.filter(
-        submission_user__in=submissions_both,
-        submission_user__grade_range__in=['0_pk-2', '1_3-5']
-    ).distinct().count()
-
-    # Count approved programs with 6-12 submissions
-    grade612_programs["approved"] = programs_with_submissions.filter(
-        submission_user__in=submissions_approved,
-        submission_user__grade_range__in=['1_6-8', '1_9-12']
-    ).distinct().count()
-
-    # Count submitted programs with 6-12 submissions  
-    grade612_programs["submitted"] = programs_with_submissions.filter(
-        submission_user__in=submissions_submitted,
-        submission_user__grade_range__in=['1_6-8', '1_9-12']
-    ).distinct().count()
-
-    # Count total programs with 6-12 submissions
-    grade612_programs["all"] = programs_with_submissions.filter(
-        submission_user__in=submissions_both,
-        submission_user__grade_range__in=['1_6-8', '1_9-12']
-    ).distinct().count()
-
-
- # Get programs by language, including special handling for "Other"
-    programs_by_language = {}
-    
-    # Process non-"Other" languoids
-    for languoid in languoids.exclude(name='Other'):
-        programs_by_language[languoid.name] = {
-            "approved": User.objects.exclude(organization='').filter(
-                submission_user__in=submissions_approved,
-                submission_user__languoids=languoid
-            ).distinct().count(),
-            "submitted": User.objects.exclude(organization='').filter(
-                submission_user__in=submissions_submitted,
-                submission_user__languoids=languoid
-            ).distinct().count(),
-            "all": User.objects.exclude(organization='').filter(
-                submission_user__in=submissions_both,
-                submission_user__languoids=languoid
-            ).distinct().count()
-        }
-
-    # Special processing for "Other" languoid submissions
-    if other_languoid:
-        # Get all submissions with "Other" languoid
-        other_approved = submissions_approved.filter(languoids=other_languoid)
-        other_submitted = submissions_submitted.filter(languoids=other_languoid)
-        
-        # Get unique other_languoid values
-        other_languoid_values = set(
-            list(other_approved.values_list('other_languoid', flat=True).distinct()) +
-            list(other_submitted.values_list('other_languoid', flat=True).distinct())
-        )
-        
-        # Create a temporary dictionary for other languages
-        other_languages = {}
-        
-        # Process each unique other_languoid value
-        for other_value in other_languoid_values:
-            key = f"Other: {other_value or 'Blank'}"
-            other_languages[key] = {
-                "approved": User.objects.exclude(organization='').filter(
-                    submission_user__in=other_approved,
-                    submission_user__other_languoid=other_value
-                ).distinct().count(),
-                "submitted": User.objects.exclude(organization='').filter(
-                    submission_user__in=other_submitted,
-                    submission_user__other_languoid=other_value
-                ).distinct().count(),
-                "all": User.objects.exclude(organization='').filter(
-                    submission_user__in=submissions_both,
-                    submission_user__languoids=other_languoid,
-                    submission_user__other_languoid=other_value
-                ).distinct().count()
-            }
-        
-        # Sort and add other languages same as before
-        sorted_other_keys = sorted([k for k in other_languages.keys() if k != "Other: Blank"])
-        if "Other: Blank" in other_languages:
-            sorted_other_keys.append("Other: Blank")
-        
-        for key in sorted_other_keys:
-            programs_by_language[key] = other_languages[key]
-
-    # Remove languages with no programs
-    programs_by_language = {k: v for k, v in programs_by_language.items() if v['all'] != 0}
-
-
-    # Get students by language, including special handling for "Other"
-    students_by_language = {}
-    
-    # Process non-"Other" languoids
-    for languoid in languoids.exclude(name='Other'):
-        students_by_language[languoid.name] = {
-            "approved": Student.objects.filter(
-                submission_student__in=submissions_approved,
-                submission_student__languoids=languoid
-            ).distinct().count(),
-            "submitted": Student.objects.filter(
-                submission_student__in=submissions_submitted,
-                submission_student__languoids=languoid
-            ).distinct().count(),
-            "all": Student.objects.filter(
-                submission_student__in=submissions_both,
-                submission_student__languoids=languoid
-            ).distinct().count()
-        }
-
-    # Special processing for "Other" languoid submissions
-    if other_languoid:
-        # Get all submissions with "Other" languoid
-        other_approved = submissions_approved.filter(languoids=other_languoid)
-        other_submitted = submissions_submitted.filter(languoids=other_languoid)
-        
-        # Get unique other_languoid values
-        other_languoid_values = set(
-            list(other_approved.values_list('other_languoid', flat=True).distinct()) +
-            list(other_submitted.values_list('other_languoid', flat=True).distinct())
-        )
-        
-        # Create a temporary dictionary for other languages
-        other_languages = {}
-        
-        # Process each unique other_languoid value
-        for other_value in other_languoid_values:
-            key = f"Other: {other_value or 'Blank'}"
-            other_languages[key] = {
-                "approved": Student.objects.filter(
-                    submission_student__in=other_approved,
-                    submission_student__other_languoid=other_value
-                ).distinct().count(),
-                "submitted": Student.objects.filter(
-                    submission_student__in=other_submitted,
-                    submission_student__other_languoid=other_value
-                ).distinct().count(),
-                "all": Student.objects.filter(
-                    submission_student__in=submissions_both,
-                    submission_student__languoids=other_languoid,
-                    submission_student__other_languoid=other_value
-                ).distinct().count()
-            }
-        
-        # Sort and add other languages
-        sorted_other_keys = sorted([k for k in other_languages.keys() if k != "Other: Blank"])
-        if "Other: Blank" in other_languages:
-            sorted_other_keys.append("Other: Blank")
-        
-        for key in sorted_other_keys:
-            students_by_language[key] = other_languages[key]
-
-    # Remove languages with no students
-    students_by_language = {k: v for k, v in students_by_language.items() if v['all'] != 0}
-
-
-    # Get all languoids for the fair
-    languoids = Languoid.objects.filter(fair=fair)
-    
-    # Get the "Other" languoid
-    other_languoid = languoids.filter(name='Other').first()
-
-    # Initialize counters for prek-5 and 6-12 languages
-    prek5_languages = {
-        "approved": 0,
-        "submitted": 0,
-        "all": 0
-    }
-    grade612_languages = {
-        "approved": 0,
-        "submitted": 0, 
-        "all": 0
-    }
-
-    # Helper function to count languages
-    def count_languages(submissions_queryset, grade_ranges):
-        # Count non-"Other" languoids
-        language_count = languoids.exclude(name='Other').filter(
-            submission_languoids__in=submissions_queryset,
-            submission_languoids__grade_range__in=grade_ranges
-        ).distinct().count()
-
-        # If there's an "Other" languoid, count distinct other_languoid values
-        if other_languoid:
-            other_submissions = submissions_queryset.filter(
-                languoids=other_languoid,
-                grade_range__in=grade_ranges
-            )
-            # Get unique other_languoid values (including None/blank)
-            other_values = set(other_submissions.values_list('other_languoid', flat=True).distinct())
-            # Add the count of unique other_languoid values
-            language_count += len(other_values)
-
-        return language_count
-
-    # Count languages for PreK-5 submissions
-    prek5_languages["approved"] = count_languages(
-        submissions_approved,
-        ['0_pk-2', '1_3-5']
-    )
-
-    prek5_languages["submitted"] = count_languages(
-        submissions_submitted,
-        ['0_pk-2', '1_3-5']
-    )
-
-    prek5_languages["all"] = count_languages(
-        submissions_both,
-        ['0_pk-2', '1_3-5']
-    )
-
-    # Count languages for 6-12 submissions
-    grade612_languages["approved"] = count_languages(
-        submissions_approved,
-        ['1_6-8', '1_9-12']
-    )
-
-    grade612_languages["submitted"] = count_languages(
-        submissions_submitted,
-        ['1_6-8', '1_9-12']
-    )
-
-    grade612_languages["all"] = count_languages(
-        submissions_both,
-        ['1_6-8', '1_9-12']
-    )
-
-
-    # Count all languages (across all grade ranges)
-    languages_submitted_count = count_languages(
-        submissions_submitted,
-        ['0_pk-2', '1_3-5', '1_6-8', '1_9-12']
-    )
-
-    languages_approved_count = count_languages(
-        submissions_approved,
-        ['0_pk-2', '1_3-5', '1_6-8', '1_9-12']
-    )
-
-    languages_total_count = count_languages(
-        submissions_both,
-        ['0_pk-2', '1_3-5', '1_6-8', '1_9-12']
-    )
+    # all the counts for the page come from the fair's statistics snapshot
+    fair_statistics = get_fair_statistics(fair)
 
     template = 'fair_detail.html'
     context = {
         'currentFair': currentFair.name,
         'fair': fair,
         'moderator': is_moderator,
-        'submissions_submitted_count': submissions_submitted_count,
-        'submissions_approved_count': submissions_approved_count,
-        'submissions_total_count': submissions_total_count,
-        'students_approved': students_approved,
-        'students_submitted': students_submitted,
-        'students_total': students_total,
-        'submissions_by_category': submissions_by_category,
-        'submissions_by_language': submissions_by_language,
-        'submissions_by_grade_range': submissions_by_grade_range,
-        'tshirt_sizes_summary': tshirt_sizes_summary,
-        'bag_count': bag_count,
-        'accessories_summary': accessories_summary,
-        'prek5_programs': prek5_programs,
-        'grade612_programs': grade612_programs,
-        'prek5_languages': prek5_languages,
-        'programs_by_language': programs_by_language,
-        'grade612_languages': grade612_languages,
-        'programs_submitted_count': programs_submitted_count,
-        'programs_approved_count': programs_approved_count,
-        'programs_total_count': programs_total_count,
-        'students_by_language': students_by_language,
-        'languages_submitted_count': languages_submitted_count,
-        'languages_approved_count': languages_approved_count,
-        'languages_total_count': languages_total_count,
+        **fair_statistics,
     }
     return render(request, template, context)
 
-# and API view that returns JSON for all the submissions for the fair given by the fair_pk, with all the metadata for each submission. This is sent to the browser as a download when the user clicks the "Download All Submission data" button on the fair detail page.
+# an API view with the per-view request stats of this process (see request_stats.py), for moderators. DELETE resets them.
+@api_view(['GET', 'DELETE'])
+def request_stats(request):
+    if not request.user.is_authenticated:
+        return Response({'detail': 'Authentication credentials were not provided.'}, status=status.HTTP_401_UNAUTHORIZED)
+    if not has_role(request.user, MODERATOR):
+        return Response({'detail': 'You do not have permission to perform this action.'}, status=status.HTTP_403_FORBIDDEN)
+    if not settings.REQUEST_STATS_ENABLED:
+        return Response({'detail': 'Request stats are not enabled (REQUEST_STATS_ENABLED).'}, status=status.HTTP_404_NOT_FOUND)
+    if request.method == 'DELETE':
+        reset_request_stats()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    return Response({
+        'pid': os.getpid(),
+        'slow_request_ms': settings.SLOW_REQUEST_MS,
+        'views': get_request_stats(),
+    })
+
+# an API view for the zip of all the submission data for the fair given by the fair_pk (a JSON dump plus spreadsheets). The "Download All Data" button on the fair detail page POSTs to queue the export as a background job, then polls the job and downloads the file when it is ready. GET builds the zip within the request, adding each file as soon as it is built, and sends it again until the fair's data changes (see export_cache.py).
 class FairDownloadView(APIView):
+    @cached_export('fair_data')
     def get(self, request, fair_pk):
         try:
             fair = Fair.objects.get(pk=fair_pk)
-            submissions = Submission.objects.filter(fair=fair)
-
-            ## Make json document
-            serializer = SubmissionJsonSerializer(submissions, many=True)
-
-            # Convert the serialized data to JSON and save it to a file
-            data = json.dumps(serializer.data)
-            json_file_name = f'fair-{fair.name}-data.json'
-            json_file = default_storage.save(json_file_name, ContentFile(data))
-
-
-            ## Adjust width of columns
-            def adjust_width(sheet):
-                limit_to_max_length = 40
-                # Iterate over the columns
-                for column in range(1, 8):
-                    max_length = 0
-                    column = get_column_letter(column)
-                    for cell in sheet[column]:
-                        try: 
-                            if len(str(cell.value)) > max_length:
-                                max_length = len(cell.value)
-                                if max_length > limit_to_max_length:
-                                    break
-                        except:
-                            pass
-                        if max_length > limit_to_max_length:
-                            break
-                    adjusted_width = (max_length + 1)
-                    if adjusted_width > limit_to_max_length:
-                        adjusted_width = limit_to_max_length
-                    sheet.column_dimensions[column].width = adjusted_width
-
-            ## Make xlsx for submissions (non material)
-
-            # filter submissions to only include those that are approved
-            submissions = submissions.filter(status__in=["approved"])
-
-            non_material_submission_categories = list(Category.objects.filter(fair=fair, material_submission=False).values_list('name', flat=True))
-            categories = list(Category.objects.filter(fair=fair).values_list('name', flat=True))
-
-
-            submission_workbook = Workbook()
-
-            # # Define your default font
-            # default_font = Font(name='Arial')
-
-            # # Apply the default font to all cells in the workbook
-            # for sheet in submission_workbook:
-            #     for row in sheet.iter_rows():
-            #         for cell in row:
-            #             cell.font = default_font
-
-
-
-            for category in categories:
-                # sanitize the category name to remove any characters that are not allowed in a sheet name
-                category_name = re.sub(r'[\\/*?[\]:]', '_', category)
-                # create a new sheet
-                submission_workbook.create_sheet(title=category_name)
-                # make the sheet active
-                submission_workbook.active = submission_workbook[category_name]
-                sheet = submission_workbook.active
-                # merge the first 7 columns of the first row
-                sheet.merge_cells('A1:G1')
-                # set the value of the merged cells to the category name
-                sheet['A1'] = category
-                # set the font size of the merged cells to 20 and bold
-                sheet['A1'].font = Font(size=20, bold=True)
-                # set the height of the first row to 30
-                sheet.row_dimensions[1].height = 30
-                # set the background color of the first 7 columns of the second row to blue, and the text color to white
-                for cell in sheet['A2:G2']:
-                    for c in cell:
-                        c.fill = PatternFill(start_color="007bff", end_color="007bff", fill_type="solid")
-                        c.font = Font(color="FFFFFF")
-                # list of column headers
-                headers = ["Title", "Program/School", "Presenting group", "Language", "Grade Range", "Submission type", "Student count"]
-                # set the values of the second row to the column headers
-                for i, header in enumerate(headers):
-                    sheet.cell(row=2, column=i+1, value=header)
-                ## add data to the sheet, starting at the third row. the data are non material submissions with the current category
-                # Iterate over the submissions in the category
-                submissions_in_category = submissions.filter(category__name=category)
-                for submission in submissions_in_category:
-                    # Create a list for the current row
-                    row = [
-                        submission.title,
-                        submission.organization,
-                        submission.group,
-                        ", ".join([f"Other: {submission.other_languoid if submission.other_languoid else 'Blank'}" if languoid.name == 'Other' else languoid.name for languoid in submission.languoids.all()]),
-                        submission.get_grade_range_display(),
-                        submission.get_submission_type_display(),
-                        submission.students.count()
-                    ]
-                    # Add the row to the data list
-                    sheet.append(row)
-
-                adjust_width(sheet)
-
-            # remove the default sheet
-            submission_workbook.remove(submission_workbook['Sheet'])
-
-            # Create a BytesIO object and save the workbook to it
-            xlsx_file_io = BytesIO()
-            submission_workbook.save(xlsx_file_io)
-
-            # Go back to the start of the BytesIO object
-            xlsx_file_io.seek(0)
-
-            # Save the BytesIO object to a file in default storage
-            submission_xlsx_file_name = f'Fair{fair.name}-Submission counts.xlsx'
-            submission_xlsx_file = default_storage.save(submission_xlsx_file_name, ContentFile(xlsx_file_io.read()))
-
-
-            # get all students in submissions for the current fair that are approved
-            students = Student.objects.filter(submission_student__fair=fair).filter(submission_student__status="approved").distinct()
-
-            student_workbook = Workbook()
-
-            student_sorting_tabs = ["Sorted by name", "Sorted by age"]
-
-            for tab in student_sorting_tabs:
-
-                student_workbook.create_sheet(title=tab)
-                student_workbook.active = student_workbook[tab]
-                sheet = student_workbook.active
-
-                # set the background color of the first 7 columns of the first row to blue, and the text color to white
-                for cell in sheet['A1:G1']:
-                    for c in cell:
-                        c.fill = PatternFill(start_color="007bff", end_color="007bff", fill_type="solid")
-                        c.font = Font(color="FFFFFF")
-                # list of column headers
-                headers = ["First name", "Last name", "Tribe", "Hometown", "State", "Grade", "Program/School"]
-                # set the values of the second row to the column headers
-                for i, header in enumerate(headers):
-                    sheet.cell(row=1, column=i+1, value=header)
-                ## add data to the sheet, starting at the second row. the data are students in submissions for the current fair that are approved
-                # Iterate over the students
-                if tab == "Sorted by name":
-                    students = students.order_by('lastname', 'firstname', 'grade')
-                elif tab == "Sorted by age":
-                    students = students.order_by('grade', 'lastname', 'firstname')
-                for student in students:
-                    # Create a list for the current row
-                    row = [
-                        student.firstname,
-                        student.lastname,
-                        ", ".join([tribe.name for tribe in student.tribe.all()]),
-                        student.hometown,
-                        student.state,
-                        student.get_grade_display(),
-                        student.user.organization
-                    ]
-                    # Add the row to the data list
-                    sheet.append(row)
-
-                adjust_width(sheet)
-
-            # remove the default sheet
-            student_workbook.remove(student_workbook['Sheet'])
-
-            # Create a BytesIO object and save the workbook to it
-            xlsx_file_io = BytesIO()
-            student_workbook.save(xlsx_file_io)
-
-            # Go back to the start of the BytesIO object
-            xlsx_file_io.seek(0)
-
-            # Save the BytesIO object to a file in default storage
-            student_xlsx_file_name = f'Fair{fair.name}-Student details.xlsx'
-            student_xlsx_file = default_storage.save(student_xlsx_file_name, ContentFile(xlsx_file_io.read()))
-
-            # get all users that have approved submissions in the current fair and are not moderators
-            users = User.objects.filter(
-                submission_user__fair=fair,  # submission is in current fair
-                submission_user__status='approved'  # submission is approved
-            ).exclude(
-                groups__name='moderator'
-            ).distinct().order_by('organization', 'last_name', 'first_name')
-
-
-            group_contact_workbook = Workbook()
-
-            group_contact_workbook.create_sheet(title="GroupContactDetails")
-            group_contact_workbook.active = group_contact_workbook["GroupContactDetails"]
-            sheet = group_contact_workbook.active
-
-            # set the background color of the first 7 columns of the first row to blue, and the text color to white
-            for cell in sheet['A1:G1']:
-                for c in cell:
-                    c.fill = PatternFill(start_color="007bff", end_color="007bff", fill_type="solid")
-                    c.font = Font(color="FFFFFF")
-            # list of column headers
-            headers = ["Program/School", "Contact name", "Address", "City, State ZIP", "Phone number", "Fax number", "Email"]
-            # set the values of the second row to the column headers
-            for i, header in enumerate(headers):
-                sheet.cell(row=1, column=i+1, value=header)
-            for user in users:
-                # Create a list for the current row
-                row = [
-                    user.organization or '',
-                    " ".join(filter(None, [user.first_name, user.last_name])),
-                    user.address or '',
-                    ", ".join(filter(None, [user.city, " ".join(filter(None, [user.state, user.zip]))])),
-                    ", ".join(filter(None, [user.phone, user.alt_phone])),
-                    user.fax or '',
-                    user.email or ''
-                ]
-                # Add the row to the data list
-                sheet.append(row)
-
-            adjust_width(sheet)
-
-            # remove the default sheet
-            group_contact_workbook.remove(group_contact_workbook['Sheet'])
-
-            # Create a BytesIO object and save the workbook to it
-            xlsx_file_io = BytesIO()
-            group_contact_workbook.save(xlsx_file_io)
-
-            # Go back to the start of the BytesIO object
-            xlsx_file_io.seek(0)
-
-            # Save the BytesIO object to a file in default storage
-            group_contact_xlsx_file_name = f'Fair{fair.name}-Program contact details.xlsx'
-            group_contact_xlsx_file = default_storage.save(group_contact_xlsx_file_name, ContentFile(xlsx_file_io.read()))
-
-
-
-            # get a list of all the accessories for the fair
-            accessories = Accessory.objects.filter(fair=fair)
-
-            # Get all submissions
-            submissions = Submission.objects.filter(fair=fair, status__in=["approved"]).values('id', 'title', 'organization', 'grade_range', 'category__name')
-            
-            # Convert GRADE_RANGES to a dictionary
-            grade_ranges_dict = dict(Submission.GRADE_RANGES)
-
-            # Replace the grade range with the display version
-            for submission in submissions:
-                submission['grade_range'] = grade_ranges_dict.get(submission['grade_range'])
-
-            # Convert QuerySet to list of dictionaries
-            submissions = list(submissions)
-
-            # Loop over each submission
-            for submission in submissions:
-                # Loop over each accessory
-                for accessory in accessories:
-                    # Get the count of the current accessory for the current submission
-                    count = SubmissionAccessory.objects.filter(submission_id=submission['id'], accessory=accessory).aggregate(count=Sum('count'))['count']
-
-                    # Add the count to the submission dictionary
-                    submission[f'accessory_{accessory.id}'] = count if count else ""
-
-            accessory_workbook = Workbook()
-
-            accessory_workbook.create_sheet(title="AccessoryCounts")
-            accessory_workbook.active = accessory_workbook["AccessoryCounts"]
-            sheet = accessory_workbook.active
-
-            # list of column headers
-            headers = ["Submission title", "Program/School", "Grade range", "Category"]
-            # add the accessory names to the headers list
-            headers.extend([accessory.name for accessory in accessories])
-
-            # set the background color of the first row to blue, for the number of columnes equal to the length of the headers list
-            for cell in sheet['A1':get_column_letter(len(headers))+'1']:
-                for c in cell:
-                    c.fill = PatternFill(start_color="007bff", end_color="007bff", fill_type="solid")
-                    c.font = Font(color="FFFFFF")
-
-            # set the values of the second row to the column headers
-            for i, header in enumerate(headers):
-                sheet.cell(row=1, column=i+1, value=header)
-
-            for submission in submissions:
-                # Get all accessory counts for this submission
-                accessory_counts = [submission[f'accessory_{accessory.id}'] for accessory in accessories]
-                
-                # Only add row if any accessory count is greater than 0
-                if any(count and count > 0 for count in accessory_counts):
-                    # Create a list for the current row
-                    row = [
-                        submission['title'],
-                        submission['organization'],
-                        submission['grade_range'],
-                        submission['category__name']
-                    ]
-                    # add the accessory counts to the row
-                    row.extend(accessory_counts)
-                    
-                    # Add the row to the data list
-                    sheet.append(row)
-
-            adjust_width(sheet)
-
-            # remove the default sheet
-            accessory_workbook.remove(accessory_workbook['Sheet'])
 
-            # Create a BytesIO object and save the workbook to it
-            xlsx_file_io = BytesIO()
-            accessory_workbook.save(xlsx_file_io)
-
-            # Go back to the start of the BytesIO object
-            xlsx_file_io.seek(0)
-
-            # Save the BytesIO object to a file in default storage
-            accessory_xlsx_file_name = f'Fair{fair.name}-Accessory counts.xlsx'
-            accessory_xlsx_file = default_storage.save(accessory_xlsx_file_name, ContentFile(xlsx_file_io.read()))
-
-
-            # get all users that have approved submissions in the current fair and are not moderators
-            users = User.objects.filter(
-                submission_user__fair=fair,  # submission is in current fair
-                submission_user__status='approved'  # submission is approved
-            ).exclude(
-                groups__name='moderator'
-            ).distinct().order_by('organization', 'last_name', 'first_name')
-
-            # Convert GRADES to a dictionary
-            grades_dict = dict(Student.GRADES)
-            grades_keys = list(grades_dict.keys())
-            
-            # make a list of dictionaries for each user
-            users_list = []
-            for user in users:
-                # get the submissions for this user
-                submissions = Submission.objects.filter(user=user, fair=fair)
-
-                # get the students that are in the submissions
-                students = Student.objects.filter(submission_student__in=submissions).distinct()
-
-                # get the grades of the students
-                grades = sorted(list(set(students.values_list('grade', flat=True))))
-
-                ### deprecated code, using grade_range instead
-                # # set day to "Day 1" if any of the grades are in grades_dict[0:6]
-                # # set day to "Day 2" if any of the grades are in grades_dict[7:13]
-                # # set day to "Day 1 + Day 2" if any of the grades are in grades_dict
-                # day1 = "Day 1" if any(grade in grades_keys[0:7] for grade in grades) else ""
-                # day2 = "Day 2" if any(grade in grades_keys[7:14] for grade in grades) else ""
-                # day = " + ".join(filter(None, [day1, day2]))
-
-
-                # Get all grade ranges from the user's submissions for this fair
-                submission_grade_ranges = set(submissions.values_list('grade_range', flat=True))
-
-                # Check for Day 1 grade ranges (PreK-2nd and 3rd-5th)
-                day1_ranges = {'0_pk-2', '1_3-5'}
-                day1 = "Day 1" if any(grade_range in day1_ranges for grade_range in submission_grade_ranges) else ""
-
-                # Check for Day 2 grade ranges (6th-8th and 9th-12th)
-                day2_ranges = {'1_6-8', '1_9-12'}
-                day2 = "Day 2" if any(grade_range in day2_ranges for grade_range in submission_grade_ranges) else ""
-
-                day = " + ".join(filter(None, [day1, day2]))
-
-
-
-
-                # for each value in grades, replace with the display value from grades_dict
-                grades = [grades_dict[grade] for grade in grades]
-
-                # create a dictionary for the user
-                user_dict = {
-                    'name': f"{user.first_name} {user.last_name}",
-                    'organization': user.organization,
-                    'city': user.city,
-                    'state': user.state,
-                    'email': ', '.join(filter(None, [user.email, user.alt_email])),
-                    'grades': ", ".join([str(grade) for grade in grades]),
-                    'day': day,
-                    'day1': day1,
-                    'day2': day2
-                }
-                # add a copy of the dictionary to the list of users
-                users_list.append(copy.deepcopy(user_dict))
-
-            program_labels_workbook = Workbook()
-
-            program_labels_workbook.create_sheet(title="Program Labels")
-            program_labels_workbook.active = program_labels_workbook["Program Labels"]
-            sheet = program_labels_workbook.active
-
-            # list of column headers
-            headers = ["Program/School", "Contact", "Day", "Grades", "Address"]
-
-            # set the background color of the first row to blue, for the number of columnes equal to the length of the headers list
-            for cell in sheet['A1':'E1']:
-                for c in cell:
-                    c.fill = PatternFill(start_color="007bff", end_color="007bff", fill_type="solid")
-                    c.font = Font(color="FFFFFF")
-
-            # set the values of the second row to the column headers
-            for i, header in enumerate(headers):
-                sheet.cell(row=1, column=i+1, value=header)
-            for user_dict in users_list:
-                # Create contact string with name and email
-                contact = f"{user_dict['name']} ({user_dict['email']})" if user_dict['name'].strip() else user_dict['email']
-                
-                # Create a list for the current row
-                row = [
-                    user_dict['organization'],
-                    contact,
-                    user_dict['day'],
-                    user_dict['grades'],
-                    f"{user_dict['city']}, {user_dict['state']}"
-                ]
-                
-                # Add the row to the data list
-                sheet.append(row)
-
-            adjust_width(sheet)
-
-
-            program_labels_workbook.create_sheet(title="Sign In Day 1")
-            program_labels_workbook.active = program_labels_workbook["Sign In Day 1"]
-            sheet = program_labels_workbook.active
-
-            # list of column headers
-            headers = ["Program/School", "Contact", "Location", "Registration Packet", "T-shirts/Bags", "Posters"]
-
-            # set the background color of the first row to blue, for the number of columnes equal to the length of the headers list
-            for cell in sheet['A1':'F1']:
-                for c in cell:
-                    c.font = Font(bold=True)
-
-            # set the values of the second row to the column headers
-            for i, header in enumerate(headers):
-                sheet.cell(row=1, column=i+1, value=header)
-
-            # filter the users_list to only include users that are in submissions that are on day 1
-            users_list_day1 = [user_dict for user_dict in users_list if user_dict['day1'] == "Day 1"]
-            for user_dict in users_list_day1:
-                # Create contact string with name and email
-                contact = f"{user_dict['name']} ({user_dict['email']})" if user_dict['name'].strip() else user_dict['email']
-                
-                # Create a list for the current row
-                row = [
-                    user_dict['organization'],
-                    contact,
-                    f"{user_dict['city']}, {user_dict['state']}",
-                    "",
-                    "",
-                    ""
-                ]
-                
-                # Add the row to the data list
-                sheet.append(row)
-
-            for row in sheet['A1':'F'+ str(len(users_list)+1)]:
-                for cell in row:
-                    cell.border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
-
-            adjust_width(sheet)
-
-
-            program_labels_workbook.create_sheet(title="Sign In Day 2")
-            program_labels_workbook.active = program_labels_workbook["Sign In Day 2"]
-            sheet = program_labels_workbook.active
-
-            # list of column headers
-            headers = ["Program/School", "Contact", "Location", "Registration Packet", "T-shirts/Bags", "Posters"]
-
-            # set the background color of the first row to blue, for the number of columnes equal to the length of the headers list
-            for cell in sheet['A1':'F1']:
-                for c in cell:
-                    c.font = Font(bold=True)
-
-            # set the values of the second row to the column headers
-            for i, header in enumerate(headers):
-                sheet.cell(row=1, column=i+1, value=header)
-
-            # filter the users_list to only include users that are in submissions that are on day 2
-            users_list_day2 = [user_dict for user_dict in users_list if user_dict['day2'] == "Day 2"]
-            for user_dict in users_list_day2:
-                # Create contact string with name and email
-                contact = f"{user_dict['name']} ({user_dict['email']})" if user_dict['name'].strip() else user_dict['email']
-                
-                # Create a list for the current row
-                row = [
-                    user_dict['organization'],
-                    contact,
-                    f"{user_dict['city']}, {user_dict['state']}",
-                    "",
-                    "",
-                    ""
-                ]
-                
-                # Add the row to the data list
-                sheet.append(row)
-
-            for row in sheet['A1':'F'+ str(len(users_list)+1)]:
-                for cell in row:
-                    cell.border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
-
-            adjust_width(sheet)
-
-
-            # remove the default sheet
-            program_labels_workbook.remove(program_labels_workbook['Sheet'])
-
-            # Create a BytesIO object and save the workbook to it
-            xlsx_file_io = BytesIO()
-            program_labels_workbook.save(xlsx_file_io)
-
-            # Go back to the start of the BytesIO object
-            xlsx_file_io.seek(0)
-
-            # Save the BytesIO object to a file in default storage
-            program_labels_xlsx_file_name = f'Fair{fair.name}-Program labels.xlsx'
-            program_labels_xlsx_file = default_storage.save(program_labels_xlsx_file_name, ContentFile(xlsx_file_io.read()))
-
-
-            # Get the full path of the files
-            json_file_path = default_storage.path(json_file)
-            submission_xlsx_file_path = default_storage.path(submission_xlsx_file)
-            student_xlsx_file_path = default_storage.path(student_xlsx_file)
-            group_contact_xlsx_path = default_storage.path(group_contact_xlsx_file)
-            accessory_xlsx_file_path = default_storage.path(accessory_xlsx_file)
-            program_labels_file_path = default_storage.path(program_labels_xlsx_file)
-
-            zip_folder_name = f'fair_{fair.name}_data/'
-
-            # Create a new zip file
-            zip_file_name = f'fair_{fair.name}_data.zip'
-            with zipfile.ZipFile(zip_file_name, 'w') as zip_file:
-                # Add the json file to the zip file
-                zip_file.write(json_file_path, arcname=zip_folder_name+json_file_name)
-
-                # Add the submission xlsx file to the zip file
-                zip_file.write(submission_xlsx_file_path, arcname=zip_folder_name+submission_xlsx_file_name)
-
-                # Add the student xlsx file to the zip file
-                zip_file.write(student_xlsx_file_path, arcname=zip_folder_name+student_xlsx_file_name)
-
-                # Add the group contact xlsx file to the zip file
-                zip_file.write(group_contact_xlsx_path, arcname=zip_folder_name+group_contact_xlsx_file_name)
-
-                # Add the accessory xlsx file to the zip file
-                zip_file.write(accessory_xlsx_file_path, arcname=zip_folder_name+accessory_xlsx_file_name)
-
-                # Add the program labels xlsx file to the zip file
-                zip_file.write(program_labels_file_path, arcname=zip_folder_name+program_labels_xlsx_file_name)
-
-            # Create a generator that reads the file and yields the data
-            def file_iterator():
-                try:
-                    with open(zip_file_name, 'rb') as f:
-                        for chunk in iter(lambda: f.read(4096), b''):
-                            yield chunk
-                finally:
-                    os.remove(zip_file_name)
-
-            # Create a StreamingHttpResponse that uses the file_iterator
-            response = StreamingHttpResponse(file_iterator(), content_type='application/zip')
-            response['Content-Disposition'] = f'attachment; filename="{zip_file_name}"'
-
-            # Delete the files from the default storage
-            default_storage.delete(json_file)
-            default_storage.delete(submission_xlsx_file)
-            default_storage.delete(student_xlsx_file)
-            default_storage.delete(group_contact_xlsx_file)
-            default_storage.delete(accessory_xlsx_file)
-            default_storage.delete(program_labels_xlsx_file)
+            # build the first entry (the JSON dump) before responding, so that errors there still get an error response
+            zip_stream = stream_fair_export(fair)
+            first_chunk = next(zip_stream)
 
+            response = StreamingHttpResponse(chain([first_chunk], zip_stream), content_type='application/zip')
+            response['Content-Disposition'] = f'attachment; filename="{fair_export_file_name(fair)}"'
             return response
 
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    def post(self, request, fair_pk):
+        fair = get_object_or_404(Fair, pk=fair_pk)
+        job = enqueue_export(fair, 'fair_data', request.user.get_username())
+        serializer = ExportJobSerializer(job)
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+@api_view(['GET'])
+def export_job_get(request, job_pk):
+    if not request.user.is_authenticated:
+        return Response({'detail': 'Authentication credentials were not provided.'}, status=status.HTTP_401_UNAUTHORIZED)
+    job = get_object_or_404(ExportJob, pk=job_pk)
+    # the browser polls the job until it finishes, so a job that was lost has to be picked up again here
+    resume_queued_export_job(job)
+    serializer = ExportJobSerializer(job)
+    return Response(serializer.data)
+
+class ExportJobDownloadView(APIView):
+    def get(self, request, job_pk):
+        job = get_object_or_404(ExportJob, pk=job_pk)
+        if job.status != 'completed' or not job.file:
+            return Response({'error': f'Export is not ready (status: {job.get_status_display()})'}, status=status.HTTP_409_CONFLICT)
+        content_type = EXPORT_TYPES[job.export_type][2]
+        return FileResponse(job.file.open('rb'), as_attachment=True, filename=job.file_name, content_type=content_type)
+
 
 # and API view that returns JSON for all the submissions for the fair given by the fair_pk, with all the metadata for each submission. This is sent to the browser as a download when the user clicks the "Download All Submission data" button on the fair detail page.
 class JudgeSheetsDownloadView(APIView):
+    @cached_export('judge_sheets')
     def get(self, request, fair_pk):
         fair = Fair.objects.get(pk=fair_pk)
         submissions = Submission.objects.filter(fair=fair)
@@ -3002,127 +1949,23 @@ class JudgeSheetsDownloadView(APIView):
         # sort submissions by category, then by organization, then by grade range, then by group, then by title
         submissions = submissions.order_by('category__name', 'organization', 'grade_range', 'group', 'title')
 
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="fair{fair.name}-Judging sheets.pdf"'
-        
-        p = reportlab_canvas.Canvas(response, pagesize=reportlab_letter)
-        p.setTitle(f'Fair {fair.name} - Judging Sheets')
-        width, height = reportlab_letter
-
-        # Register the AboriginalSansREGULAR font
-        font_path = os.path.join(settings.STATIC_ROOT, 'AboriginalSansREGULAR.ttf')
-        # font_bold_path = os.path.join(settings.STATIC_ROOT, 'AboriginalSansBOLD.ttf')
-        reportlab_pdfmetrics.registerFont(reportlab_TTFont('AboriginalSansREGULAR', font_path))
-        # reportlab_pdfmetrics.registerFont(reportlab_TTFont('AboriginalSansBOLD', font_bold_path))
-
-        def draw_static_elements():
-            # Title banner image
-            # Get image
-            image_path = os.path.join(settings.STATIC_ROOT, banner_image)
-            # Create an Image object
-            image = reportlab_Image(image_path)
-            # Set the width to match the page width (with margins)
-            image_width = width - 60  # 30px margin on each side
-            # Calculate height to maintain aspect ratio
-            aspect = image.imageHeight / float(image.imageWidth)
-            image_height = image_width * aspect
-            # Resize the image
-            image.drawWidth = image_width
-            image.drawHeight = image_height
-            # Draw the image
-            image.drawOn(p, 30, height-100)
-            # Subtitle with Blue Background
-            sky_blue = reportlab_Color(0.429, 0.708, 0.982)  # RGB values for light blue
-            p.setFillColor(sky_blue)
-            rectangle_width = width * 0.8  # 80% of the page width
-            rectangle_x = (width - rectangle_width) / 2  # Calculate the x-coordinate to center the rectangle
-
-            p.rect(rectangle_x, height-140, rectangle_width, 30, fill=True, stroke=False)
-            p.setFillColor(reportlab_white)
-            p.setFont("Helvetica", 14)
-            p.drawString(130, height-130, f"{human_readable_title} {fair.name}")
-
-            p.setFillColor(reportlab_black)
-            # Horizontal Rule after Dynamic Text
-            p.line(30, height-300, width-30, height-300)
-
-            p.setFont("Helvetica", 9)
-            p.drawString(35, height-315, f"Please rate the {submission.category.name}")
-            p.drawString(35, height-325, "using a scale of 1 to 5.")
-            p.drawString(435, height-315, "Circle score for each")
-            p.drawString(435, height-325, "critera:")
-            p.setFont("Helvetica-Bold", 9)
-            p.drawString(35, height-345, "1 = Poor")
-            p.drawString(35, height-355, "2 = Below Average")
-            p.drawString(35, height-365, "3 = Average")
-            p.drawString(35, height-375, "4 = Above Average")
-            p.drawString(35, height-385, "5 = Excellent")
-
-            # Likert-style Ratings
-            ratings = ["                                                   Use of Language:",
-                       "Originality & Creativity in Illustration & Content:",
-                       "                                                                       Effort:"]
-            y_position = height - 345  # Subtract 100 from the y-coordinate
-            for rating in ratings:
-                p.drawString(220, y_position, rating)
-                for i in range(1, 6):
-                    p.drawString(420 + 15*i, y_position, str(i))
-                y_position -= 20
-
-            # Horizontal Rule after Likerts
-            p.line(30, y_position-10, width-30, y_position-10)
-
-            # Total Score Box, Comments Box, Judge Name and Signature
-            p.drawString(350, y_position-20, "Total Score:")
-            p.rect(420, y_position-40, 100, 30)
-            p.drawString(50, y_position-60, "Comments:")
-            p.rect(48, y_position-225, width-100, 150)
-            p.drawString(130, y_position-280, "Judge Name:")
-            p.line(200, y_position-280, width-130, y_position-280)
-            p.drawString(130, y_position-320, "Signature:")
-            p.line(200, y_position-320, width-130, y_position-320)
-            
-
-            # Horizontal Rule before footer
-            p.line(30, 40, width-30, 40)
-            # Footer
-            p.setFont("Helvetica", 8)
-            p.drawString(30, 30, f"{human_readable_title} {fair.name} Judging Sheet - {submission.category.name}")
+        rows = judge_sheet_rows(submissions)
 
-        for submission in submissions:
-            draw_static_elements()
-
-            # Dynamic text drawing goes here
-            p.setFont("AboriginalSansREGULAR", 10)
-            p.drawString(30, height-155, "Program/School: ")
-            p.drawString(150, height-155, f"{submission.organization}")
-            p.drawString(30, height-175, "Grade: ")
-            p.drawString(150, height-175, f"{submission.get_grade_range_display()}")
-            p.drawString(30, height-195, "Presenting Group: ")
-            p.drawString(150, height-195, f"{submission.group}")
-            p.drawString(30, height-215, "Title: ")
-            p.drawString(150, height-215, f"{submission.title}")
-            p.drawString(30, height-235, "Language: ")
-            languoid_text = []
-            for languoid in submission.languoids.all():
-                if languoid.name == 'Other':
-                    other_text = f"Other: {submission.other_languoid or 'Blank'}"
-                    languoid_text.append(other_text)
-                else:
-                    languoid_text.append(languoid.name)
-            p.drawString(150, height-235, f"{', '.join(languoid_text)}")
-            p.drawString(30, height-255, "Category: ")
-            p.drawString(150, height-255, f"{submission.category.name}")
-            p.drawString(30, height-275, "Type: ")
-            p.drawString(150, height-275, f"{submission.get_submission_type_display()}")
-
-            p.showPage()
+        # ?split=category renders each category in the worker processes, and returns a zip with one PDF per category
+        if request.GET.get('split') == 'category':
+            pdfs = render_by_category(render_judge_sheets, rows, fair_name=fair.name, human_readable_title=human_readable_title, banner_image=banner_image)
+            files = ((f'fair{fair.name}-Judging sheets-{category_name.replace("/", "-")}.pdf', pdf) for category_name, pdf in pdfs)
+            response = StreamingHttpResponse(stream_zip(files), content_type='application/zip')
+            response['Content-Disposition'] = f'attachment; filename="fair{fair.name}-Judging sheets.zip"'
+            return response
 
-        p.save()
+        response = HttpResponse(render_judge_sheets(rows, fair.name, human_readable_title, banner_image), content_type='application/pdf')
+        response['Content-Disposition'] = f'attachment; filename="fair{fair.name}-Judging sheets.pdf"'
         return response
 
 # and API view that returns JSON for all the submissions for the fair given by the fair_pk, with all the metadata for each submission. This is sent to the browser as a download when the user clicks the "Download All Submission data" button on the fair detail page.
 class SubmissionSheetsDownloadView(APIView):
+    @cached_export('submission_sheets')
     def get(self, request, fair_pk):
         fair = Fair.objects.get(pk=fair_pk)
         submissions = Submission.objects.filter(fair=fair)
@@ -3173,18 +2016,12 @@ class SubmissionSheetsDownloadView(APIView):
         elements = []
         page_width, page_height = reportlab_letter
 
-        # Register the AboriginalSansREGULAR font
-        font_path = os.path.join(settings.STATIC_ROOT, 'AboriginalSansREGULAR.ttf')
-        font_bold_path = os.path.join(settings.STATIC_ROOT, 'AboriginalSansBOLD.ttf')
-        reportlab_pdfmetrics.registerFont(reportlab_TTFont('AboriginalSansREGULAR', font_path))
-        reportlab_pdfmetrics.registerFont(reportlab_TTFont('AboriginalSansBOLD', font_bold_path))
+        register_fonts()
 
         for submission in submissions:
             # add the header image (banner_image)
-            image_path = os.path.join(settings.STATIC_ROOT, banner_image)
             image_width = page_width - 200
-            image = reportlab_Image(image_path, width=image_width, height=60)
-            elements.append(image)
+            elements.append(BannerImage(banner_image, image_width, 60))
 
             # Add submission details
             clean_title = escape(submission.title)
@@ -3299,133 +2136,17 @@ class SubmissionSheetsDownloadView(APIView):
 
 # and API view that returns pdf for organizations with summary info
 class RegistrationCoverSheetsDownloadView(APIView):
+    @cached_export('registration_cover_sheets')
     def get(self, request, fair_pk):
         fair = Fair.objects.get(pk=fair_pk)
 
-        # get a list of cateogries that are not material
-        non_material_submission_categories = list(Category.objects.filter(fair=fair, material_submission=False).values_list('name', flat=True))
-
-        # get a list of all the approved submissions for the fair
-        submissions = Submission.objects.filter(fair=fair, status__in=["approved"])
-
-        # get a list of all the users that have students that are in the submissions of the fair
-        users = User.objects.filter(student_user__submission_student__in=submissions).distinct()
-
-        # Convert GRADES to a dictionary
-        grades_dict = dict(Student.GRADES)
-
-        # create a mapping from display values to sorted non-display values (this should have been done in models)
-        tshirt_size_mapping = {
-            'Youth Small (YS)': '1_ys',
-            'Youth Medium (YM)': '2_ym',
-            'Youth Large (YL)': '3_yl',
-            'Adult Small (S)': '4_s',
-            'Adult Medium (M)': '5_m',
-            'Adult Large (L)': '6_l',
-            'Adult Extra Large (XL)': '7_xl',
-            'Adult Extra Extra Large (XXL)': '8_xxl',
-            'Adult Extra Extra Extra Large (XXXL)': '9_xxxl'
-        }
-
-        # make a list of dictionaries for each user, with the organization of the user, address, city and state of the user, phone, fax and email of the user
-        users_list = []
-        for user in users:
-
-            # make a clean organization name, that strips the characters that are escaped from the beginning of the organization name
-            if user.organization is not None:
-                clean_organization = re.sub(r'^\W+', '', user.organization)
-            else:
-                clean_organization = ""
-
-            # get the submissions that the user is in
-            submissions = Submission.objects.filter(user=user, fair=fair)
-
-            # get the students that are in the submissions, sorted by last name and then first name
-            students = Student.objects.filter(submission_student__in=submissions).order_by('lastname', 'firstname').distinct()
-
-            # get a list of cateogries that are not material
-            non_material_categories = Category.objects.filter(fair=fair, material_submission=False)
-
-            # make a list of dictionaries for each student, with the first name, last name, grade, and tshirt size of the student
-            students_list = []
-            for student in students:
-                # get the submissions that the student is in
-                student_submissions = student.submission_student.filter(fair=fair)
-
-                # check if the student is in any non-material submissions
-                has_non_material = student_submissions.filter(category__in=non_material_categories).exists()
-
-                # Only include tshirt size if student has non-material submissions
-                tshirt_size = student.get_tshirt_size_display() if has_non_material else ""
-
-                # create a dictionary for the student
-                student_dict = {
-                    'firstname': student.firstname,
-                    'lastname': student.lastname,
-                    'grade': student.get_grade_display(),
-                    'tshirt_size': tshirt_size
-                }
-                # add a copy of the dictionary to the list of students
-                students_list.append(copy.deepcopy(student_dict))
-
-            # get the count of the unique students in the submissions
-            student_count = students.count()
-
-            # using students_list, get a count of the tshirts of each size as a dictionary
-            tshirt_sizes = Counter([student['tshirt_size'] for student in students_list])
-
-            # remove the count for blank t-shirt sizes and set it to bag_count
-            bag_count = tshirt_sizes.pop('', 0)
-
-
-            # sort tshirt_sizes based on the non-display value of the vocabulary
-            tshirt_sizes = {k: v for k, v in sorted(tshirt_sizes.items(), key=lambda item: tshirt_size_mapping[item[0]])}
-
-            # get the instructors that are in the submissions
-            instructors = Instructor.objects.filter(submission_instructor__in=submissions).distinct()
-
-            # get the count of the unique instructors in the submissions
-            instructor_count = instructors.count()
-
-            # get the grades of the students
-            grades = sorted(list(set(students.values_list('grade', flat=True))))
-
-            # for each value in grades, replace with the display value from grades_dict
-            grades = [grades_dict[grade] for grade in grades]
-
-            # create a dictionary for the user
-            user_dict = {
-                'first_name': user.first_name,
-                'last_name': user.last_name,
-                'organization': clean_organization,
-                'address': user.address,
-                'city_state_zip': ", ".join(filter(None, [user.city, " ".join(filter(None, [user.state, user.zip]))])),
-                'phone': ", ".join(filter(None, [user.phone, user.alt_phone])),
-                'fax': user.fax or '',
-                'email': ', '.join(filter(None, [user.email, user.alt_email])) or '',
-                'grades': ", ".join([str(grade) for grade in grades]),
-                'students': students_list,
-                'student_count': student_count,
-                'tshirt_sizes': tshirt_sizes,
-                'bag_count': bag_count,
-                'instructors': instructors,
-                'instructor_count': instructor_count
-            }
-            # add a copy of the dictionary to the list of users
-            users_list.append(copy.deepcopy(user_dict))
-
-        # sort the list of users by the organization name, ignoring None values
-        users_list = sorted(users_list, key=lambda x: (x['organization'] is None, x['organization'].lower() if x['organization'] else ''))
+        users_list = registration_cover_sheets_data(fair)
 
         response = HttpResponse(content_type='application/pdf')
         response['Content-Disposition'] = f'attachment; filename="fair{fair.name}-Registration cover sheets.pdf"'
         doc = reportlab_SimpleDocTemplate(response, pagesize=reportlab_letter, title=f'Fair {fair.name} - Registration Cover Sheets')
 
-        # Register the AboriginalSansREGULAR font
-        font_path = os.path.join(settings.STATIC_ROOT, 'AboriginalSansREGULAR.ttf')
-        font_bold_path = os.path.join(settings.STATIC_ROOT, 'AboriginalSansBOLD.ttf')
-        reportlab_pdfmetrics.registerFont(reportlab_TTFont('AboriginalSansREGULAR', font_path))
-        reportlab_pdfmetrics.registerFont(reportlab_TTFont('AboriginalSansBOLD', font_bold_path))
+        register_fonts()
 
         styles = reportlab_getSampleStyleSheet()
         styles['Normal'].fontName = 'AboriginalSansREGULAR'
@@ -3445,9 +2166,8 @@ class RegistrationCoverSheetsDownloadView(APIView):
         page_width, page_height = reportlab_letter
 
         # add the header image (banner_image)
-        image_path = os.path.join(settings.STATIC_ROOT, banner_image)
         image_width = page_width - 200
-        image = reportlab_Image(image_path, width=image_width, height=60)
+        image = BannerImage(banner_image, image_width, 60)
 
         for user in users_list:
             # Add the banner image at the start of each user's section
@@ -3609,6 +2329,7 @@ class RegistrationCoverSheetsDownloadView(APIView):
 
 # and API view that returns JSON for all the submissions for the fair given by the fair_pk, with all the metadata for each submission. This is sent to the browser as a download when the user clicks the "Download All Submission data" button on the fair detail page.
 class SubmissionCardsDownloadView(APIView):
+    @cached_export('submission_cards')
     def get(self, request, fair_pk):
         fair = Fair.objects.get(pk=fair_pk)
         submissions = Submission.objects.filter(fair=fair)
@@ -3625,82 +2346,18 @@ class SubmissionCardsDownloadView(APIView):
         # sort submissions by category, then by organization, then by grade range, then by group, then by title
         submissions = submissions.order_by('category__name', 'organization', 'grade_range', 'group', 'title')
 
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="fair{fair.name}-Submission cards.pdf"'
-        
-        p = reportlab_canvas.Canvas(response, pagesize=reportlab_letter)
-        p.setTitle(f'Fair {fair.name} - Submission Cards')
-        width, height = reportlab_letter
-
-        # Register the AboriginalSansREGULAR font
-        font_path = os.path.join(settings.STATIC_ROOT, 'AboriginalSansREGULAR.ttf')
-        font_bold_path = os.path.join(settings.STATIC_ROOT, 'AboriginalSansBOLD.ttf')
-        reportlab_pdfmetrics.registerFont(reportlab_TTFont('AboriginalSansREGULAR', font_path))
-        reportlab_pdfmetrics.registerFont(reportlab_TTFont('AboriginalSansBOLD', font_bold_path))
-
-        # Title banner image
-        # Get image
-        image_path = os.path.join(settings.STATIC_ROOT, banner_image)
-        # Create an Image object
-        image = reportlab_Image(image_path)
-        # Set the size of the image
-        image.drawWidth = 330
-        image.drawHeight = 50
-
-        def draw_static_elements():
-            p.line(30, height-398, width-30, height-398)
-
-        def draw_dynamic_elements(y_position, submission):
-            image.drawOn(p, 30, y_position+30)
-            p.setFont("AboriginalSansBOLD", 14)
-            p.drawString(380, y_position+60, "Submission card")
-
-            # Dynamic text drawing goes here
-            p.setFont("AboriginalSansREGULAR", 10)
-            p.drawString(50, y_position, "Presenting Group: ")
-            p.drawString(80, y_position-20, f"{submission.group}")
-            p.drawString(350, y_position, "Category: ")
-            p.drawString(380, y_position-20, f"{submission.category.name}")
-            p.drawString(50, y_position-60, "Program/School: ")
-            p.drawString(80, y_position-80, f"{(submission.organization or '')[:50]}")
-            p.drawString(350, y_position-60, "Grade: ")
-            p.drawString(380, y_position-80, f"{submission.get_grade_range_display()}")
-            p.drawString(50, y_position-120, "Title of Presentation: ")
-            p.drawString(80, y_position-140, f"{(submission.title or '')[:50]}")
-            p.drawString(350, y_position-120, "Type: ")
-            p.drawString(380, y_position-140, f"{submission.get_submission_type_display()}")
-            p.drawString(50, y_position-180, "Language(s): ")
-            languoid_text = []
-            for languoid in submission.languoids.all():
-                if languoid.name == 'Other':
-                    other_text = f"Other: {submission.other_languoid or 'Blank'}"
-                    languoid_text.append(other_text)
-                else:
-                    languoid_text.append(languoid.name)
-            p.drawString(80, y_position-200, f"{', '.join(languoid_text)}")
-            p.drawString(350, y_position-180, "Instructor(s): ")
-            p.drawString(380, y_position-200, f"{', '.join([instructor.lastname for instructor in submission.instructors.all()])}")
-
+        rows = submission_card_rows(submissions)
 
-        for i, submission in enumerate(submissions):
-            if i % 2:
-                pass
-            else:
-                try:
-                    second_submission = submissions[i+1]
-                except:
-                    second_submission = None
-
-                draw_static_elements()
-                y_position = height-130
-                draw_dynamic_elements(y_position, submission)
-                y_position = height-530
-                if second_submission:
-                    draw_dynamic_elements(y_position, second_submission)
-
-                p.showPage()
+        # ?split=category renders each category in the worker processes, and returns a zip with one PDF per category
+        if request.GET.get('split') == 'category':
+            pdfs = render_by_category(render_submission_cards, rows, fair_name=fair.name, banner_image=banner_image)
+            files = ((f'fair{fair.name}-Submission cards-{category_name.replace("/", "-")}.pdf', pdf) for category_name, pdf in pdfs)
+            response = StreamingHttpResponse(stream_zip(files), content_type='application/zip')
+            response['Content-Disposition'] = f'attachment; filename="fair{fair.name}-Submission cards.zip"'
+            return response
 
-        p.save()
+        response = HttpResponse(render_submission_cards(rows, fair.name, banner_image), content_type='application/pdf')
+        response['Content-Disposition'] = f'attachment; filename="fair{fair.name}-Submission cards.pdf"'
         return response
 
 
@@ -2,10 +2,11 @@ from django.conf import settings
 import os
 from django.contrib.auth.models import Group
 from django.db.models import Q
+from .roles import is_moderator
 
 def user_context(request):
     return {
-        'moderator': request.user.groups.filter(name='moderator').exists() if request.user.is_authenticated else False
+        'moderator': is_moderator(request.user)
     }
 
 def demo_mode_context(request):
@@ -2,6 +2,7 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from users.models import User, Organization
+from users.roles import is_moderator
 
 # class CustomUserCreationForm(UserCreationForm):
 #     class Meta(UserCreationForm.Meta):
@@ -198,7 +199,7 @@ class UserProfileForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         
         # Hide fields if user is not a moderator
-        if user and not user.groups.filter(name='moderator').exists():
+        if user and not is_moderator(user):
             self.fields['email'].widget = forms.HiddenInput()
             self.fields['first_name'].widget = forms.HiddenInput()
             self.fields['last_name'].widget = forms.HiddenInput()
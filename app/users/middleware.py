@@ -2,16 +2,27 @@ from django.shortcuts import redirect
 from django.urls import resolve
 from datetime import datetime
 import logging
+from .roles import load_request_roles, is_moderator
 
 logger = logging.getLogger(__name__)
 
+class UserRolesMiddleware:
+    """Resolve the user's roles once per request, available as request.user_roles"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.user_roles = load_request_roles(request)
+        return self.get_response(request)
+
 class YearlyProfileCheckMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
 
     def __call__(self, request):
         if request.user.is_authenticated:
-            if not request.user.groups.filter(name='moderator').exists():
+            if not is_moderator(request.user):
                 current_url = resolve(request.path_info).url_name
                 if current_url not in ['user_account_detail', 'user_account_edit', 'logout']:
                     previous_login_year = request.session.get('previous_login')
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-18 15:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_alter_user_options'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='roles_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.9 on 2026-10-18 16:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def copy_roles_versions(apps, schema_editor):
+    # keep the versions the roles cached in sessions were tagged with
+    User = apps.get_model('users', 'User')
+    UserRolesVersion = apps.get_model('users', 'UserRolesVersion')
+    UserRolesVersion.objects.bulk_create([
+        UserRolesVersion(user_id=user_id, version=version)
+        for user_id, version in User.objects.filter(roles_version__gt=0).values_list('pk', 'roles_version')
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_user_roles_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserRolesVersion',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='roles_version', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('version', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(copy_roles_versions, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='user',
+            name='roles_version',
+        ),
+    ]
@@ -1,10 +1,12 @@
-from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
+from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin, Group
 from django.db import models
 from django.utils import timezone
 from submissions.models import STATE_CHOICES
 from django.contrib.auth.signals import user_logged_in
 from django.dispatch import receiver
+from django.db.models.signals import m2m_changed, post_save, pre_delete
 from datetime import datetime
+from django.db.models import F
 from django.db.models.functions import Lower
 
 class UserManager(BaseUserManager):
@@ -69,6 +71,12 @@ class User(AbstractBaseUser, PermissionsMixin):
 #     user = models.OneToOneField(User, on_delete=models.CASCADE)
 #     organization = models.CharField(max_length=500)
 
+class UserRolesVersion(models.Model):
+    # bumped when the user's groups change, see roles.py. It is kept out of User, so that
+    # saving a User loaded before the change can't write the old version back
+    user = models.OneToOneField(User, primary_key=True, related_name='roles_version', on_delete=models.CASCADE)
+    version = models.PositiveIntegerField(default=0)
+
 class Organization(models.Model):
     name = models.CharField(max_length=500, unique=True)
     def __str__(self):
@@ -81,3 +89,36 @@ def store_last_login(sender, user, request, **kwargs):
         request.session['previous_login'] = user.last_login.year
     else:
         request.session['previous_login'] = None
+
+# Keep the roles cached in sessions (see roles.py) in step with group membership
+
+def invalidate_user_roles(user_ids):
+    user_ids = list(user_ids)
+    bumped = set(UserRolesVersion.objects.filter(user_id__in=user_ids).values_list('user_id', flat=True))
+    UserRolesVersion.objects.filter(user_id__in=bumped).update(version=F('version') + 1)
+    # a user without a row is at version 0
+    UserRolesVersion.objects.bulk_create(
+        [UserRolesVersion(user_id=user_id, version=1) for user_id in user_ids if user_id not in bumped],
+        ignore_conflicts=True,
+    )
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_roles_on_group_membership_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidate_user_roles([instance.pk])
+            instance.__dict__.pop('_roles', None)
+    elif action == 'pre_clear':
+        # pk_set is not given for clear, so remember the users before the links are removed
+        instance._cleared_user_ids = list(instance.user_set.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        invalidate_user_roles(getattr(instance, '_cleared_user_ids', []))
+    elif action in ('post_add', 'post_remove'):
+        invalidate_user_roles(pk_set)
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def invalidate_roles_on_group_change(sender, instance, created=False, **kwargs):
+    # roles are group names, so renaming or deleting a group changes its users' roles
+    if not created:
+        invalidate_user_roles(instance.user_set.values_list('pk', flat=True))
@@ -0,0 +1,50 @@
+# A user's roles are the names of their groups. They are looked up once per request
+# (UserRolesMiddleware) and kept in the session between requests, tagged with the user's
+# roles version (UserRolesVersion). The version is bumped in the database whenever the
+# user's groups change (see the receivers in models.py), which makes the copy in the
+# session stale.
+
+from .models import UserRolesVersion
+
+MODERATOR = 'moderator'
+
+SESSION_KEY = 'user_roles'
+
+
+def get_user_roles(user):
+    """Return the set of role names of the user, looked up once per user object"""
+    if not user.is_authenticated:
+        return frozenset()
+    roles = getattr(user, '_roles', None)
+    if roles is None:
+        roles = frozenset(user.groups.values_list('name', flat=True))
+        user._roles = roles
+    return roles
+
+
+def has_role(user, role):
+    return role in get_user_roles(user)
+
+
+def is_moderator(user):
+    return has_role(user, MODERATOR)
+
+
+def load_request_roles(request):
+    """Resolve the roles of the request's user, reusing the copy in the session while it is current"""
+    user = request.user
+    if not user.is_authenticated:
+        return frozenset()
+
+    version = UserRolesVersion.objects.filter(user_id=user.pk).values_list('version', flat=True).first() or 0
+    cached = request.session.get(SESSION_KEY)
+    if cached and cached['user_id'] == user.pk and cached['version'] == version:
+        user._roles = frozenset(cached['roles'])
+    else:
+        request.session[SESSION_KEY] = {
+            'user_id': user.pk,
+            'version': version,
+            'roles': sorted(get_user_roles(user)),
+        }
+    return user._roles
+
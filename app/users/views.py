@@ -7,7 +7,9 @@ from django.contrib import messages
 from django.contrib.auth import get_user_model, login
 from django.contrib.auth.decorators import login_required, user_passes_test, permission_required
 from .models import Organization, User
-from submissions.models import CurrentFair, Submission
+from .roles import is_moderator
+from submissions.models import Submission
+from submissions.current_fair import get_current_fair
 from .forms import UserProfileForm, UserEditForm
 from datetime import datetime
 from django.db import transaction
@@ -21,11 +23,8 @@ from django.core.exceptions import PermissionDenied
 
 logger = logging.getLogger(__name__)
 
-def is_moderator(user):
-    return user.groups.filter(name='moderator').exists()
-
 def is_moderator_or_admin(user):
-    return user.is_superuser or user.groups.filter(name='moderator').exists()
+    return user.is_superuser or is_moderator(user)
 
 def generate_password():
     chars = string.ascii_letters + string.digits
@@ -37,7 +36,7 @@ class SignUpView(generic.CreateView):
 
     def dispatch(self, request, *args, **kwargs):
         # Check if registration is closed
-        current_fair = CurrentFair.objects.first()
+        current_fair = get_current_fair(request)
         if not current_fair or not current_fair.fair.registration_open:
             messages.error(request, f'Registration is currently closed')
             return redirect('login')
@@ -61,7 +60,7 @@ def user_account_detail(request):
     current_year = datetime.now().year
     
     show_update_notice = False
-    if not request.user.groups.filter(name='moderator').exists():
+    if not is_moderator(request.user):
         previous_login_year = request.session.get('previous_login')
         if previous_login_year and previous_login_year < current_year:
             show_update_notice = True
@@ -74,10 +73,12 @@ def user_account_detail(request):
         del request.session['next_url']
     # Update previous_login to current year to prevent further redirects
     request.session['previous_login'] = current_year
+
+    current_fair = get_current_fair(request)
     
     context = {
         'currentUser': currentUser,
-        'currentFair': CurrentFair.objects.first().name if CurrentFair.objects.first() else None,
+        'currentFair': current_fair.name if current_fair else None,
         'show_update_notice': show_update_notice,
         'next_url': next_url,
     }
@@ -86,7 +87,7 @@ def user_account_detail(request):
 @login_required
 def user_account_edit(request):
 
-    currentFair = CurrentFair.objects.first()
+    currentFair = get_current_fair(request)
 
     if request.method == "POST":
         form = UserProfileForm(request.POST, instance=request.user, user=request.user)
@@ -323,7 +324,7 @@ def admin_password_reset(request, user_id):
     
     # Don't allow regular moderators to reset moderator passwords
     # But allow staff/superusers to reset any password
-    if target_user.groups.filter(name='moderator').exists() and not (request.user.is_staff or request.user.is_superuser):
+    if is_moderator(target_user) and not (request.user.is_staff or request.user.is_superuser):
         raise PermissionDenied("You don't have permission to reset this user's password")
     
     if request.method == 'POST':